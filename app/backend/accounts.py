@@ -0,0 +1,173 @@
+"""
+Account creation, shared by signup and bulk imports.
+
+A signup is one transaction: the user and their empty profile are inserted
+in a single flush, and the unique constraints on users.username and
+users.email decide conflicts, so there is no racy check-then-insert and no
+extra SELECTs. Imports insert each batch of users, then their profiles, with
+one executemany each; a batch that hits a constraint anyway (a concurrent
+signup) is retried row by row through the signup path to find the culprits.
+"""
+import csv
+import re
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from auth_tokens import revoke_user_tokens
+from extensions import db
+from models.profile import Profile
+from models.user import User
+from passwords import hash_passwords
+
+IMPORT_BATCH_SIZE = 500
+UNIQUE_FIELDS = ('username', 'email')
+
+# Constraint/key name in duplicate-key messages: MySQL, SQLite, PostgreSQL
+_CONSTRAINT_PATTERN = re.compile(r"for key '([^']+)'|UNIQUE constraint failed: ([\w.]+)|constraint \"([^\"]+)\"")
+
+
+class AccountConflict(Exception):
+    """A username or email is already taken"""
+
+    def __init__(self, field):
+        super().__init__(f'{field} already exists')
+        self.field = field
+
+
+def conflict_field(error):
+    """'username' or 'email' for an IntegrityError caused by a duplicate, else None"""
+    name = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None)  # psycopg
+    if not name:
+        match = _CONSTRAINT_PATTERN.search(str(error.orig))
+        name = next((group for group in match.groups() if group), '') if match else ''
+    for field in UNIQUE_FIELDS:
+        if field in name:
+            return field
+    return None
+
+
+def create_user(username, email, password_hash):
+    """Insert a user and their profile in one transaction; returns the new id or raises AccountConflict"""
+    user = User(username=username, email=email, password_hash=password_hash)
+    db.session.add(Profile(user=user, name=username))
+    try:
+        db.session.flush()
+        user_id = user.id  # Read before commit expires it
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        field = conflict_field(e)
+        if field is None:
+            raise
+        raise AccountConflict(field)
+    return user_id
+
+
+def import_users(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create accounts from dicts with username, email and either password or
+    password_hash (an existing werkzeug/argon2 hash, upgraded at first login).
+    Each batch is its own transaction. Returns
+    {'created': n, 'conflicts': [{'row', 'field', 'value'}], 'invalid': [row numbers]}
+    with row numbers counted from 0.
+    """
+    result = {'created': 0, 'conflicts': [], 'invalid': []}
+    numbered = enumerate(rows)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            return result
+        _import_batch(batch, result)
+
+
+def _import_batch(batch, result):
+    accepted = []
+    seen = {field: set() for field in UNIQUE_FIELDS}
+    for number, row in batch:
+        username = (row.get('username') or '').strip()
+        email = (row.get('email') or '').strip()
+        if not username or not email or not (row.get('password') or row.get('password_hash')):
+            result['invalid'].append(number)
+            continue
+        values = {'username': username, 'email': email}
+        duplicate = next((field for field in UNIQUE_FIELDS if values[field] in seen[field]), None)
+        if duplicate:
+            result['conflicts'].append({'row': number, 'field': duplicate, 'value': values[duplicate]})
+            continue
+        for field in UNIQUE_FIELDS:
+            seen[field].add(values[field])
+        accepted.append((number, values, row))
+    if not accepted:
+        return
+
+    # Already-taken names and emails, in one query for the batch
+    taken = db.session.execute(
+        db.select(User.username, User.email).where(
+            User.username.in_(seen['username']) | User.email.in_(seen['email']))
+    ).all()
+    db.session.rollback()  # Don't hold a transaction open while hashing
+    taken = {'username': {row.username for row in taken}, 'email': {row.email for row in taken}}
+    rows = []
+    for number, values, row in accepted:
+        field = next((field for field in UNIQUE_FIELDS if values[field] in taken[field]), None)
+        if field:
+            result['conflicts'].append({'row': number, 'field': field, 'value': values[field]})
+        else:
+            rows.append((number, values, row))
+    if not rows:
+        return
+
+    # Hash in parallel on the password pool; supplied hashes are kept as they are
+    plain = [index for index, (number, values, row) in enumerate(rows) if not row.get('password_hash')]
+    hashes = dict(zip(plain, hash_passwords(rows[index][2]['password'] for index in plain)))
+    users = [{**values, 'password_hash': hashes.get(index) or row.get('password_hash')}
+             for index, (number, values, row) in enumerate(rows)]
+
+    try:
+        db.session.execute(db.insert(User), users)
+        ids = dict(db.session.execute(
+            db.select(User.username, User.id).where(User.username.in_([user['username'] for user in users]))
+        ).all())
+        db.session.execute(db.insert(Profile), [{'user_id': ids[user['username']], 'name': user['username']}
+                                                for user in users])
+        db.session.commit()
+        result['created'] += len(users)
+    except IntegrityError:
+        # Someone signed up with one of these meanwhile: find which, one row at a time
+        db.session.rollback()
+        for (number, values, row), user in zip(rows, users):
+            try:
+                create_user(user['username'], user['email'], user['password_hash'])
+                result['created'] += 1
+            except AccountConflict as e:
+                result['conflicts'].append({'row': number, 'field': e.field, 'value': values[e.field]})
+
+
+users_cli = AppGroup('users', help='User account commands.')
+
+@users_cli.command('import')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Users inserted per transaction.')
+def import_command(csv_file, batch_size):
+    """Create accounts from a CSV with username, email and password (or password_hash) columns."""
+    result = import_users(csv.DictReader(csv_file), batch_size)
+    click.echo(f"Created {result['created']} users; {len(result['conflicts'])} already taken, "
+               f"{len(result['invalid'])} invalid rows")
+    for conflict in result['conflicts']:
+        click.echo(f"  line {conflict['row'] + 2}: {conflict['field']} {conflict['value']!r} already exists")
+    for number in result['invalid']:
+        click.echo(f'  line {number + 2}: missing username, email or password')
+
+
+@users_cli.command('revoke-tokens')
+@click.argument('username')
+def revoke_tokens_command(username):
+    """Log a user out everywhere, e.g. when banning them."""
+    user_id = db.session.execute(db.select(User.id).where(User.username == username)).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user named {username!r}')
+    revoke_user_tokens(user_id)
+    click.echo(f'Revoked all tokens issued to {username}')
@@ -1,7 +1,29 @@
-from flask import Blueprint, request, jsonify
-from .auth import auth_bp
-from .profile import profile_bp
-from .posts import posts_bp
-from .feed import feed_bp
-from .jobs import jobs_bp
-from .messaging import messaging_bp
\ No newline at end of file
+from importlib import import_module
+
+# Blueprints are re-exported lazily, so importing one API module (in a script or
+# test) doesn't load them all. create_app() still imports every module in
+# app.BLUEPRINTS; keep this map in step with it.
+_BLUEPRINT_MODULES = {
+    'auth_bp': 'auth',
+    'profile_bp': 'profile',
+    'posts_bp': 'posts',
+    'feed_bp': 'feed',
+    'follows_bp': 'follows',
+    'likes_bp': 'likes',
+    'comments_bp': 'comments',
+    'connections_bp': 'connections',
+    'search_bp': 'search',
+    'jobs_bp': 'jobs',
+    'messaging_bp': 'messaging',
+    'uploads_bp': 'uploads',
+    'media_bp': 'media',
+    'health_bp': 'health',
+    'events_bp': 'events',
+}
+__all__ = list(_BLUEPRINT_MODULES)
+
+
+def __getattr__(name):
+    if name in _BLUEPRINT_MODULES:
+        return getattr(import_module(f'.{_BLUEPRINT_MODULES[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,12 +1,20 @@
+import hmac
+
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from accounts import AccountConflict, create_user, import_users
+from auth_tokens import issue_tokens, revoke_token, revoke_user_tokens
+from config import USER_IMPORT_TOKEN
 from extensions import db
+from passwords import PasswordHashingBusy, hash_password, needs_rehash, verify_password
 from models.user import User
-from models.profile import Profile
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from flask_cors import CORS
+from flask_jwt_extended import decode_token, jwt_required, get_jwt, get_jwt_identity
 
 auth_bp = Blueprint('auth', __name__)
+
+def busy_response():
+    response = jsonify({'error': 'Too many sign-ins right now, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
  
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -23,11 +31,25 @@ def login():
         (User.username == username_or_email) | (User.email == username_or_email)
     ).first()
     
-    if user and check_password_hash(user.password_hash, password):
-        access_token = create_access_token(identity=str(user.id))
+    try:
+        valid = verify_password(user.password_hash if user else None, password)
+    except PasswordHashingBusy:
+        return busy_response()
+
+    if user and valid:
+        if needs_rehash(user.password_hash):
+            # Hashed with an older method or cost: upgrade it while we have the password
+            try:
+                user.password_hash = hash_password(password)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f'Password rehash failed: {str(e)}')
+        access_token, refresh_token = issue_tokens(user.id)
         return jsonify({
             'message': 'Login successful',
             'access_token': access_token,
+            'refresh_token': refresh_token,
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -48,37 +70,71 @@ def signup():
     email = data.get('email')
     password = data.get('password')
     
-    # Check if user already exists
-    if User.query.filter_by(username=username).first():
-        return jsonify({'error': 'Username already exists'}), 400
-    
-    if User.query.filter_by(email=email).first():
-        return jsonify({'error': 'Email already exists'}), 400
-    
-    # Create new user
-    hashed_password = generate_password_hash(password)
-    new_user = User(
-        username=username,
-        email=email,
-        password_hash=hashed_password
-    )
-    
     try:
-        db.session.add(new_user)
-        db.session.commit()
-        # Auto-create profile for new user
-        new_profile = Profile(user_id=new_user.id, name=username)
-        db.session.add(new_profile)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'User created successfully',
-            'user': {
-                'id': new_user.id,
-                'username': new_user.username,
-                'email': new_user.email
-            }
-        }), 201
+        hashed_password = hash_password(password)
+    except PasswordHashingBusy:
+        return busy_response()
+
+    # One transaction for user and profile; the unique constraints catch duplicates
+    try:
+        user_id = create_user(username, email, hashed_password)
+    except AccountConflict as e:
+        return jsonify({'error': f'{e.field.capitalize()} already exists'}), 400
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'Failed to create user'}), 500 
\ No newline at end of file
+        print(f'Error in signup: {str(e)}')
+        return jsonify({'error': 'Failed to create user'}), 500
+
+    return jsonify({
+        'message': 'User created successfully',
+        'user': {
+            'id': user_id,
+            'username': username,
+            'email': email
+        }
+    }), 201
+
+# POST /api/auth/refresh - new token pair for a refresh token, which is used up
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    revoke_token(get_jwt())
+    access_token, refresh_token = issue_tokens(get_jwt_identity())
+    return jsonify({'access_token': access_token, 'refresh_token': refresh_token}), 200
+
+# POST /api/auth/logout - revoke the presented token, and the refresh token if sent
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    revoke_token(get_jwt())
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            claims = decode_token(data['refresh_token'])
+        except Exception:
+            claims = None  # Expired or invalid: nothing left to revoke
+        if claims and claims['sub'] == get_jwt_identity():
+            revoke_token(claims)
+    return jsonify({'message': 'Logged out'}), 200
+
+# POST /api/auth/logout-all - revoke every token issued to the current user so far
+@auth_bp.route('/logout-all', methods=['POST'])
+@jwt_required()
+def logout_all():
+    revoke_user_tokens(get_jwt_identity())
+    return jsonify({'message': 'Logged out everywhere'}), 200
+
+# POST /api/auth/import - bulk account creation, enabled by USER_IMPORT_TOKEN
+@auth_bp.route('/import', methods=['POST'])
+def import_accounts():
+    token = request.headers.get('X-Import-Token', '')
+    if not USER_IMPORT_TOKEN or not hmac.compare_digest(token, USER_IMPORT_TOKEN):
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    rows = data.get('users')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return jsonify({'error': 'users must be a list of objects'}), 400
+    try:
+        result = import_users(rows)
+    except PasswordHashingBusy:
+        return busy_response()
+    return jsonify(result), 200
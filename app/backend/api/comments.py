@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db
+from models.comment import Comment
+from models.post import Post
+from api.feed import load_authors
+from comments import CommentError, add_comment, comment_page, delete_comment
+from pagination import parse_limit
+from db_routing import read_replica
+
+comments_bp = Blueprint('comments', __name__)
+
+def serialize_comment(comment, author=None):
+    return {
+        'id': comment.id,
+        'post_id': comment.post_id,
+        'parent_id': comment.parent_id,
+        'depth': comment.depth,
+        'user_id': comment.user_id,
+        'author': author or {'user_id': comment.user_id, 'name': '', 'title': '', 'avatar': '',
+                             'avatar_thumbnail': '', 'avatar_srcset': {}},
+        'content': comment.content,
+        'deleted': comment.deleted,
+        'reply_count': comment.reply_count,
+        'created_at': comment.created_at.isoformat() if comment.created_at else ''
+    }
+
+# GET /api/posts/<id>/comments?parent=&after=&limit=
+@comments_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+@read_replica
+def list_comments(post_id):
+    limit = parse_limit(request.args.get('limit'))
+    try:
+        after = int(request.args.get('after', 0))
+        parent_id = int(request.args['parent']) if request.args.get('parent') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    parent = None
+    if parent_id is not None:
+        parent = db.session.get(Comment, parent_id)
+        if parent is None or parent.post_id != post_id:
+            return jsonify({'error': 'Comment not found'}), 404
+
+    comments = comment_page(post_id, parent, after, limit)
+    next_cursor = str(comments[limit - 1].id) if len(comments) > limit else None
+    comments = comments[:limit]
+    authors = load_authors({comment.user_id for comment in comments})
+    return jsonify({
+        'comments': [serialize_comment(comment, authors.get(comment.user_id)) for comment in comments],
+        'next_cursor': next_cursor
+    }), 200
+
+# POST /api/posts/<id>/comments
+@comments_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
+@jwt_required()
+def create_comment(post_id):
+    data = request.get_json(silent=True) or {}
+    content = (data.get('content') or '').strip()
+    if not content:
+        return jsonify({'error': 'Content is required'}), 400
+    post = db.session.get(Post, post_id)
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    if not post.allow_comments:
+        return jsonify({'error': 'Comments are turned off for this post'}), 403
+    parent_id = data.get('parent_id')
+    if parent_id is not None and not isinstance(parent_id, int):
+        return jsonify({'error': 'Invalid parent_id'}), 400
+    try:
+        comment = add_comment(post, int(get_jwt_identity()), content, parent_id)
+    except CommentError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'comment': serialize_comment(comment, load_authors({comment.user_id}).get(comment.user_id))}), 201
+
+# DELETE /api/comments/<id> - by the comment's author or the post's author
+@comments_bp.route('/comments/<int:comment_id>', methods=['DELETE'])
+@jwt_required()
+def remove_comment(comment_id):
+    user_id = int(get_jwt_identity())
+    comment = db.session.get(Comment, comment_id)
+    if comment is None or comment.deleted:
+        return jsonify({'error': 'Comment not found'}), 404
+    if user_id != comment.user_id and user_id != db.session.get(Post, comment.post_id).user_id:
+        return jsonify({'error': 'Forbidden'}), 403
+    delete_comment(comment)
+    return jsonify({'message': 'Comment deleted', 'id': comment_id}), 200
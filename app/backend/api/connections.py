@@ -0,0 +1,117 @@
+import bisect
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db
+from models.profile import Profile
+from models.user import User
+from api.profile import profile_card
+from connections import (accept_request, connection_ids, contains, intersect, load_connection_ids,
+                         pending_ids, remove_connection, remove_request, send_request, suggestions)
+from pagination import parse_limit
+from db_routing import read_replica
+
+connections_bp = Blueprint('connections', __name__)
+
+def profile_cards(user_ids):
+    """Profile cards for user ids in one IN query, in the given order"""
+    if not user_ids:
+        return []
+    profiles = {profile.user_id: profile for profile in Profile.query.filter(Profile.user_id.in_(user_ids)).all()}
+    return [profile_card(profiles[user_id]) for user_id in user_ids if user_id in profiles]
+
+def id_page(ids, after, limit):
+    """One page of a sorted id list, keyed by the last id of the previous page"""
+    start = bisect.bisect_right(ids, after)
+    page = list(ids[start:start + limit])
+    next_cursor = str(page[-1]) if start + limit < len(ids) else None
+    return page, next_cursor
+
+def parse_after():
+    return int(request.args.get('after', 0))
+
+# POST /api/users/<id>/connection - send a connection request (accepts theirs if they asked first)
+@connections_bp.route('/users/<int:other_id>/connection', methods=['POST'])
+@jwt_required()
+def request_connection(other_id):
+    user_id = int(get_jwt_identity())
+    if other_id == user_id:
+        return jsonify({'error': 'You cannot connect with yourself'}), 400
+    if not db.session.get(User, other_id):
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({'user_id': other_id, 'status': send_request(user_id, other_id)}), 200
+
+# DELETE /api/users/<id>/connection - remove a connection, or withdraw/decline a pending request
+@connections_bp.route('/users/<int:other_id>/connection', methods=['DELETE'])
+@jwt_required()
+def delete_connection(other_id):
+    user_id = int(get_jwt_identity())
+    if not remove_connection(user_id, other_id):
+        remove_request(user_id, other_id)
+    return jsonify({'user_id': other_id, 'status': 'none'}), 200
+
+# POST /api/connections/requests/<id>/accept
+@connections_bp.route('/connections/requests/<int:requester_id>/accept', methods=['POST'])
+@jwt_required()
+def accept_connection(requester_id):
+    if not accept_request(int(get_jwt_identity()), requester_id):
+        return jsonify({'error': 'Request not found'}), 404
+    return jsonify({'user_id': requester_id, 'status': 'connected'}), 200
+
+# GET /api/connections/requests - pending requests to and from the current user
+@connections_bp.route('/connections/requests', methods=['GET'])
+@jwt_required()
+def list_requests():
+    incoming, outgoing = pending_ids(int(get_jwt_identity()))
+    return jsonify({'incoming': profile_cards(incoming), 'outgoing': profile_cards(outgoing)}), 200
+
+# GET /api/users/<id>/connections?after=&limit=
+@connections_bp.route('/users/<int:user_id>/connections', methods=['GET'])
+@jwt_required()
+@read_replica
+def list_connections(user_id):
+    try:
+        after = parse_after()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    ids = connection_ids(user_id)
+    page, next_cursor = id_page(ids, after, parse_limit(request.args.get('limit')))
+    return jsonify({'count': len(ids), 'connections': profile_cards(page), 'next_cursor': next_cursor}), 200
+
+# GET /api/users/<id>/connections/mutual?after=&limit= - shared with the current user
+@connections_bp.route('/users/<int:other_id>/connections/mutual', methods=['GET'])
+@jwt_required()
+@read_replica
+def mutual_connections(other_id):
+    user_id = int(get_jwt_identity())
+    try:
+        after = parse_after()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    ids = load_connection_ids([user_id, other_id])
+    mutual = intersect(ids[user_id], ids[other_id])
+    page, next_cursor = id_page(mutual, after, parse_limit(request.args.get('limit')))
+    if other_id == user_id:
+        separation = 0
+    elif contains(ids[user_id], other_id):
+        separation = 1
+    else:
+        separation = 2 if mutual else None  # None: third degree or further
+    return jsonify({
+        'count': len(mutual),
+        'degree': separation,
+        'connections': profile_cards(page),
+        'next_cursor': next_cursor
+    }), 200
+
+# GET /api/connections/suggestions?limit= - people you may know
+@connections_bp.route('/connections/suggestions', methods=['GET'])
+@jwt_required()
+@read_replica
+def list_suggestions():
+    scored = suggestions(int(get_jwt_identity()), parse_limit(request.args.get('limit')))
+    mutual = dict(scored)
+    cards = profile_cards([user_id for user_id, count in scored])
+    for card in cards:
+        card['mutual_connections'] = mutual[card['user_id']]
+    return jsonify({'suggestions': cards}), 200
@@ -0,0 +1,101 @@
+import json
+import sys
+import threading
+import time
+
+from flask import Blueprint, Response, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location
+from auth_tokens import STREAM_SCOPE, issue_stream_token
+from config import EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_CONNECTIONS, EVENTS_TOKEN_SECONDS, WEB_THREADS
+from events import broker_is_shared, get_broker, publish, user_channel
+from signals import avatar_ready
+
+events_bp = Blueprint('events', __name__)
+
+def green_threads():
+    """Whether gevent or eventlet has replaced this process's threads with greenlets"""
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        return True
+    eventlet_patcher = sys.modules.get('eventlet.patcher')
+    return eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('thread')
+
+def stream_capacity():
+    """
+    Streams this worker may hold open. A stream is a greenlet under gevent or
+    eventlet, but with OS threads it holds one of the worker's WEB_THREADS for
+    as long as it lasts, so streams get at most half of them and other
+    requests still find a thread.
+    """
+    if green_threads():
+        return EVENTS_MAX_CONNECTIONS
+    return min(EVENTS_MAX_CONNECTIONS, WEB_THREADS // 2)
+
+# gunicorn's gevent and eventlet workers patch threads before the app is loaded
+_stream_slots = threading.BoundedSemaphore(max(stream_capacity(), 1))
+
+@avatar_ready.connect
+def push_avatar_ready(sender, user_id, image_url, thumbnail_url):
+    # Replaces polling GET /api/profile/image/jobs/<id>
+    publish([user_id], 'avatar.ready', {'image_url': image_url, 'thumbnail_url': thumbnail_url})
+
+def format_event(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+# POST /api/events/token - a short-lived token for GET /api/events?jwt=<token>
+@events_bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    return jsonify({'token': issue_stream_token(get_jwt()), 'expires_in': EVENTS_TOKEN_SECONDS}), 200
+
+# GET /api/events - Server-Sent Events for the current user. EventSource can't
+# send headers, so it passes a stream token as ?jwt=<token> instead; access
+# tokens are only taken from the Authorization header.
+@events_bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    claims = get_jwt()
+    if get_jwt_request_location() == 'query_string' and claims.get('scope') != STREAM_SCOPE:
+        return jsonify({'error': 'Pass a token from POST /api/events/token in the URL'}), 401
+    if not broker_is_shared():
+        return jsonify({'error': 'Real-time events are not available'}), 503
+    user_id = int(get_jwt_identity())
+    # A stream token's stream lasts as long as the access token it came from
+    expires_at = claims.get('session_exp', claims['exp'])
+    if not stream_capacity():
+        return jsonify({'error': 'Real-time events need a gevent worker or more threads'}), 503
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open event streams, please try again'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    subscription = get_broker().subscribe([user_channel(user_id)])
+
+    # Runs after the view has returned: it must not touch the database session
+    def generate():
+        yield 'retry: 3000\n' + format_event('ready', {'user_id': user_id})
+        while True:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                # The client reconnects with a refreshed token
+                yield format_event('token-expired', {})
+                return
+            event = subscription.get(timeout=min(EVENTS_HEARTBEAT_SECONDS, remaining))
+            if subscription.overflowed:
+                # Events were dropped: the client should reload what it shows
+                yield format_event('resync', {})
+                return
+            if event is None:
+                yield ': keepalive\n\n'  # Also how a closed connection is noticed
+            else:
+                yield format_event(event['type'], event['data'])
+
+    def close():
+        subscription.close()
+        _stream_slots.release()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    # The server closes the response when the stream ends or the client goes away
+    response.call_on_close(close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
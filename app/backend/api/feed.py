@@ -1,22 +1,153 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy import and_, or_, select
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from extensions import db
 from models.post import Post
+from models.profile import Profile
+from api.profile import avatar_media_key, avatar_thumbnail_url
+from variants import load_srcsets, media_key_for_url
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from streaming import STREAM_CHUNK_SIZE, stream_json
+from timeline import home_timeline
+from likes import load_likes
+from db_routing import read_replica
 
 feed_bp = Blueprint('feed', __name__)
 
+def load_authors(user_ids):
+    """Author cards for a set of user ids in a single IN query"""
+    if not user_ids:
+        return {}
+    rows = (db.session.query(Profile.user_id, Profile.name, Profile.title, Profile.avatar)
+            .filter(Profile.user_id.in_(user_ids))
+            .all())
+    return {
+        row.user_id: {
+            'user_id': row.user_id,
+            'name': row.name or '',
+            'title': row.title or '',
+            'avatar': row.avatar or '',
+            'avatar_thumbnail': avatar_thumbnail_url(row.avatar),
+            'avatar_srcset': {}
+        }
+        for row in rows
+    }
+
+def attach_srcsets(posts, authors):
+    """Resolve post media and author avatar variants for a batch in one query"""
+    srcsets = load_srcsets([media_key_for_url(post.media_url) for post in posts] +
+                           [avatar_media_key(author['avatar']) for author in authors.values()])
+    for author in authors.values():
+        author['avatar_srcset'] = srcsets.get(avatar_media_key(author['avatar']), {})
+    return srcsets
+
+def serialize_post(post, author=None, srcsets=None, likes=(0, False)):
+    return {
+        'id': post.id,
+        'user_id': post.user_id,
+        'author': author or {'user_id': post.user_id, 'name': '', 'title': '', 'avatar': '',
+                             'avatar_thumbnail': '', 'avatar_srcset': {}},
+        'content': post.content,
+        'created_at': post.created_at.isoformat() if post.created_at else '',
+        'likes': likes[0],
+        'liked_by_me': likes[1],
+        'comment_count': post.comment_count,
+        'media_url': post.media_url,
+        'media_srcset': (srcsets or {}).get(media_key_for_url(post.media_url), {})
+    }
+
+def current_user_id():
+    """User id from a valid JWT, or None for anonymous (or stale-token) requests"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    return int(identity) if identity is not None else None
+
+class FeedPage:
+    """
+    Serializes one page of posts lazily and records where the next page starts.
+
+    Posts are consumed a chunk at a time; the authors of each chunk, the
+    image variants of their avatars and media, and the like counts (with
+    whether the viewer liked each post) are resolved with one query each, so
+    the query count doesn't grow with page size.
+    """
+
+    def __init__(self, posts, limit, next_key=None, viewer_id=None):
+        self.posts = posts
+        self.limit = limit
+        self.next_key = next_key
+        self.viewer_id = viewer_id
+
+    def _chunks(self):
+        if hasattr(self.posts, 'partitions'):
+            yield from self.posts.partitions()
+            return
+        for start in range(0, len(self.posts), STREAM_CHUNK_SIZE):
+            yield self.posts[start:start + STREAM_CHUNK_SIZE]
+
+    def __iter__(self):
+        remaining = self.limit
+        last = None
+        has_more = False
+        for chunk in self._chunks():
+            if remaining == 0:
+                has_more = bool(chunk)
+                break
+            page_rows = chunk[:remaining]
+            authors = load_authors({post.user_id for post in page_rows})
+            srcsets = attach_srcsets(page_rows, authors)
+            likes = load_likes([post.id for post in page_rows], self.viewer_id)
+            for post in page_rows:
+                yield serialize_post(post, authors.get(post.user_id), srcsets, likes.get(post.id, (0, False)))
+            last = page_rows[-1]
+            remaining -= len(page_rows)
+            if len(chunk) > len(page_rows):
+                has_more = True
+                break
+        if has_more:
+            # The extra row only tells us another page exists
+            self.next_key = (last.created_at, last.id)
+
+    def next_cursor(self):
+        return encode_cursor(*self.next_key) if self.next_key else None
+
+def global_feed(before, limit, viewer_id=None):
+    query = select(Post)
+    if before:
+        created_at, post_id = before
+        # Seek past the last row of the previous page (served by ix_posts_created_at_id)
+        query = query.where(or_(
+            Post.created_at < created_at,
+            and_(Post.created_at == created_at, Post.id < post_id)
+        ))
+    # Newest first; fetch one extra row to know whether another page exists.
+    # yield_per streams rows from a server-side cursor instead of buffering them all.
+    query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+    return FeedPage(db.session.execute(query.execution_options(yield_per=STREAM_CHUNK_SIZE)).scalars(), limit,
+                    viewer_id=viewer_id)
+
 @feed_bp.route('/feed', methods=['GET', 'OPTIONS'])
+@read_replica
 def get_feed():
     if request.method == 'OPTIONS':
         return '', 200
-    # Fetch all posts, newest first
-    posts = Post.query.order_by(Post.created_at.desc()).all()
-    feed = []
-    for post in posts:
-        feed.append({
-            'id': post.id,
-            'user_id': post.user_id,
-            'content': post.content,
-            'created_at': post.created_at.isoformat() if post.created_at else '',
-            'likes': 0,  # Placeholder, update if you have likes logic
-            'media_url': post.media_url
-        })
-    return jsonify({'feed': feed}), 200 
\ No newline at end of file
+    limit = parse_limit(request.args.get('limit'))
+    before = request.args.get('before')
+    if before:
+        try:
+            before = decode_cursor(before)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    user_id = current_user_id()
+    if user_id is not None and request.args.get('scope') == 'home':
+        # Precomputed home timeline; cursors order by post id
+        posts, next_key = home_timeline(user_id, before[1] if before else None, limit)
+        page = FeedPage(posts, limit, next_key, user_id)
+    else:
+        page = global_feed(before, limit, user_id)
+
+    return stream_json({'feed': page, 'next_cursor': page.next_cursor}, 'feed'), 200
@@ -0,0 +1,36 @@
+from flask import Blueprint, jsonify
+from extensions import db
+from models.follow import Follow
+from models.user import User
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from timeline import backfill_followee
+
+follows_bp = Blueprint('follows', __name__)
+
+# POST /api/users/<id>/follow
+@follows_bp.route('/users/<int:followee_id>/follow', methods=['POST'])
+@jwt_required()
+def follow_user(followee_id):
+    user_id = int(get_jwt_identity())
+    if followee_id == user_id:
+        return jsonify({'error': 'You cannot follow yourself'}), 400
+    if not db.session.get(User, followee_id):
+        return jsonify({'error': 'User not found'}), 404
+    if not db.session.get(Follow, (user_id, followee_id)):
+        db.session.add(Follow(follower_id=user_id, followee_id=followee_id))
+        db.session.commit()
+        try:
+            backfill_followee(user_id, followee_id)
+        except Exception as e:
+            print(f'Timeline backfill error: {str(e)}')
+    return jsonify({'message': 'Following', 'followee_id': followee_id}), 200
+
+# DELETE /api/users/<id>/follow
+@follows_bp.route('/users/<int:followee_id>/follow', methods=['DELETE'])
+@jwt_required()
+def unfollow_user(followee_id):
+    user_id = int(get_jwt_identity())
+    Follow.query.filter_by(follower_id=user_id, followee_id=followee_id).delete()
+    db.session.commit()
+    # Stale timeline entries are filtered out when the feed is read
+    return jsonify({'message': 'Unfollowed', 'followee_id': followee_id}), 200
@@ -0,0 +1,50 @@
+import hmac
+import time
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import text
+
+from cache import get_profile_cache
+from config import HEALTH_TOKEN
+from extensions import db
+from db_engine import pool_status
+from db_routing import replica_monitor
+
+health_bp = Blueprint('health', __name__)
+
+def show_details():
+    """Pool internals and replica errors are only for callers with HEALTH_TOKEN"""
+    token = request.headers.get('X-Health-Token', '')
+    return bool(HEALTH_TOKEN) and hmac.compare_digest(token, HEALTH_TOKEN)
+
+# GET /api/health - process is up (no database access, for load balancer checks)
+@health_bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'})
+
+# GET /api/health/db - 'ok', 'degraded' (a replica is skipped) or 'error' for this worker;
+# with X-Health-Token also the round trip, connection pool metrics, replica lag and cache counters
+@health_bp.route('/health/db', methods=['GET'])
+def database_health():
+    start = time.perf_counter()
+    try:
+        db.session.execute(text('SELECT 1'))
+        db.session.rollback()
+    except Exception as e:
+        print(f'Database health check failed: {str(e)}')
+        db.session.rollback()
+        body = {'status': 'error'}
+        if show_details():
+            body.update({'error': 'Database unavailable', 'pool': pool_status(db.engine)})
+        return jsonify(body), 503
+    replicas = replica_monitor.status()
+    body = {'status': 'degraded' if any(not replica['healthy'] for replica in replicas.values()) else 'ok'}
+    if show_details():
+        body.update({
+            'driver': db.engine.dialect.driver,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+            'pool': pool_status(db.engine),
+            'replicas': replicas,
+            'caches': {'profile': get_profile_cache().stats()}
+        })
+    return jsonify(body)
@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify
+from extensions import db
+from models.post import Post
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from likes import like_count, like_post, unlike_post
+
+likes_bp = Blueprint('likes', __name__)
+
+# POST /api/posts/<id>/like
+@likes_bp.route('/posts/<int:post_id>/like', methods=['POST'])
+@jwt_required()
+def like(post_id):
+    if not db.session.get(Post, post_id):
+        return jsonify({'error': 'Post not found'}), 404
+    like_post(post_id, int(get_jwt_identity()))
+    return jsonify({'post_id': post_id, 'likes': like_count(post_id), 'liked': True}), 200
+
+# DELETE /api/posts/<id>/like
+@likes_bp.route('/posts/<int:post_id>/like', methods=['DELETE'])
+@jwt_required()
+def unlike(post_id):
+    unlike_post(post_id, int(get_jwt_identity()))
+    return jsonify({'post_id': post_id, 'likes': like_count(post_id), 'liked': False}), 200
@@ -0,0 +1,107 @@
+"""
+Serving uploaded images and videos: /uploads/profile_images/<name> and
+/uploads/post_media/<name>.
+
+Files in the content-addressed store never change under a given name, so
+they get a strong ETag from their hash and a year-long immutable
+Cache-Control. Range requests (video seeking) and If-None-Match are answered
+by werkzeug. With MEDIA_OFFLOAD the response carries only headers and the
+front server sends the bytes (X-Sendfile for Apache/lighttpd,
+X-Accel-Redirect for nginx); without it, the WSGI server's file_wrapper
+(sendfile() under gunicorn) still streams the file without copying it
+through Python. With MEDIA_STORAGE=s3, store files are a redirect to the
+bucket or CDN.
+"""
+import mimetypes
+import os
+
+from flask import Blueprint, abort, current_app, redirect, request, send_file
+from werkzeug.security import safe_join
+
+from config import MEDIA_OFFLOAD, MEDIA_ACCEL_PREFIX, S3_PUBLIC_URL, S3_PRESIGN_EXPIRES
+import media_store
+from storage import get_storage
+
+media_bp = Blueprint('media', __name__)
+
+# Files saved under their upload names before the media store; resolved once at import
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+LEGACY_FOLDERS = {
+    'profile_images': os.path.join(UPLOADS_DIR, 'profile_images'),
+    'post_media': os.path.join(UPLOADS_DIR, 'post_media'),
+}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 24 * 3600  # Old timestamped names could in principle be overwritten
+
+# Variant formats missing from older mimetypes tables
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+
+def media_etag(filename):
+    """Strong validator for a content-addressed name: the hash plus the rendition suffix"""
+    return filename.rsplit('.', 1)[0]
+
+
+def accel_location(folder, filename):
+    """
+    nginx internal URI for a file: <prefix>/store/ab/cd/<name> for the media
+    store, <prefix>/<folder>/<name> for legacy files
+    """
+    prefix = MEDIA_ACCEL_PREFIX.rstrip('/')
+    key = media_store.blob_key(filename)
+    if key is None:
+        return f'{prefix}/{folder}/{filename}'
+    return f'{prefix}/store/{key}'
+
+
+def offload_response(header, value, filename, etag, max_age, immutable):
+    """Headers-only response; the front server reads the file and answers Range itself"""
+    response = current_app.response_class(status=200)
+    response.headers[header] = value
+    response.content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if etag:
+        response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
+
+@media_bp.route('/uploads/<any(profile_images, post_media):folder>/<filename>', methods=['GET', 'HEAD'])
+def serve_media(folder, filename):
+    key = media_store.blob_key(filename)
+    storage = get_storage()
+    if key is not None and not storage.is_local:
+        # The bytes come straight from the bucket or CDN
+        response = redirect(storage.url(key), code=302)
+        response.cache_control.public = True
+        # A presigned URL must not be reused past its expiry
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE if S3_PUBLIC_URL else S3_PRESIGN_EXPIRES // 2
+        return response
+
+    directory = os.path.dirname(storage.path(key)) if key else LEGACY_FOLDERS[folder]
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    content_addressed = key is not None
+    etag = media_etag(filename) if content_addressed else None
+    max_age = IMMUTABLE_MAX_AGE if content_addressed else LEGACY_MAX_AGE
+
+    if MEDIA_OFFLOAD in ('accel', 'sendfile'):
+        if etag and etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        if MEDIA_OFFLOAD == 'accel':
+            return offload_response('X-Accel-Redirect', accel_location(folder, filename),
+                                    filename, etag, max_age, content_addressed)
+        return offload_response('X-Sendfile', path, filename, etag, max_age, content_addressed)
+
+    # etag=True falls back to werkzeug's mtime/size tag for legacy files
+    response = send_file(path, conditional=True, etag=etag or True, max_age=max_age)
+    response.accept_ranges = 'bytes'
+    response.cache_control.public = True
+    response.cache_control.immutable = content_addressed
+    return response
@@ -1,5 +1,124 @@
-from flask import Blueprint
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from api.feed import load_authors
+from messaging import (MessagingError, history, inbox, mark_read, members, participant, send_message,
+                       start_conversation, unread_total)
+from pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from db_routing import read_replica
+from events import publish
 
 messaging_bp = Blueprint('messaging', __name__)
- 
-# Routes will be implemented here 
\ No newline at end of file
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'sender_id': message.sender_id,
+        'content': message.content,
+        'created_at': message.created_at.isoformat() if message.created_at else ''
+    }
+
+# POST /api/conversations - start (or find) a conversation: {"participant_ids": [...]}
+@messaging_bp.route('/conversations', methods=['POST'])
+@jwt_required()
+def create_conversation():
+    data = request.get_json(silent=True) or {}
+    other_ids = data.get('participant_ids')
+    if not isinstance(other_ids, list) or not all(isinstance(other_id, int) for other_id in other_ids):
+        return jsonify({'error': 'participant_ids must be a list of user ids'}), 400
+    try:
+        conversation_id, created = start_conversation(int(get_jwt_identity()), other_ids)
+    except MessagingError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'conversation_id': conversation_id}), 201 if created else 200
+
+# GET /api/conversations?before=&limit= - the inbox, most recently active first
+@messaging_bp.route('/conversations', methods=['GET'])
+@jwt_required()
+@read_replica
+def list_conversations():
+    user_id = int(get_jwt_identity())
+    limit = parse_limit(request.args.get('limit'))
+    before = request.args.get('before')
+    if before:
+        try:
+            before = decode_cursor(before)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    rows = inbox(user_id, before, limit)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = encode_cursor(last.last_message_at, last.conversation_id)
+    rows = rows[:limit]
+    people = members([row[0].conversation_id for row in rows])
+    authors = load_authors({member for ids in people.values() for member in ids})
+    conversations = []
+    for entry, message in rows:
+        conversations.append({
+            'id': entry.conversation_id,
+            'participants': [authors[member] for member in people[entry.conversation_id]
+                             if member != user_id and member in authors],
+            'last_message': serialize_message(message) if message else None,
+            'last_message_at': entry.last_message_at.isoformat(),
+            'unread_count': entry.unread_count,
+            'last_read_message_id': entry.last_read_message_id
+        })
+    return jsonify({'conversations': conversations, 'next_cursor': next_cursor}), 200
+
+# GET /api/conversations/<id>/messages?before=&limit= - history, newest first
+@messaging_bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
+@jwt_required()
+@read_replica
+def list_messages(conversation_id):
+    if not participant(conversation_id, int(get_jwt_identity())):
+        return jsonify({'error': 'Conversation not found'}), 404
+    limit = parse_limit(request.args.get('limit'))
+    try:
+        before = int(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    messages = history(conversation_id, before, limit)
+    next_cursor = str(messages[limit - 1].id) if len(messages) > limit else None
+    return jsonify({'messages': [serialize_message(message) for message in messages[:limit]],
+                    'next_cursor': next_cursor}), 200
+
+# POST /api/conversations/<id>/messages - {"content"}
+@messaging_bp.route('/conversations/<int:conversation_id>/messages', methods=['POST'])
+@jwt_required()
+def create_message(conversation_id):
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    content = (data.get('content') or '').strip()
+    if not content:
+        return jsonify({'error': 'Content is required'}), 400
+    if not participant(conversation_id, user_id):
+        return jsonify({'error': 'Conversation not found'}), 404
+    message, recipients = send_message(conversation_id, user_id, content)
+    body = serialize_message(message)
+    # The sender's other devices get it too
+    publish([*recipients, user_id], 'message.created', body)
+    return jsonify({'message': body}), 201
+
+# POST /api/conversations/<id>/read - {"message_id"} (optional; default: everything)
+@messaging_bp.route('/conversations/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def read_conversation(conversation_id):
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    message_id = data.get('message_id')
+    if message_id is not None and not isinstance(message_id, int):
+        return jsonify({'error': 'Invalid message_id'}), 400
+    if not participant(conversation_id, user_id):
+        return jsonify({'error': 'Conversation not found'}), 404
+    unread = mark_read(conversation_id, user_id, message_id)
+    status = {'conversation_id': conversation_id, 'unread_count': unread, 'total_unread': unread_total(user_id)}
+    publish([user_id], 'conversation.read', status)
+    return jsonify(status), 200
+
+# GET /api/messages/unread - unread messages across all conversations
+@messaging_bp.route('/messages/unread', methods=['GET'])
+@jwt_required()
+def get_unread():
+    return jsonify({'unread': unread_total(int(get_jwt_identity()))}), 200
@@ -1,23 +1,27 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify
 from extensions import db
 from models.post import Post
+from models.upload import UploadSession
 import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from timeline import fan_out_post
+from events import publish
+from search_index import index_post
+from tasks import submit_task
+from images import generate_variants
+from variants import VARIANT_SOURCE_EXTENSIONS, record_variants, variant_settings
+from models.media_variant import MediaVariant
+import media_store
+from storage import run_in_storage
 
 posts_bp = Blueprint('posts', __name__)
  
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads/post_media')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
 MAX_MEDIA_SIZE = 10 * 1024 * 1024  # 10MB
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def ensure_upload_folder():
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
 @posts_bp.route('/posts', methods=['POST'])
 @jwt_required()
 def create_post():
@@ -40,12 +44,21 @@ def create_post():
         file.seek(0)
         if file_size > MAX_MEDIA_SIZE:
             return jsonify({'error': 'File too large (max 10MB)'}), 400
-        ensure_upload_folder()
         ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"post_{user_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}.{ext}"
-        save_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(save_path)
-        media_url = f'/uploads/post_media/{filename}'
+        blob, created = media_store.store_upload(file, ext)
+        media_url = f'/uploads/post_media/{blob.filename}'
+        schedule_post_media_variants(blob.filename, created)
+    elif request.form.get('upload_id'):
+        # Media sent earlier through the chunked upload API
+        upload = UploadSession.query.filter_by(
+            id=request.form['upload_id'], user_id=int(user_id), status='complete').first()
+        if not upload:
+            return jsonify({'error': 'Upload not found or not finalized'}), 400
+        upload.status = 'attached'
+        media_url = upload.media_url
+
+    if media_url:
+        media_store.acquire(media_store.sha_from_name(media_url.rsplit('/', 1)[1]))
 
     post = Post(
         user_id=user_id,
@@ -56,6 +69,17 @@ def create_post():
     )
     db.session.add(post)
     db.session.commit()
+    try:
+        recipients = fan_out_post(post)
+    except Exception as e:
+        # The post is already committed; don't fail the request over timeline delivery
+        print(f'Timeline fan-out error: {str(e)}')
+    else:
+        publish(recipients, 'post.created', {'post_id': post.id, 'user_id': post.user_id})
+    try:
+        index_post(post)
+    except Exception as e:
+        print(f'Search indexing error: {str(e)}')
     return jsonify({
         'message': 'Post created successfully',
         'post': {
@@ -69,10 +93,25 @@ def create_post():
         }
     }), 201
 
-# Serve uploaded post media
-@posts_bp.route('/uploads/post_media/<filename>')
-def serve_post_media(filename):
+def schedule_post_media_variants(filename, created=True):
+    """
+    Generate responsive variants of a stored post image in the background.
+    Skipped for a duplicate upload whose variants already exist.
+    """
+    ext = filename.rsplit('.', 1)[1].lower()
+    if ext not in VARIANT_SOURCE_EXTENSIONS:
+        return
+    if not created and MediaVariant.query.filter_by(media_key=f'post_media/{filename}').first():
+        return
+    widths, formats = variant_settings()
+    submit_task(run_in_storage, generate_variants, media_store.blob_key(filename), filename, widths, formats,
+                on_done=lambda future: save_post_media_variants(filename, future))
+
+def save_post_media_variants(filename, future):
     try:
-        return send_from_directory(UPLOAD_FOLDER, filename)
+        variants = future.result()
     except Exception as e:
-        return jsonify({'error': 'Media not found'}), 404 
\ No newline at end of file
+        print(f'Image variant error for {filename}: {str(e)}')
+        return
+    record_variants(f'post_media/{filename}', variants)
+    db.session.commit()
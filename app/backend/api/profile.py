@@ -1,34 +1,85 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app
 from extensions import db
-from models.profile import Profile
-import os
-from werkzeug.utils import secure_filename
+from models.profile import Profile, experience_company_filter
+from models.image_job import ImageJob
+from pagination import parse_limit
+from skills import sync_profile_skills
+from search_index import index_profile
+from tasks import submit_task
+from images import process_avatar
+from signals import avatar_ready
+from events import publish
+from variants import load_srcsets, record_variants, variant_settings
+import media_store
+from storage import get_storage, run_in_storage
 from PIL import Image
 import io
-import secrets
-import json
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from cache import get_profile_cache
+from db_routing import read_replica
 
 profile_bp = Blueprint('profile', __name__)
  
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads/profile_images')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
-THUMBNAIL_SIZE = (128, 128)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def ensure_upload_folder():
-    """Ensure upload folder exists"""
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+def avatar_thumbnail_url(avatar):
+    """Thumbnail URL for a stored avatar filename (avatars set as URLs are returned as-is)"""
+    if not avatar:
+        return ''
+    if avatar.startswith(('/', 'http://', 'https://')):
+        return avatar
+    return f'/uploads/profile_images/thumb_{avatar}'
+
+def avatar_media_key(avatar):
+    """Variant lookup key for an uploaded avatar filename (None for external URLs)"""
+    if not avatar or avatar.startswith(('/', 'http://', 'https://')):
+        return None
+    return f'profile_images/{avatar}'
+
+def profile_card(profile):
+    """Compact public view of a profile for lists and search results"""
+    return {
+        'user_id': profile.user_id,
+        'name': profile.name,
+        'title': profile.title,
+        'avatar_thumbnail': avatar_thumbnail_url(profile.avatar)
+    }
+
+def profile_cache_key(user_id, version=None):
+    return str(user_id) if version is None else f'{user_id}:{version}'
+
+def touch_profile(profile):
+    """Bump the profile's cache_version with a pending change (before the commit)"""
+    if profile.id is not None:
+        profile.cache_version = Profile.cache_version + 1
+
+def invalidate_profile_cache(user_id):
+    get_profile_cache().delete(profile_cache_key(user_id))
 
 # GET /api/profile
 @profile_bp.route('/profile', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_profile():
     try:
         user_id = get_jwt_identity()  # Use the real user ID from JWT
+        cache = get_profile_cache()
+        if cache.shared:
+            cache_key = profile_cache_key(user_id)
+        else:
+            # Another worker's write can't reach this cache; key by the version every write bumps.
+            # A hit still costs this query, and saves only loading and encoding the profile.
+            version = db.session.execute(
+                db.select(Profile.cache_version).where(Profile.user_id == user_id)).scalar()
+            cache_key = profile_cache_key(user_id, version)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return current_app.response_class(cached, mimetype='application/json')
+
         profile = Profile.query.filter_by(user_id=user_id).first()
         
         if not profile:
@@ -38,6 +89,7 @@ def get_profile():
                 'user_id': user_id,
                 'name': '',
                 'avatar': '',
+                'avatar_srcset': {},
                 'title': '',
                 'location': '',
                 'bio': '',
@@ -49,18 +101,20 @@ def get_profile():
                 'activity': []
             })
         
-        # Parse JSON fields
-        social = json.loads(profile.social) if profile.social else {}
-        activity = json.loads(profile.activity) if profile.activity else {}
-        education = json.loads(profile.education) if profile.education else []
-        experience = json.loads(profile.experience) if profile.experience else []
-        contact = json.loads(profile.contact) if profile.contact else {}
+        # JSON fields come back from the database already decoded
+        social = profile.social or {}
+        activity = profile.activity or {}
+        education = profile.education or []
+        experience = profile.experience or []
+        contact = profile.contact or {}
+        avatar_key = avatar_media_key(profile.avatar)
         
-        return jsonify({
+        response = jsonify({
             'id': profile.id,
             'user_id': profile.user_id,
             'name': profile.name,
             'avatar': profile.avatar,
+            'avatar_srcset': load_srcsets([avatar_key]).get(avatar_key, {}),
             'title': profile.title,
             'location': profile.location,
             'bio': profile.bio,
@@ -71,10 +125,29 @@ def get_profile():
             'social': social,
             'activity': activity
         })
+        # Cache the encoded body so hits skip loading the profile and the encoding
+        cache.set(cache_key, response.get_data())
+        return response
     except Exception as e:
         print(f'Error in get_profile: {str(e)}')
         return jsonify({'error': 'Failed to load profile'}), 500
 
+# GET /api/profiles?company=
+@profile_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@read_replica
+def list_profiles():
+    company = (request.args.get('company') or '').strip()
+    if not company:
+        return jsonify({'error': 'company is required'}), 400
+    limit = parse_limit(request.args.get('limit'))
+    profiles = (Profile.query
+                .filter(experience_company_filter(company, db.engine.dialect.name))
+                .order_by(Profile.id)
+                .limit(limit)
+                .all())
+    return jsonify({'profiles': [profile_card(profile) for profile in profiles]})
+
 # PUT /api/profile
 @profile_bp.route('/profile', methods=['PUT'])
 @jwt_required()
@@ -89,6 +162,7 @@ def update_profile():
         if not profile:
             profile = Profile(user_id=user_id)
             db.session.add(profile)
+        old_avatar = profile.avatar
 
         # Update all simple fields
         for field in ['name', 'title', 'location', 'bio', 'skills', 'email', 'avatar']:
@@ -98,9 +172,21 @@ def update_profile():
         # Update JSON fields
         for field in ['experience', 'education', 'contact', 'social', 'activity']:
             if field in data:
-                setattr(profile, field, json.dumps(data[field]))
+                setattr(profile, field, data[field])
+
+        if 'skills' in data:
+            sync_profile_skills(profile)
+        if profile.avatar != old_avatar:
+            set_avatar_reference(old_avatar, profile.avatar)
+        touch_profile(profile)
 
         db.session.commit()
+        invalidate_profile_cache(user_id)
+        try:
+            index_profile(profile)
+        except Exception as e:
+            print(f'Search indexing error: {str(e)}')
+        publish([int(user_id)], 'profile.updated', {'user_id': int(user_id)})
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -114,11 +200,11 @@ def update_profile():
                 'bio': profile.bio,
                 'skills': profile.skills,
                 'email': getattr(profile, 'email', ''),
-                'experience': json.loads(profile.experience) if profile.experience else [],
-                'education': json.loads(profile.education) if profile.education else [],
-                'contact': json.loads(profile.contact) if profile.contact else {},
-                'social': json.loads(profile.social) if profile.social else {},
-                'activity': json.loads(profile.activity) if profile.activity else []
+                'experience': profile.experience or [],
+                'education': profile.education or [],
+                'contact': profile.contact or {},
+                'social': profile.social or {},
+                'activity': profile.activity or []
             }
         })
     except Exception as e:
@@ -151,66 +237,104 @@ def upload_profile_image():
         if file_size > MAX_IMAGE_SIZE:
             return jsonify({'error': f'File too large. Maximum size is {MAX_IMAGE_SIZE // (1024*1024)}MB'}), 400
         
-        # Ensure upload folder exists
-        ensure_upload_folder()
-        
-        # Generate secure filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        random_hex = secrets.token_hex(8)
-        filename = f"profile_{user_id}_{random_hex}.{ext}"
-        save_path = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Process and save image
+        # Reject non-images up front; Image.open only parses the header
         try:
-            img = Image.open(file.stream)
-            
-            # Convert to RGB if needed
-            if ext in ("jpg", "jpeg", "png") and img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            
-            # Resize if too large (max 512x512)
-            if img.size[0] > 512 or img.size[1] > 512:
-                img.thumbnail((512, 512), Image.Resampling.LANCZOS)
-            
-            # Save original image
-            img.save(save_path, format=img.format if img.format else ext.upper(), quality=85)
-            
-            # Generate thumbnail
-            thumb = img.copy()
-            thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-            thumb_filename = f"thumb_{filename}"
-            thumb_save_path = os.path.join(UPLOAD_FOLDER, thumb_filename)
-            thumb.save(thumb_save_path, format='JPEG', quality=80)
-            
-        except Exception as e:
-            print(f'Image processing error: {str(e)}')
+            Image.open(file.stream)
+        except Exception:
             return jsonify({'error': 'Failed to process image'}), 400
+        file.seek(0)
         
-        # Update profile with new image
-        profile = Profile.query.filter_by(user_id=user_id).first()
-        if not profile:
-            profile = Profile(user_id=user_id, name='')
-            db.session.add(profile)
-        
-        profile.avatar = filename
+        # Store the original by content hash; the resized avatar is named after it
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        blob, created = media_store.store_upload(file, ext)
+        filename = f'{blob.sha256}_avatar.{blob.ext}'
+        job = ImageJob(user_id=user_id, filename=filename, status='pending')
+        db.session.add(job)
         db.session.commit()
+        job_id = job.id
+
+        if not created and get_storage().exists(media_store.blob_key(f'thumb_{filename}')):
+            # Someone already uploaded this image: reuse its avatar, thumbnail and variants
+            apply_avatar(job, filename, f'thumb_{filename}')
+            return jsonify({**serialize_image_job(job), 'message': 'Image uploaded',
+                            'status_url': f'/api/profile/image/jobs/{job_id}'}), 200
+
+        # Hand resizing to a background worker
+        widths, formats = variant_settings()
+        submit_task(run_in_storage, process_avatar, media_store.blob_key(blob.filename), filename, widths, formats,
+                    on_done=lambda future: finish_image_job(job_id, future))
         
         return jsonify({
-            'message': 'Image uploaded successfully',
-            'image_url': f'/uploads/profile_images/{filename}',
-            'thumbnail_url': f'/uploads/profile_images/{thumb_filename}',
-            'filename': filename
-        })
+            'message': 'Image uploaded, processing',
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': f'/api/profile/image/jobs/{job_id}'
+        }), 202
         
     except Exception as e:
         print(f'Error in upload_profile_image: {str(e)}')
         return jsonify({'error': f'Failed to upload image: {str(e)}'}), 500
 
-# Serve uploaded images
-@profile_bp.route('/uploads/profile_images/<filename>')
-def serve_profile_image(filename):
+def finish_image_job(job_id, future):
+    """Record a finished avatar job and point the profile at the new image"""
+    job = db.session.get(ImageJob, job_id)
+    if job is None:
+        return
     try:
-        return send_from_directory(UPLOAD_FOLDER, filename)
+        filename, thumb_filename, variants = future.result()
     except Exception as e:
-        print(f'Error serving image {filename}: {str(e)}')
-        return jsonify({'error': 'Image not found'}), 404 
\ No newline at end of file
+        print(f'Image processing error: {str(e)}')
+        job.status = 'failed'
+        job.error = 'Failed to process image'
+        db.session.commit()
+        return
+    apply_avatar(job, filename, thumb_filename, variants)
+
+def apply_avatar(job, filename, thumb_filename, variants=None):
+    """Mark an avatar job ready and point the profile at its image"""
+    job.status = 'ready'
+    job.thumbnail_filename = thumb_filename
+    # Update profile with new image
+    profile = Profile.query.filter_by(user_id=job.user_id).first()
+    if not profile:
+        profile = Profile(user_id=job.user_id, name='')
+        db.session.add(profile)
+    if profile.avatar != filename:
+        set_avatar_reference(profile.avatar, filename)
+    profile.avatar = filename
+    if variants is not None:
+        record_variants(avatar_media_key(filename), variants)
+    touch_profile(profile)
+    db.session.commit()
+    invalidate_profile_cache(job.user_id)
+    avatar_ready.send(current_app._get_current_object(), user_id=job.user_id,
+                      image_url=f'/uploads/profile_images/{filename}',
+                      thumbnail_url=f'/uploads/profile_images/{thumb_filename}')
+
+def set_avatar_reference(old_avatar, new_avatar):
+    """Move a media store reference from the old avatar's blob to the new one's"""
+    media_store.release(media_store.sha_from_name(old_avatar))
+    media_store.acquire(media_store.sha_from_name(new_avatar))
+
+def serialize_image_job(job):
+    data = {'job_id': job.id, 'status': job.status}
+    if job.status == 'ready':
+        data.update({
+            'image_url': f'/uploads/profile_images/{job.filename}',
+            'thumbnail_url': f'/uploads/profile_images/{job.thumbnail_filename}',
+            'filename': job.filename,
+            'srcset': load_srcsets([avatar_media_key(job.filename)]).get(avatar_media_key(job.filename), {})
+        })
+    elif job.status == 'failed':
+        data['error'] = job.error
+    return data
+
+# GET /api/profile/image/jobs/<id>
+@profile_bp.route('/profile/image/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_image_job(job_id):
+    user_id = int(get_jwt_identity())
+    job = ImageJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(serialize_image_job(job))
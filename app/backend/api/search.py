@@ -0,0 +1,82 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.post import Post
+from models.profile import Profile
+from pagination import parse_limit
+from skills import search_profile_ids
+from search_index import get_search_index
+from api.profile import profile_card
+from api.feed import attach_srcsets, load_authors, serialize_post
+from likes import load_likes
+from db_routing import read_replica
+
+search_bp = Blueprint('search', __name__)
+
+# GET /api/search/people?skill=python&skill=sql&mode=all|any
+@search_bp.route('/search/people', methods=['GET'])
+@jwt_required()
+@read_replica
+def search_people():
+    skills = []
+    for value in request.args.getlist('skill'):
+        skills.extend(part for part in value.split(',') if part.strip())
+    if not skills:
+        return jsonify({'error': 'At least one skill is required'}), 400
+    mode = request.args.get('mode', 'all')
+    if mode not in ('all', 'any'):
+        return jsonify({'error': 'mode must be "all" or "any"'}), 400
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit = parse_limit(request.args.get('limit'))
+
+    profile_ids = search_profile_ids(skills, match_all=(mode == 'all'), after=after, limit=limit + 1)
+    next_cursor = None
+    if len(profile_ids) > limit:
+        profile_ids = profile_ids[:limit]
+        next_cursor = str(profile_ids[-1])
+    profiles = {profile.id: profile for profile in Profile.query.filter(Profile.id.in_(profile_ids)).all()} if profile_ids else {}
+    return jsonify({
+        'people': [profile_card(profiles[profile_id]) for profile_id in profile_ids if profile_id in profiles],
+        'next_cursor': next_cursor
+    })
+
+# GET /api/search?q=&type=posts|people&page=
+@search_bp.route('/search', methods=['GET'])
+@jwt_required()
+@read_replica
+def search():
+    text = (request.args.get('q') or '').strip()
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
+    kind = request.args.get('type', 'posts')
+    if kind not in ('posts', 'people'):
+        return jsonify({'error': 'type must be "posts" or "people"'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        page = 1
+    limit = parse_limit(request.args.get('limit'))
+    index = get_search_index()
+
+    # Ranked ids from the index, then one IN query for the rows themselves
+    if kind == 'posts':
+        ids = index.search_posts(text, limit=limit + 1, offset=(page - 1) * limit)
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        posts = {post.id: post for post in Post.query.filter(Post.id.in_(ids)).all()} if ids else {}
+        authors = load_authors({post.user_id for post in posts.values()})
+        srcsets = attach_srcsets(list(posts.values()), authors)
+        likes = load_likes(list(posts), int(get_jwt_identity()))
+        results = [serialize_post(posts[post_id], authors.get(posts[post_id].user_id), srcsets,
+                                  likes.get(post_id, (0, False)))
+                   for post_id in ids if post_id in posts]
+    else:
+        ids = index.search_profiles(text, limit=limit + 1, offset=(page - 1) * limit)
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        profiles = {profile.user_id: profile for profile in Profile.query.filter(Profile.user_id.in_(ids)).all()} if ids else {}
+        results = [profile_card(profiles[user_id]) for user_id in ids if user_id in profiles]
+
+    return jsonify({'results': results, 'page': page, 'next_page': page + 1 if has_more else None})
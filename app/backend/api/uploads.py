@@ -0,0 +1,439 @@
+"""
+Resumable, chunked media uploads (modelled on the tus protocol).
+
+    POST  /api/uploads                     {"filename": "clip.mp4", "size": 73400320}
+    PATCH /api/uploads/<id>                raw bytes, Upload-Offset: <bytes already sent>
+    HEAD  /api/uploads/<id>                current Upload-Offset, to resume after a drop
+    POST  /api/uploads/<id>/finalize       -> media_url and sha256
+
+With object storage (MEDIA_STORAGE=s3) a client can instead ask for a
+direct upload, {"filename", "size", "sha256", "direct": true}, and PUT the
+bytes straight to the bucket: one presigned URL, or presigned part URLs
+for files over S3_MULTIPART_CHUNK_SIZE (finalize with {"parts": [{"part_number",
+"etag"}]}). A single PUT is checked against the SHA-256 by the storage
+itself; a multipart object is re-hashed by a background worker
+('verifying') before it can be attached. A file that is already stored
+needs no upload at all.
+
+Chunks are streamed from the request straight to a part file in fixed-size
+blocks, so worker memory stays constant whatever the media size. The file
+type is checked against its magic bytes as soon as they arrive and the
+SHA-256 is computed as the bytes go by. Finalized uploads are attached to a
+post with POST /api/posts (upload_id=<id>).
+
+With object storage the part file would be on one node's disk, so each chunk
+is sent on as one part of an S3 multipart upload under tmp/uploads/ instead,
+and any node can take the next PATCH. Chunks must then be exactly
+chunk_size bytes (the last may be shorter), and finalize hashes the
+assembled object on a background worker ('verifying') before it is moved
+to its content-addressed key.
+"""
+import base64
+import hashlib
+import math
+import os
+import re
+import secrets
+import tempfile
+import threading
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from extensions import db
+from config import MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, S3_MULTIPART_CHUNK_SIZE
+from models.upload import UploadSession
+from api.posts import ALLOWED_EXTENSIONS, allowed_file, schedule_post_media_variants
+import media_store
+from storage import get_storage, guess_content_type, hash_object
+from tasks import submit_task
+
+uploads_bp = Blueprint('uploads', __name__)
+
+PART_FOLDER = media_store.TMP_FOLDER  # Same filesystem as the store, so finalize is a rename
+READ_BLOCK_SIZE = 64 * 1024
+MAGIC_BYTES_NEEDED = 12
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Running SHA-256 per upload in this worker: upload_id -> (offset, hasher).
+# A PATCH landing on another worker rebuilds it from the part file.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def part_path(upload_id):
+    return os.path.join(PART_FOLDER, f'{upload_id}.part')
+
+
+def staging_key(upload_id):
+    """Object storage key an upload's parts are assembled under (skipped by media gc)"""
+    return f'tmp/uploads/{upload_id}'
+
+
+def matches_magic(ext, header):
+    """Does the start of the file look like the declared type?"""
+    if ext in ('jpg', 'jpeg'):
+        return header.startswith(b'\xff\xd8\xff')
+    if ext == 'png':
+        return header.startswith(b'\x89PNG\r\n\x1a\n')
+    if ext == 'gif':
+        return header[:6] in (b'GIF87a', b'GIF89a')
+    if ext in ('mp4', 'mov'):
+        return header[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip')
+    if ext == 'avi':
+        return header[:4] == b'RIFF' and header[8:12] == b'AVI '
+    return False
+
+
+def _take_hasher(upload_id, offset):
+    with _hashers_lock:
+        entry = _hashers.pop(upload_id, None)
+    if entry and entry[0] == offset:
+        return entry[1]
+    hasher = hashlib.sha256()
+    with open(part_path(upload_id), 'rb') as part:
+        remaining = offset
+        while remaining:
+            block = part.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _store_hasher(upload_id, offset, hasher):
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, hasher)
+
+
+def _offset_headers(upload):
+    return {
+        'Upload-Offset': str(upload.offset),
+        'Upload-Length': str(upload.size),
+        'Cache-Control': 'no-store'
+    }
+
+
+def _serialize(upload):
+    return {
+        'upload_id': upload.id,
+        'offset': upload.offset,
+        'size': upload.size,
+        'status': upload.status,
+        'direct': upload.direct,
+        'chunk_size': S3_MULTIPART_CHUNK_SIZE if upload.direct else UPLOAD_CHUNK_SIZE,
+        'media_url': upload.media_url,
+        'sha256': upload.sha256
+    }
+
+
+def _mark_complete(upload, blob):
+    upload.offset = upload.size
+    upload.media_url = f'/uploads/post_media/{blob.filename}'
+    upload.status = 'complete'
+
+
+def _get_upload(upload_id, lock=False):
+    query = UploadSession.query.filter_by(id=upload_id, user_id=int(get_jwt_identity()))
+    if lock:
+        # Serialize concurrent PATCHes to the same upload
+        query = query.with_for_update()
+    return query.first()
+
+
+# POST /api/uploads
+@uploads_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    try:
+        size = int(data.get('size', request.headers.get('Upload-Length', -1)))
+    except (TypeError, ValueError):
+        size = -1
+    if not allowed_file(filename):
+        return jsonify({'error': f"Invalid file type. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}"}), 400
+    if size <= 0:
+        return jsonify({'error': 'size is required'}), 400
+    if size > MAX_UPLOAD_SIZE:
+        return jsonify({'error': f'File too large (max {MAX_UPLOAD_SIZE // (1024 * 1024)}MB)'}), 413
+
+    if data.get('direct') and get_storage().supports_presigned_urls:
+        return create_direct_upload(filename, size, (data.get('sha256') or '').lower())
+
+    storage = get_storage()
+    upload = UploadSession(id=secrets.token_hex(16), user_id=int(get_jwt_identity()),
+                           filename=filename, size=size, offset=0)
+    if storage.is_local:
+        os.makedirs(PART_FOLDER, exist_ok=True)
+        open(part_path(upload.id), 'wb').close()
+    else:
+        # Parts go to the bucket, so a chunk can land on any node
+        upload.storage_upload_id = storage.start_multipart(staging_key(upload.id), guess_content_type(filename))
+    db.session.add(upload)
+    db.session.commit()
+    headers = _offset_headers(upload)
+    headers['Location'] = f'/api/uploads/{upload.id}'
+    return jsonify(_serialize(upload)), 201, headers
+
+
+def create_direct_upload(filename, size, sha256):
+    """Presigned URL(s) for sending the bytes straight to object storage"""
+    if not SHA256_RE.match(sha256):
+        return jsonify({'error': 'sha256 (hex) is required for direct uploads'}), 400
+    upload = UploadSession(id=secrets.token_hex(16), user_id=int(get_jwt_identity()),
+                           filename=filename, size=size, offset=0, sha256=sha256, direct=True)
+    db.session.add(upload)
+    body = {}
+    blob = media_store.existing_blob(sha256)
+    if blob is not None:
+        # Already stored: nothing to send
+        _mark_complete(upload, blob)
+    else:
+        storage = get_storage()
+        key = media_store.blob_key(f'{sha256}.{upload.ext}')
+        content_type = guess_content_type(filename)
+        if size <= S3_MULTIPART_CHUNK_SIZE:
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            url, headers = storage.presigned_put(key, content_type, checksum)
+            body['upload'] = {'method': 'PUT', 'url': url, 'headers': headers}
+        else:
+            upload.storage_upload_id = storage.start_multipart(key, content_type)
+            body['upload'] = {
+                'method': 'PUT',
+                'part_size': S3_MULTIPART_CHUNK_SIZE,
+                'parts': storage.presigned_part_urls(key, upload.storage_upload_id,
+                                                     math.ceil(size / S3_MULTIPART_CHUNK_SIZE))
+            }
+    db.session.commit()
+    return jsonify({**_serialize(upload), **body}), 201, {'Location': f'/api/uploads/{upload.id}'}
+
+
+def finalize_direct_upload(upload):
+    storage = get_storage()
+    key = media_store.blob_key(f'{upload.sha256}.{upload.ext}')
+    try:
+        if upload.storage_upload_id:
+            parts = (request.get_json(silent=True) or {}).get('parts') or []
+            storage.complete_multipart(key, upload.storage_upload_id, parts)
+        stored_size = storage.size(key)
+    except Exception as e:
+        print(f'Direct upload finalize error: {str(e)}')
+        db.session.rollback()
+        return jsonify({'error': 'Upload not found in storage or parts invalid'}), 409
+    if stored_size != upload.size:
+        db.session.rollback()
+        return jsonify({'error': 'Stored size does not match the declared size'}), 409
+
+    if not upload.storage_upload_id:
+        # The storage checked the signed x-amz-checksum-sha256 on PUT
+        blob = media_store.register_stored(upload.sha256, upload.ext, upload.size)
+        _mark_complete(upload, blob)
+        db.session.commit()
+        schedule_post_media_variants(blob.filename)
+        return jsonify(_serialize(upload)), 200
+
+    # Multipart objects carry no whole-file checksum; hash them before trusting the name
+    upload.status = 'verifying'
+    db.session.commit()
+    upload_id = upload.id
+    submit_task(hash_object, key, on_done=lambda future: finish_direct_upload(upload_id, key, future))
+    return jsonify(_serialize(upload)), 202
+
+
+def finish_direct_upload(upload_id, key, future):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return
+    try:
+        verified = future.result() == upload.sha256
+    except Exception as e:
+        print(f'Direct upload verification error: {str(e)}')
+        verified = False
+    if not verified:
+        upload.status = 'failed'
+        if media_store.existing_blob(upload.sha256) is None:
+            # Only remove the object if no genuine upload of this hash has claimed the key
+            get_storage().delete(key)
+        db.session.commit()
+        return
+    blob = media_store.register_stored(upload.sha256, upload.ext, upload.size)
+    _mark_complete(upload, blob)
+    db.session.commit()
+    schedule_post_media_variants(blob.filename)
+
+
+# HEAD/GET /api/uploads/<id>
+@uploads_bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@jwt_required()
+def get_upload(upload_id):
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(_serialize(upload)), 200, _offset_headers(upload)
+
+
+# PATCH /api/uploads/<id>
+@uploads_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def append_chunk(upload_id):
+    upload = _get_upload(upload_id, lock=True)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status != 'uploading':
+        return jsonify({'error': 'Upload already finalized'}), 409
+    if upload.direct:
+        return jsonify({'error': 'Direct uploads are sent to the storage URLs'}), 409
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    if offset != upload.offset:
+        # Client and server disagree (e.g. a lost response); client should HEAD and resume
+        db.session.rollback()
+        return jsonify({'error': 'Offset mismatch', 'offset': upload.offset}), 409, _offset_headers(upload)
+    if upload.storage_upload_id:
+        return append_part(upload, offset)
+    if not os.path.exists(part_path(upload.id)):
+        # Idle past the media gc grace period; the part file has been collected
+        db.session.rollback()
+        return jsonify({'error': 'Upload expired, start again'}), 410
+
+    hasher = _take_hasher(upload.id, offset)
+    with open(part_path(upload.id), 'rb') as part:
+        header = part.read(min(offset, MAGIC_BYTES_NEEDED))
+    written = 0
+    with open(part_path(upload.id), 'r+b') as part:
+        part.seek(offset)
+        part.truncate()
+        while True:
+            block = request.stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            if offset + written + len(block) > upload.size:
+                part.truncate(offset)
+                db.session.rollback()
+                return jsonify({'error': 'Chunk exceeds declared upload size'}), 413
+            if len(header) < MAGIC_BYTES_NEEDED:
+                header += block[:MAGIC_BYTES_NEEDED - len(header)]
+                if (len(header) >= MAGIC_BYTES_NEEDED or offset + written + len(block) == upload.size) \
+                        and not matches_magic(upload.ext, header):
+                    part.truncate(offset)
+                    db.session.rollback()
+                    return jsonify({'error': 'File content does not match its type'}), 415
+            part.write(block)
+            hasher.update(block)
+            written += len(block)
+
+    upload.offset = offset + written
+    db.session.commit()
+    _store_hasher(upload.id, upload.offset, hasher)
+    return '', 204, _offset_headers(upload)
+
+
+def append_part(upload, offset):
+    """PATCH for an upload assembled in object storage: the chunk becomes part offset/chunk_size + 1"""
+    end = min(offset + UPLOAD_CHUNK_SIZE, upload.size)
+    header = b''
+    written = 0
+    with tempfile.TemporaryFile() as chunk:
+        while True:
+            block = request.stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            if offset + written + len(block) > upload.size:
+                db.session.rollback()
+                return jsonify({'error': 'Chunk exceeds declared upload size'}), 413
+            if offset + written + len(block) > end:
+                written = None  # Longer than a part
+                break
+            if offset == 0 and len(header) < MAGIC_BYTES_NEEDED:
+                header += block[:MAGIC_BYTES_NEEDED - len(header)]
+            chunk.write(block)
+            written += len(block)
+        if written is None or offset + written != end:
+            db.session.rollback()
+            return jsonify({'error': 'Chunks must be chunk_size bytes, except the last', 'chunk_size': UPLOAD_CHUNK_SIZE,
+                            'offset': upload.offset}), 400, _offset_headers(upload)
+        if offset == 0 and not matches_magic(upload.ext, header):
+            db.session.rollback()
+            return jsonify({'error': 'File content does not match its type'}), 415
+        chunk.seek(0)
+        # Sending a part number again replaces it, so a retried chunk is harmless
+        get_storage().upload_part(staging_key(upload.id), upload.storage_upload_id,
+                                  offset // UPLOAD_CHUNK_SIZE + 1, chunk)
+    upload.offset = end
+    db.session.commit()
+    return '', 204, _offset_headers(upload)
+
+
+# POST /api/uploads/<id>/finalize
+@uploads_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_upload(upload_id):
+    upload = _get_upload(upload_id, lock=True)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload.status != 'uploading':
+        return jsonify(_serialize(upload)), 200
+    if upload.direct:
+        return finalize_direct_upload(upload)
+    if upload.offset != upload.size:
+        db.session.rollback()
+        return jsonify({'error': 'Upload incomplete', 'offset': upload.offset}), 409, _offset_headers(upload)
+    if upload.storage_upload_id:
+        return finalize_staged_upload(upload)
+    if not os.path.exists(part_path(upload.id)):
+        db.session.rollback()
+        return jsonify({'error': 'Upload expired, start again'}), 410
+
+    hasher = _take_hasher(upload.id, upload.offset)
+    upload.sha256 = hasher.hexdigest()
+    # A file someone already uploaded is dropped here instead of stored again
+    blob, created = media_store.store_file(part_path(upload.id), upload.sha256, upload.ext)
+    _mark_complete(upload, blob)
+    db.session.commit()
+    schedule_post_media_variants(blob.filename, created)
+    return jsonify(_serialize(upload)), 200
+
+
+def finalize_staged_upload(upload):
+    """Assemble the parts in object storage, then hash the object on a worker before naming it"""
+    storage = get_storage()
+    key = staging_key(upload.id)
+    try:
+        storage.complete_multipart(key, upload.storage_upload_id, storage.list_parts(key, upload.storage_upload_id))
+    except Exception as e:
+        print(f'Chunked upload finalize error: {str(e)}')
+        db.session.rollback()
+        return jsonify({'error': 'Upload expired, start again'}), 410
+    upload.status = 'verifying'
+    db.session.commit()
+    upload_id = upload.id
+    submit_task(hash_object, key, on_done=lambda future: finish_staged_upload(upload_id, key, future))
+    return jsonify(_serialize(upload)), 202
+
+
+def finish_staged_upload(upload_id, key, future):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return
+    storage = get_storage()
+    try:
+        upload.sha256 = future.result()
+    except Exception as e:
+        print(f'Chunked upload hashing error: {str(e)}')
+        upload.status = 'failed'
+        db.session.commit()
+        return
+    # A file someone already uploaded is dropped here instead of stored again
+    blob = media_store.existing_blob(upload.sha256)
+    created = blob is None
+    if created:
+        storage.copy(key, media_store.blob_key(f'{upload.sha256}.{upload.ext}'))
+        blob = media_store.register_stored(upload.sha256, upload.ext, upload.size)
+    storage.delete(key)
+    _mark_complete(upload, blob)
+    db.session.commit()
+    schedule_post_media_variants(blob.filename, created)
@@ -1,72 +1,134 @@
-from flask import Flask
-app = Flask(__name__)
-from flask_cors import CORS
-from config import MAX_CONTENT_LENGTH
-from api import auth_bp, profile_bp, posts_bp, feed_bp, jobs_bp, messaging_bp
-from extensions import db
+"""
+Application factory.
+
+create_app() builds and configures the Flask app without touching the
+database: engines connect on the first query, and tables are created by
+`flask init-db` (new databases) or `flask db upgrade` (migrations), not at
+import. `from app import app` still works for gunicorn (`app:app`,
+`main:app`) and scripts; that instance is only built on first access.
+"""
 import os
-from flask import send_from_directory
+from importlib import import_module
+
+import click
+from flask import Flask, jsonify
+from flask.cli import with_appcontext
+from flask_cors import CORS
+
+from auth_tokens import CachingJWTManager, configure_tokens, register_revocation_handlers, register_scope_handlers
+from config import MAX_CONTENT_LENGTH, MIGRATIONS_DIR, SQLALCHEMY_DATABASE_URI, DATABASE_REPLICA_URLS
+from db_engine import configure_database
+from db_routing import check_recent_writes
+from events import check_broker
+from extensions import db, migrate
+
 ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173').split(',')
-CORS(app,
-     origins=ALLOWED_ORIGINS,
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With'],
-     supports_credentials=True,
-     max_age=3600)
-from flask_jwt_extended import JWTManager
-from flask_jwt_extended.exceptions import NoAuthorizationError, InvalidHeaderError
-from flask import jsonify
-from flask_migrate import Migrate
-from sqlalchemy import create_engine
-
-# Use the environment variable for the database URI
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLALCHEMY_DATABASE_URI')
-app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
-app.config['JWT_SECRET_KEY'] = 'your-very-secret-key'  # Change this to a strong secret!
-jwt = JWTManager(app)
-
-db.init_app(app)
-
-migrate = Migrate(app, db)
-
-# TEMP: Create all tables if they don't exist (for deployment)
-with app.app_context():
+
+# (module, blueprint, url prefix); each module is imported when the app is built
+BLUEPRINTS = (
+    ('api.auth', 'auth_bp', '/api/auth'),
+    ('api.profile', 'profile_bp', '/api'),
+    ('api.posts', 'posts_bp', '/api'),
+    ('api.feed', 'feed_bp', '/api'),
+    ('api.follows', 'follows_bp', '/api'),
+    ('api.likes', 'likes_bp', '/api'),
+    ('api.comments', 'comments_bp', '/api'),
+    ('api.connections', 'connections_bp', '/api'),
+    ('api.search', 'search_bp', '/api'),
+    ('api.jobs', 'jobs_bp', '/api'),
+    ('api.messaging', 'messaging_bp', '/api'),
+    ('api.uploads', 'uploads_bp', '/api'),
+    ('api.media', 'media_bp', None),
+    ('api.health', 'health_bp', '/api'),
+    ('api.events', 'events_bp', '/api'),
+)
+
+# (module, click command) for `flask <command>`
+CLI_COMMANDS = (
+    ('accounts', 'users_cli'),
+    ('likes', 'likes_cli'),
+    ('timeline', 'timelines_cli'),
+    ('search_index', 'search_cli'),
+    ('media_store', 'media_cli'),
+)
+
+
+def create_app(config=None):
+    """
+    Build the app. `config` is an optional mapping of settings applied over
+    config.py and the environment, e.g. {'SQLALCHEMY_DATABASE_URI': 'sqlite://'}.
+    """
+    config = dict(config or {})
+    app = Flask(__name__)
+
+    # Use the environment variable for the database URI (config.py's default otherwise),
+    # with the pool and driver settings from db_engine; replicas become binds for db_routing
+    uri = config.pop('SQLALCHEMY_DATABASE_URI', None) or os.environ.get('SQLALCHEMY_DATABASE_URI') or SQLALCHEMY_DATABASE_URI
+    configure_database(app, uri, config.pop('DATABASE_REPLICA_URLS', DATABASE_REPLICA_URLS))
+    check_recent_writes(app.config['SQLALCHEMY_BINDS'])
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    app.config['JWT_SECRET_KEY'] = 'your-very-secret-key'  # Change this to a strong secret!
+    configure_tokens(app)
+    app.config.from_mapping(config)
+
+    CORS(app,
+         origins=ALLOWED_ORIGINS,
+         methods=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
+         allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'Upload-Offset', 'Upload-Length'],
+         expose_headers=['Location', 'Upload-Offset', 'Upload-Length'],
+         supports_credentials=True,
+         max_age=3600)
+    jwt = CachingJWTManager(app)
+    register_jwt_handlers(jwt)
+    register_revocation_handlers(jwt)
+    register_scope_handlers(jwt)
+
+    db.init_app(app)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
+
+    for module, name, url_prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module), name), url_prefix=url_prefix)
+    for module, name in CLI_COMMANDS:
+        app.cli.add_command(getattr(import_module(module), name))
+    app.cli.add_command(init_db_command)
+    check_broker()
+    return app
+
+
+def register_jwt_handlers(jwt):
+    # JWT error handlers for better debugging
+    @jwt.unauthorized_loader
+    def unauthorized_callback(callback):
+        print('JWT Unauthorized:', callback)
+        return jsonify({'error': 'Missing or invalid JWT. Please log in again.'}), 401
+
+    @jwt.invalid_token_loader
+    def invalid_token_callback(callback):
+        print('JWT Invalid Token:', callback)
+        return jsonify({'error': 'Invalid JWT. Please log in again.'}), 422
+
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        print('JWT Expired Token')
+        return jsonify({'error': 'JWT expired. Please log in again.'}), 401
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables (existing ones are left alone; use `flask db upgrade` for changes)"""
+    # Every model is registered by now: the blueprint modules import them
     db.create_all()
+    click.echo('Database tables created.')
+
+
+def __getattr__(name):
+    # `from app import app`: build the shared instance on first use, not at import
+    if name == 'app':
+        instance = globals()['app'] = create_app()
+        return instance
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(profile_bp, url_prefix='/api')
-app.register_blueprint(posts_bp, url_prefix='/api')
-app.register_blueprint(feed_bp, url_prefix='/api')
-app.register_blueprint(jobs_bp, url_prefix='/api')
-app.register_blueprint(messaging_bp, url_prefix='/api')
-
-# Add JWT error handlers for better debugging
-@jwt.unauthorized_loader
-def unauthorized_callback(callback):
-    print('JWT Unauthorized:', callback)
-    return jsonify({'error': 'Missing or invalid JWT. Please log in again.'}), 401
-
-@jwt.invalid_token_loader
-def invalid_token_callback(callback):
-    print('JWT Invalid Token:', callback)
-    return jsonify({'error': 'Invalid JWT. Please log in again.'}), 422
-
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    print('JWT Expired Token')
-    return jsonify({'error': 'JWT expired. Please log in again.'}), 401
-
-# Static file route for profile images
-@app.route('/uploads/profile_images/<filename>')
-def uploaded_file(filename):
-    upload_folder = os.path.join(os.path.dirname(__file__), 'uploads/profile_images')
-    return send_from_directory(upload_folder, filename)
-
-# Static file route for post media
-@app.route('/uploads/post_media/<filename>')
-def uploaded_post_media(filename):
-    upload_folder = os.path.join(os.path.dirname(__file__), 'uploads/post_media')
-    return send_from_directory(upload_folder, filename)
 
 if __name__ == "__main__":
-    app.run(port=5001, debug=True)
+    create_app().run(port=5001, debug=True)
@@ -0,0 +1,107 @@
+"""
+JWT access/refresh tokens.
+
+Login hands out a short-lived access token and a refresh token; refreshing
+rotates both and revokes the old refresh token. Every authenticated request
+is checked against the revocation list (revocation.py), which costs a few
+Bloom filter probes, not a query.
+
+CachingJWTManager remembers the claims of tokens it has already verified,
+keyed by the exact token string, so a client's repeat requests skip the
+HMAC check and JSON decoding until the token expires.
+
+Stream tokens (issue_stream_token) carry a `scope` claim naming the one
+endpoint that accepts them. Flask-JWT-Extended
+has no public hook for this, so it overrides JWTManager._decode_jwt_from_config,
+which every token read goes through in the pinned 4.5.x (requirements.txt);
+test_auth_tokens.py fails if an upgrade stops calling it.
+"""
+import time
+from datetime import timedelta
+
+from flask import jsonify, request
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token
+
+from cache import LRUCache
+from config import JWT_ACCESS_TOKEN_MINUTES, JWT_REFRESH_TOKEN_DAYS, JWT_CLAIMS_CACHE_SIZE, EVENTS_TOKEN_SECONDS
+from revocation import get_revocation_list, user_key
+
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=JWT_ACCESS_TOKEN_MINUTES)
+REFRESH_TOKEN_EXPIRES = timedelta(days=JWT_REFRESH_TOKEN_DAYS)
+STREAM_TOKEN_EXPIRES = timedelta(seconds=EVENTS_TOKEN_SECONDS)
+STREAM_SCOPE = 'events.stream_events'  # GET /api/events
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that caches verified claims per token string"""
+
+    def __init__(self, app=None, cache_size=JWT_CLAIMS_CACHE_SIZE):
+        # Entries are checked against the token's own exp too; the TTL just bounds stale memory
+        self.claims_cache = LRUCache(maxsize=cache_size, ttl=ACCESS_TOKEN_EXPIRES.total_seconds())
+        super().__init__(app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        claims = self.claims_cache.get(encoded_token)
+        if claims is not None and claims.get('exp', 0) > time.time():
+            return claims
+        # Verifies the signature and raises for expired or malformed tokens, as usual
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        self.claims_cache.set(encoded_token, claims)
+        return claims
+
+
+def configure_tokens(app):
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = ACCESS_TOKEN_EXPIRES
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = REFRESH_TOKEN_EXPIRES
+
+
+def register_revocation_handlers(jwt):
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        return get_revocation_list().is_revoked(jwt_payload['jti'], jwt_payload['sub'], jwt_payload['iat'])
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked. Please log in again.'}), 401
+
+
+def register_scope_handlers(jwt):
+    @jwt.token_verification_loader
+    def token_in_scope(jwt_header, jwt_payload):
+        scope = jwt_payload.get('scope')
+        return scope is None or request.endpoint == scope
+
+    @jwt.token_verification_failed_loader
+    def out_of_scope_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'This token is not valid here'}), 401
+
+
+def issue_tokens(user_id):
+    """(access token, refresh token) for a user"""
+    identity = str(user_id)
+    return create_access_token(identity=identity), create_refresh_token(identity=identity)
+
+
+def issue_stream_token(claims):
+    """
+    A token for the URL of GET /api/events, where it ends up in access logs:
+    accepted nowhere else and only for EVENTS_TOKEN_SECONDS. The stream it
+    opens still ends when the access token it was issued for (`claims`) does.
+    """
+    return create_access_token(identity=claims['sub'], expires_delta=STREAM_TOKEN_EXPIRES,
+                               additional_claims={'scope': STREAM_SCOPE,
+                                                  'session_exp': claims.get('session_exp', claims['exp'])})
+
+
+def revoke_token(claims):
+    """Revoke one token (logout, refresh rotation) until it would have expired anyway"""
+    get_revocation_list().revoke(claims['jti'], int(claims['sub']), expires_at=claims['exp'])
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far (log out everywhere, bans)"""
+    # Kept until the longest-lived token issued before now has expired
+    get_revocation_list().revoke(user_key(user_id), int(user_id),
+                                 expires_at=time.time() + REFRESH_TOKEN_EXPIRES.total_seconds())
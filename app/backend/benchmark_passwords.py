@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tune password hashing cost against a login rate.
+
+For each candidate method and cost, measures one verification's latency and
+the throughput of a hash pool like the one login uses, then reports how
+much CPU the target login rate would take:
+
+    python benchmark_passwords.py --target-qps 20 --cores 4 --cpu-share 0.25
+
+A candidate fits when target_qps x seconds-per-verify stays within
+cores x cpu-share, leaving the rest of the CPU to other routes. Pick the most
+expensive one that fits and set the PASSWORD_* variables to match.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from passwords import HashPool, _hash, _verify, hash_settings
+from config import PASSWORD_HASH_POOL, PASSWORD_HASH_WORKERS
+
+CANDIDATES = [
+    ('scrypt', {'n': 2 ** 14}),
+    ('scrypt', {'n': 2 ** 15}),
+    ('scrypt', {'n': 2 ** 16}),
+    ('scrypt', {'n': 2 ** 17}),
+    ('pbkdf2', {'iterations': 300000}),
+    ('pbkdf2', {'iterations': 600000}),
+    ('pbkdf2', {'iterations': 1200000}),
+    ('argon2', {'time_cost': 2, 'memory_cost': 19456}),
+    ('argon2', {'time_cost': 3, 'memory_cost': 65536}),
+    ('argon2', {'time_cost': 4, 'memory_cost': 131072}),
+]
+
+
+def describe(settings):
+    if isinstance(settings, dict):
+        return 'argon2id:t={time_cost}:m={memory_cost}:p={parallelism}'.format(**settings)
+    return settings
+
+
+def measure(settings, rounds, pool):
+    stored = _hash('correct horse battery staple', settings)
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _verify(stored, 'correct horse battery staple')
+        latencies.append(time.perf_counter() - start)
+
+    # Pool throughput: enough concurrent logins to keep every worker busy
+    count = pool.workers * rounds
+    threads = [threading.Thread(target=pool.run, args=(_verify, stored, 'wrong password'))
+               for _ in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statistics.median(latencies), count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target-qps', type=float, default=20, help='Logins per second to plan for (default: 20)')
+    parser.add_argument('--cores', type=int, default=os.cpu_count(), help='CPU cores serving the app')
+    parser.add_argument('--cpu-share', type=float, default=0.25,
+                        help='Fraction of the CPU hashing may use (default: 0.25)')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--pool', default=PASSWORD_HASH_POOL, choices=['thread', 'process', 'inline'])
+    parser.add_argument('--workers', type=int, default=PASSWORD_HASH_WORKERS)
+    parser.add_argument('--method', action='append', choices=['scrypt', 'pbkdf2', 'argon2'],
+                        help='Only these methods (repeatable)')
+    args = parser.parse_args()
+
+    budget = args.cores * args.cpu_share
+    current = describe(hash_settings())
+    print(f'Target {args.target_qps:g} logins/s on {args.cores} cores, hashing budget {budget:g} cores; '
+          f'{args.pool} pool of {args.workers}; current setting {current}\n')
+    print(f'{"setting":<36} {"ms/verify":>10} {"pool verifies/s":>16} {"cores at target":>16}  fits')
+
+    pool = HashPool(kind=args.pool, workers=args.workers, max_pending=args.workers * args.rounds,
+                    wait_seconds=None)
+    try:
+        for method, cost in CANDIDATES:
+            if args.method and method not in args.method:
+                continue
+            settings = hash_settings(method, **cost)
+            try:
+                latency, throughput = measure(settings, args.rounds, pool)
+            except ImportError:
+                print(f'{describe(settings):<36} (skipped: pip install argon2-cffi)')
+                continue
+            cores_needed = args.target_qps * latency
+            marker = ' <- current' if describe(settings) == current else ''
+            print(f'{describe(settings):<36} {latency * 1000:>10.1f} {throughput:>16.1f} {cores_needed:>16.2f}  '
+                  f'{"yes" if cores_needed <= budget else "no"}{marker}')
+    finally:
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measure worker cold start: a fresh interpreter importing the app, building it
+with create_app() and answering its first request (GET /api/health), the
+work each gunicorn worker or `flask` command does before it's useful.
+
+    python benchmark_startup.py [--runs 10]
+
+Also counts database connections opened during startup, which should be 0:
+engines connect on the first query, not at import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r'''
+import json, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connects = []
+event.listen(Pool, 'connect', lambda *args: connects.append(1))
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/api/health')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - start,
+                  'db_connections': len(connects)}))
+'''
+
+
+def run_once(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # A database that can't be opened: startup must not need one
+    env.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:////nonexistent/startup.db')
+    run_once(env)  # Warm the OS file cache and __pycache__
+    results = [run_once(env) for _ in range(args.runs)]
+
+    print(f'{args.runs} cold starts (seconds)')
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        values = [result[phase] for result in results]
+        print(f'  {phase:<14} median {statistics.median(values):.3f}  min {min(values):.3f}  max {max(values):.3f}')
+    print(f'  db connections during startup: {max(result["db_connections"] for result in results)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Response caches.
+
+LRUCache is a per-process LRU with a TTL. RedisCache shares entries between
+workers and nodes, so deleting an entry there invalidates it everywhere;
+`shared` tells the two apart. Both keep hit/miss counters for the current
+process.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from extensions import get_redis
+from config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+
+
+class LRUCache:
+    shared = False
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_many(self, keys):
+        """[value or None] for each key"""
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_many(self, items):
+        for key, value in items.items():
+            self.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+
+class RedisCache:
+    shared = True
+
+    def __init__(self, client, prefix='cache:', ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get_many(self, keys):
+        """[value or None] for each key, in one round trip (MGET)"""
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        hits = sum(value is not None for value in values)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(values) - hits
+        return values
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, value)
+
+    def set_many(self, items):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(self.prefix + key, self.ttl, value)
+        pipe.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+_profile_cache = None
+
+def get_profile_cache():
+    """Cache of serialized GET /api/profile responses: in Redis when REDIS_URL is set, else per worker"""
+    global _profile_cache
+    if _profile_cache is None:
+        client = get_redis()
+        if client is not None:
+            _profile_cache = RedisCache(client, prefix='profile:', ttl=PROFILE_CACHE_TTL)
+        else:
+            _profile_cache = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+    return _profile_cache
@@ -0,0 +1,96 @@
+"""
+Threaded comments.
+
+Each comment stores the materialized path of its ancestors (models/comment.py),
+so the replies to any comment, or a post's top-level comments, are one
+keyset range of the (post_id, path, id) index: a page of a thread level costs
+one query for the comments and one for their authors, however deep it is.
+Clients open deeper levels one at a time using each comment's reply_count.
+
+posts.comment_count and the parent's reply_count are updated with the
+comment in one transaction, as relative UPDATEs, so concurrent comments
+don't lose counts. reply_count counts the replies a reader can see: live
+ones, and deleted ones kept as placeholders for their own replies. Adding a
+reply and deleting a comment both lock the comment row they check, so a
+reply never lands under a parent that is being deleted.
+"""
+from extensions import db
+from models.comment import Comment, PATH_SEGMENT_LENGTH
+from models.post import Post
+
+MAX_DEPTH = Comment.path.type.length // PATH_SEGMENT_LENGTH  # Replies nest at most this deep
+
+
+class CommentError(ValueError):
+    """A comment that can't be added; the message is safe to show"""
+
+
+def add_comment(post, user_id, content, parent_id=None):
+    """Insert a comment (a reply when parent_id is given) and bump the counters; returns it"""
+    path = ''
+    if parent_id is not None:
+        # Locked until the commit, so delete_comment waits instead of tombstoning it meanwhile
+        parent = _locked(parent_id)
+        if parent is None or parent.post_id != post.id or parent.deleted:
+            db.session.rollback()
+            raise CommentError('Parent comment not found')
+        if parent.depth + 1 >= MAX_DEPTH:
+            db.session.rollback()
+            raise CommentError('Thread is too deep to reply to')
+        path = parent.child_path
+    comment = Comment(post_id=post.id, user_id=user_id, path=path, content=content)
+    db.session.add(comment)
+    db.session.execute(db.update(Post).where(Post.id == post.id)
+                       .values(comment_count=Post.comment_count + 1))
+    if parent_id is not None:
+        db.session.execute(db.update(Comment).where(Comment.id == parent_id)
+                           .values(reply_count=Comment.reply_count + 1))
+    db.session.commit()
+    return comment
+
+
+def _locked(comment_id):
+    """The comment row, re-read under a row lock; None if it doesn't exist"""
+    return db.session.execute(db.select(Comment).where(Comment.id == comment_id)
+                              .with_for_update().execution_options(populate_existing=True)).scalar_one_or_none()
+
+
+def delete_comment(comment):
+    """
+    Soft-delete a comment: its text goes, the row stays as a placeholder
+    while it has replies to show. A comment that leaves nothing to show is
+    no longer counted in its parent's reply_count, and neither is a deleted
+    parent left with no replies, and so on up the thread.
+    """
+    comment = _locked(comment.id)
+    if comment.deleted:
+        return
+    comment.deleted = True
+    comment.content = ''
+    db.session.execute(db.update(Post).where(Post.id == comment.post_id)
+                       .values(comment_count=Post.comment_count - 1))
+    hidden = comment
+    while hidden.reply_count == 0 and hidden.parent_id is not None:
+        db.session.execute(db.update(Comment).where(Comment.id == hidden.parent_id)
+                           .values(reply_count=Comment.reply_count - 1))
+        parent = _locked(hidden.parent_id)
+        if not parent.deleted:
+            break
+        hidden = parent
+    db.session.commit()
+
+
+def comment_page(post_id, parent=None, after=0, limit=20):
+    """
+    One level of a thread, oldest first: the post's top-level comments, or the
+    replies to `parent`, with ids above `after`. Deleted comments without
+    replies are skipped. Fetches limit + 1 rows so callers can tell whether
+    there is another page.
+    """
+    path = parent.child_path if parent is not None else ''
+    query = (db.select(Comment)
+             .where(Comment.post_id == post_id, Comment.path == path, Comment.id > after,
+                    db.or_(Comment.deleted == db.false(), Comment.reply_count > 0))
+             .order_by(Comment.id)
+             .limit(limit + 1))
+    return db.session.execute(query).scalars().all()
@@ -0,0 +1,63 @@
+"""
+Shared pytest setup for the backend tests: the app on an in-memory SQLite
+database with fresh tables for every test, background tasks run inline, and
+helpers to add users and sign them in.
+"""
+import os
+import sys
+import tempfile
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('TASK_BACKEND', 'inline')
+os.environ.setdefault('MEDIA_STORE_PATH', tempfile.mkdtemp(prefix='media-test-'))
+os.environ.setdefault('SEARCH_INDEX_PATH', ':memory:')
+os.environ.setdefault('WEB_THREADS', '4')
+
+import pytest
+
+from app import app as flask_app
+from auth_tokens import issue_tokens
+from extensions import db
+from models.user import User
+from revocation import MemoryRevocationStore, RevocationList, set_revocation_list
+from timeline import set_timeline_store
+
+
+@pytest.fixture
+def app():
+    """The shared app with empty tables and an in-memory revocation list"""
+    set_revocation_list(RevocationList(MemoryRevocationStore()))
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield flask_app
+    set_timeline_store(None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_users(app):
+    """add_users('ann', 'bob') creates users with those names; returns their ids"""
+    def add(*names):
+        with app.app_context():
+            users = [User(username=name, email=f'{name}@example.com', password_hash='x') for name in names]
+            db.session.add_all(users)
+            db.session.commit()
+            return [user.id for user in users]
+    return add
+
+
+@pytest.fixture
+def auth_headers(app):
+    """auth_headers(user_id): an Authorization header with a fresh access token"""
+    def headers(user_id):
+        with app.app_context():
+            access_token, _ = issue_tokens(user_id)
+        return {'Authorization': f'Bearer {access_token}'}
+    return headers
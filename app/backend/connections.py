@@ -0,0 +1,198 @@
+"""
+Connections between users.
+
+A request becomes a connection when the other user accepts it, or at once
+when both users have asked each other. Connections are symmetric and stored
+as two rows (models/connection.py).
+
+Each user's connection ids are loaded as a sorted array of 64-bit ints,
+cached in Redis when it is configured (a per-worker copy could not be
+invalidated by the other workers, so without Redis they are read from the
+database each time). Mutual connections are the
+intersection of two such arrays: a binary search of the smaller one's ids
+in the larger when the sizes are lopsided, a set intersection otherwise.
+Either way users with tens of thousands of connections cost milliseconds,
+not a self-join.
+"""
+import bisect
+import math
+import random
+from array import array
+from collections import Counter
+
+from sqlalchemy.exc import IntegrityError
+
+from cache import RedisCache
+from config import CONNECTION_CACHE_TTL, CONNECTION_SUGGESTION_SAMPLE
+from extensions import db, get_redis
+from models.connection import Connection, ConnectionRequest
+
+_id_cache = None
+
+def get_connection_cache():
+    """Packed sorted connection ids keyed by user id, in Redis; None without REDIS_URL"""
+    global _id_cache
+    if _id_cache is None:
+        client = get_redis()
+        if client is not None:
+            _id_cache = RedisCache(client, prefix='connections:', ttl=CONNECTION_CACHE_TTL)
+    return _id_cache
+
+
+def _unpack(packed):
+    ids = array('q')
+    ids.frombytes(packed)
+    return ids
+
+
+def load_connection_ids(user_ids):
+    """
+    {user_id: sorted array of connection ids}: one cache round trip, then one
+    query for every user not cached. Misses are read from the primary, since
+    a replica that hasn't replayed a recent change would put the old ids
+    back in the cache for CONNECTION_CACHE_TTL seconds.
+    """
+    user_ids = list(user_ids)
+    cache = get_connection_cache()
+    result = {}
+    missing = user_ids
+    if cache is not None:
+        missing = []
+        for user_id, packed in zip(user_ids, cache.get_many([str(user_id) for user_id in user_ids])):
+            if packed is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = _unpack(packed)
+    if missing:
+        for user_id in missing:
+            result[user_id] = array('q')
+        query = (db.select(Connection.user_id, Connection.other_id)
+                 .where(Connection.user_id.in_(missing))
+                 .order_by(Connection.user_id, Connection.other_id))
+        bind_arguments = {'bind': db.engine} if cache is not None else None
+        for user_id, other_id in db.session.execute(query, bind_arguments=bind_arguments):
+            result[user_id].append(other_id)
+        if cache is not None:
+            cache.set_many({str(user_id): result[user_id].tobytes() for user_id in missing})
+    return result
+
+
+def connection_ids(user_id):
+    return load_connection_ids([user_id])[user_id]
+
+
+def invalidate(*user_ids):
+    cache = get_connection_cache()
+    if cache is not None:
+        for user_id in user_ids:
+            cache.delete(str(user_id))
+
+
+def contains(ids, user_id):
+    index = bisect.bisect_left(ids, user_id)
+    return index < len(ids) and ids[index] == user_id
+
+
+def intersect(a, b):
+    """Ids in both sorted sequences, ascending"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return []
+    if len(a) * math.log2(len(b) + 1) < len(b):
+        found = []
+        low = 0
+        for user_id in a:
+            low = bisect.bisect_left(b, user_id, low)
+            if low == len(b):
+                break
+            if b[low] == user_id:
+                found.append(user_id)
+        return found
+    return sorted(set(a).intersection(b))
+
+
+def _connect(user_id, other_id):
+    db.session.execute(db.delete(ConnectionRequest).where(db.or_(
+        (ConnectionRequest.requester_id == user_id) & (ConnectionRequest.addressee_id == other_id),
+        (ConnectionRequest.requester_id == other_id) & (ConnectionRequest.addressee_id == user_id))))
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(Connection), [{'user_id': user_id, 'other_id': other_id},
+                                                       {'user_id': other_id, 'other_id': user_id}])
+    except IntegrityError:
+        pass  # Both accepted at once; the other transaction made the rows
+    db.session.commit()
+    invalidate(user_id, other_id)
+
+
+def send_request(requester_id, addressee_id):
+    """'connected' (now or already), or 'requested' (pending, now or already)"""
+    if db.session.get(Connection, (requester_id, addressee_id)):
+        return 'connected'
+    if db.session.get(ConnectionRequest, (addressee_id, requester_id)):
+        # They asked first: asking back accepts
+        _connect(requester_id, addressee_id)
+        return 'connected'
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(ConnectionRequest).values(
+                requester_id=requester_id, addressee_id=addressee_id))
+    except IntegrityError:
+        pass  # Already pending
+    db.session.commit()
+    return 'requested'
+
+
+def accept_request(user_id, requester_id):
+    """Accept a pending request to user_id; False if there is none"""
+    if not db.session.get(ConnectionRequest, (requester_id, user_id)):
+        return False
+    _connect(user_id, requester_id)
+    return True
+
+
+def remove_request(user_id, other_id):
+    """Decline a request from other_id or withdraw one to them; False if there was none"""
+    removed = db.session.execute(db.delete(ConnectionRequest).where(db.or_(
+        (ConnectionRequest.requester_id == user_id) & (ConnectionRequest.addressee_id == other_id),
+        (ConnectionRequest.requester_id == other_id) & (ConnectionRequest.addressee_id == user_id)))).rowcount
+    db.session.commit()
+    return bool(removed)
+
+
+def remove_connection(user_id, other_id):
+    removed = db.session.execute(db.delete(Connection).where(db.or_(
+        (Connection.user_id == user_id) & (Connection.other_id == other_id),
+        (Connection.user_id == other_id) & (Connection.other_id == user_id)))).rowcount
+    db.session.commit()
+    invalidate(user_id, other_id)
+    return bool(removed)
+
+
+def pending_ids(user_id):
+    """(incoming requester ids, outgoing addressee ids)"""
+    incoming = db.session.execute(db.select(ConnectionRequest.requester_id)
+                                  .where(ConnectionRequest.addressee_id == user_id)).scalars().all()
+    outgoing = db.session.execute(db.select(ConnectionRequest.addressee_id)
+                                  .where(ConnectionRequest.requester_id == user_id)).scalars().all()
+    return incoming, outgoing
+
+
+def suggestions(user_id, limit=20):
+    """
+    People you may know: [(user_id, mutual connections)], most mutual first.
+    Users with more than CONNECTION_SUGGESTION_SAMPLE connections are
+    scored on a random sample of them, so counts are then estimates.
+    """
+    mine = connection_ids(user_id)
+    sample = list(mine)
+    if len(sample) > CONNECTION_SUGGESTION_SAMPLE:
+        sample = random.sample(sample, CONNECTION_SUGGESTION_SAMPLE)
+    counts = Counter()
+    for ids in load_connection_ids(sample).values():
+        counts.update(ids)
+    incoming, outgoing = pending_ids(user_id)
+    for excluded in (user_id, *mine, *incoming, *outgoing):
+        counts.pop(excluded, None)
+    return counts.most_common(limit)
@@ -0,0 +1,178 @@
+"""
+SQLAlchemy engine configuration: driver choice, pool sizing and pool health.
+
+The database URL's driver is swapped for a C implementation when one is
+installed (mysqlclient instead of PyMySQL, psycopg2 for PostgreSQL). Pool
+size, overflow, timeouts and recycling come from config.py / the
+environment. Connections are pinged on checkout and recycled before MySQL's
+wait_timeout, so an idle connection the server has dropped is replaced
+instead of failing the request with "MySQL server has gone away".
+
+InstrumentedQueuePool records how long requests wait for a connection and
+how often the pool runs dry; /api/health/db reports both.
+"""
+import threading
+import time
+from collections import deque
+from importlib.util import find_spec
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from db_routing import replica_binds
+from config import (DB_DRIVER, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                    DB_CONNECT_TIMEOUT, DB_STATEMENT_TIMEOUT_MS)
+
+# Preferred driver per backend, fastest first; the first importable one wins
+DRIVER_PREFERENCE = {
+    'mysql': (('mysqldb', 'MySQLdb'), ('pymysql', 'pymysql')),
+    'postgresql': (('psycopg2', 'psycopg2'), ('psycopg', 'psycopg')),
+}
+
+
+def select_driver(uri):
+    """Rewrite the URL's driver: DB_DRIVER if set, else the fastest installed one"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if DB_DRIVER and DB_DRIVER != 'auto':
+        return url.set(drivername=f'{backend}+{DB_DRIVER}')
+    for driver, module in DRIVER_PREFERENCE.get(backend, ()):
+        if find_spec(module) is not None:
+            return url.set(drivername=f'{backend}+{driver}')
+    return url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for a URL (SQLite keeps SQLAlchemy's own pool choice)"""
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        return {}
+    connect_args = {}
+    if backend == 'mysql':
+        connect_args['connect_timeout'] = DB_CONNECT_TIMEOUT
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args['init_command'] = f'SET SESSION max_execution_time={DB_STATEMENT_TIMEOUT_MS}'
+    elif backend == 'postgresql':
+        connect_args['connect_timeout'] = DB_CONNECT_TIMEOUT
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        # Below MySQL's default 8h wait_timeout and typical proxy idle limits
+        'pool_recycle': DB_POOL_RECYCLE,
+        # Test each connection on checkout; a dead one is replaced transparently
+        'pool_pre_ping': True,
+        # Reuse the most recent connection so surplus ones go idle and get recycled
+        'pool_use_lifo': True,
+        'connect_args': connect_args,
+    }
+
+
+def configure_database(app, uri, replica_uris=()):
+    """Primary engine settings, plus one 'replica_<n>' bind per read replica (see db_routing)"""
+    url = select_driver(uri)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url.render_as_string(hide_password=False)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    binds = {}
+    for key, replica_uri in zip(replica_binds(replica_uris), replica_uris):
+        replica_url = select_driver(replica_uri)
+        binds[key] = {'url': replica_url.render_as_string(hide_password=False), **engine_options(replica_url)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+class PoolMetrics:
+    """Checkout wait times and pool failure counters for this worker"""
+
+    SAMPLE_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=self.SAMPLE_SIZE)  # Seconds, most recent checkouts
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidated = 0  # Connections found dead (pre-ping or disconnect errors)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self._waits.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidated(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            counters = {'checkouts': self.checkouts, 'timeouts': self.timeouts,
+                        'connects': self.connects, 'invalidated': self.invalidated}
+
+        def percentile(fraction):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000, 3)
+
+        return {
+            **counters,
+            'checkout_wait_ms': {'p50': percentile(0.5), 'p95': percentile(0.95),
+                                 'p99': percentile(0.99), 'max': percentile(1.0)},
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.record_invalidated()
+
+
+def pool_status(engine):
+    """Current pool occupancy plus the recorded metrics"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'capacity': capacity,
+            'saturation': round(pool.checkedout() / capacity, 3) if capacity else None,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
@@ -0,0 +1,223 @@
+"""
+Read-replica routing.
+
+Views decorated with @read_replica send their SELECTs to one of the replica
+binds (DATABASE_REPLICA_URLS); everything else, and every write, uses the
+primary. A user whose request committed a write reads from the primary for
+READ_YOUR_WRITES_SECONDS afterwards, so they see their own post or profile
+edit on whichever worker answers next. That needs the marker shared through
+Redis, so replicas are refused at startup with more than one worker
+(WEB_CONCURRENCY) and no REDIS_URL. Replicas more than REPLICA_MAX_LAG_SECONDS behind, or not
+answering, are skipped until they catch up; with none left, reads fall back
+to the primary. Lag is measured by a background thread per worker, so
+requests never wait on it.
+"""
+import itertools
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+from config import READ_YOUR_WRITES_SECONDS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL, WEB_CONCURRENCY
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Seconds a PostgreSQL standby is behind: the age of the last replayed
+# transaction. An idle primary commits nothing, so a standby that is still
+# streaming and has replayed all it received counts as caught up; one whose
+# WAL receiver has stopped ages until it is skipped. (Seeing the receiver's
+# status needs superuser or pg_read_all_stats; without it idle standbys are
+# skipped too.)
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END")
+
+
+def replica_binds(replica_uris):
+    """Bind keys for the configured replicas, in order"""
+    return [f'{REPLICA_BIND_PREFIX}{index}' for index in range(len(replica_uris))]
+
+
+def measure_lag(engine):
+    """Replication delay in seconds, or None when replication is broken"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'mysql':
+            try:
+                row = conn.execute(text('SHOW REPLICA STATUS')).mappings().first()
+            except Exception:
+                # MySQL before 8.0.22 and MariaDB
+                row = conn.execute(text('SHOW SLAVE STATUS')).mappings().first()
+            if row is None:
+                return 0.0  # Not a replication replica (e.g. a read-only copy)
+            lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+            return None if lag is None else float(lag)
+        if engine.dialect.name == 'postgresql':
+            lag = conn.execute(POSTGRES_LAG_SQL).scalar()
+            return None if lag is None else float(lag)  # None: nothing replayed yet
+        return 0.0
+
+
+class ReplicaMonitor:
+    """
+    Per-process replica health. A daemon thread measures every replica each
+    REPLICA_CHECK_INTERVAL seconds; choose() only reads the latest results, so
+    replicas are used once their first check has passed.
+    """
+
+    def __init__(self, max_lag=REPLICA_MAX_LAG_SECONDS, interval=REPLICA_CHECK_INTERVAL):
+        self.max_lag = max_lag
+        self.interval = interval
+        self._state = {}  # bind key -> {'checked_at', 'lag', 'failed'}
+        self._engines = {}
+        self._thread_pid = None  # Threads don't survive a fork: restarted in each worker
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def _ensure_checking(self, engines):
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._engines = engines
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name='replica-monitor', daemon=True).start()
+
+    def _run(self):
+        while True:
+            for key, engine in self._engines.items():
+                self._refresh(key, engine)
+            time.sleep(self.interval)
+
+    def _refresh(self, key, engine):
+        try:
+            lag, failed = measure_lag(engine), False
+        except Exception as e:
+            print(f'Replica lag check failed for {key}: {str(e)}')
+            lag, failed = None, True
+        with self._lock:
+            self._state[key] = {'checked_at': time.monotonic(), 'lag': lag, 'failed': failed}
+
+    def is_healthy(self, key):
+        state = self._state.get(key)
+        # A check stuck on a hung replica must not leave it looking healthy
+        return (state is not None and state['lag'] is not None and state['lag'] <= self.max_lag
+                and time.monotonic() - state['checked_at'] <= 3 * self.interval)
+
+    def choose(self, engines):
+        """A healthy replica bind key, round-robin, or None to use the primary"""
+        keys = sorted(key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX))
+        if not keys:
+            return None
+        self._ensure_checking({key: engines[key] for key in keys})
+        healthy = [key for key in keys if self.is_healthy(key)]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def status(self):
+        with self._lock:
+            return {
+                key: {'lag_seconds': state['lag'], 'healthy': self.is_healthy(key), 'check_failed': state['failed'],
+                      'checked_seconds_ago': round(time.monotonic() - state['checked_at'], 1)}
+                for key, state in sorted(self._state.items())
+            }
+
+
+replica_monitor = ReplicaMonitor()
+
+
+_recent_writes = None
+
+def get_recent_writes():
+    """User ids that committed a write in the last READ_YOUR_WRITES_SECONDS (per process without Redis)"""
+    global _recent_writes
+    if _recent_writes is None:
+        from cache import LRUCache, RedisCache
+        from extensions import get_redis
+        client = get_redis()
+        if client is not None:
+            _recent_writes = RedisCache(client, prefix='recent-write:', ttl=READ_YOUR_WRITES_SECONDS)
+        else:
+            _recent_writes = LRUCache(maxsize=100000, ttl=READ_YOUR_WRITES_SECONDS)
+    return _recent_writes
+
+
+def check_recent_writes(binds):
+    """
+    Refuse replicas when a write on one worker wouldn't keep the writer's next
+    read, on another worker, off a lagging replica
+    """
+    if not any(key.startswith(REPLICA_BIND_PREFIX) for key in binds):
+        return
+    if not get_recent_writes().shared and WEB_CONCURRENCY > 1:
+        raise RuntimeError(f'DATABASE_REPLICA_URLS with {WEB_CONCURRENCY} workers needs REDIS_URL, '
+                           'so every worker knows who just wrote; set it or run one worker')
+
+
+def request_user_id():
+    """Identity of the request's verified JWT, or None"""
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None  # No JWT verified in this request
+
+
+def read_replica(view):
+    """Allow a read-only view's SELECTs to run on a replica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends @read_replica SELECTs to a replica engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and getattr(clause, 'is_select', False) and not self.info.get('wrote'):
+            engine = self._replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self):
+        if not has_request_context() or not g.get('db_read_replica'):
+            return None
+        if 'db_replica_engine' not in g:
+            # Decided once per request, on the first SELECT (after any JWT check)
+            user_id = request_user_id()
+            if user_id is not None and get_recent_writes().get(str(user_id)) is not None:
+                g.db_replica_engine = None
+            else:
+                engines = self._db.engines
+                key = replica_monitor.choose(engines)
+                g.db_replica_engine = engines[key] if key else None
+        return g.db_replica_engine
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(session, flush_context):
+    # Later reads in this request see the write too
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _record_statement_write(orm_execute_state):
+    # INSERT/UPDATE/DELETE passed to session.execute() don't go through a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _start_read_your_writes_window(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        user_id = request_user_id()
+        if user_id is not None:
+            get_recent_writes().set(str(user_id), b'1')
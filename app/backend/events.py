@@ -0,0 +1,230 @@
+"""
+Real-time events, pushed to clients over Server-Sent Events (api/events.py).
+
+Each user has a channel, 'user:<id>'. Writes publish small events to the
+channels of the users who should hear about them (followers for a new post,
+participants for a message), and every open GET /api/events stream of
+those users receives them, so clients refresh when something changes
+instead of polling.
+
+MemoryBroker delivers within one process (single worker, tests), so with
+more than one worker (WEB_CONCURRENCY) and no Redis, streams are refused
+rather than silently missing other workers' events. RedisBroker publishes
+through Redis pub/sub so events reach streams held by any worker on any
+node; each process keeps one pub/sub connection, subscribed to the
+channels its own clients are listening on.
+"""
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from config import EVENTS_QUEUE_SIZE, WEB_CONCURRENCY
+from extensions import get_redis
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One stream's view of the broker: a bounded queue of events for its channels"""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = channels
+        self.queue = queue.Queue(maxsize)
+        # Events were dropped because the client read too slowly; it should resync
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next event, or None after `timeout` seconds without one"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """In-process pub/sub; also the local fan-out behind RedisBroker"""
+
+    def __init__(self, queue_size=EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)  # channel -> subscriptions
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, list(channels), self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                if not self._subscribers[channel]:
+                    self._channel_opened(channel)
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+                    self._channel_closed(channel)
+
+    def publish(self, channels, event):
+        for channel in channels:
+            self._deliver(channel, event)
+
+    def connection_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._subscribers.values() for subscription in subscribers})
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def _channel_opened(self, channel):
+        pass
+
+    def _channel_closed(self, channel):
+        pass
+
+
+class RedisBroker(MemoryBroker):
+    """Pub/sub through Redis (or any server speaking its protocol), shared by every worker"""
+
+    def __init__(self, client, prefix='events:', queue_size=EVENTS_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.client = client
+        self.prefix = prefix
+        # Channel changes for the listener thread, which owns the pub/sub connection
+        self._changes = queue.SimpleQueue()
+        self._listener = None
+        self._subscribed = {}  # channel -> threading.Event, set once Redis is told
+
+    def subscribe(self, channels, wait=2.0):
+        """As MemoryBroker.subscribe, but returns once the listener has subscribed in Redis (or after `wait` seconds)"""
+        subscription = super().subscribe(channels)
+        deadline = time.monotonic() + wait
+        for channel in subscription.channels:
+            with self._lock:
+                ready = self._subscribed.get(channel)
+            if ready is not None:
+                ready.wait(max(0, deadline - time.monotonic()))
+        return subscription
+
+    def publish(self, channels, event):
+        data = json.dumps(event)
+        pipe = self.client.pipeline(transaction=False)
+        for channel in channels:
+            pipe.publish(self.prefix + channel, data)
+        pipe.execute()
+
+    def _channel_opened(self, channel):
+        self._subscribed[channel] = threading.Event()
+        self._changes.put(('subscribe', channel))
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+            self._listener.start()
+
+    def _channel_closed(self, channel):
+        self._subscribed.pop(channel, None)
+        self._changes.put(('unsubscribe', channel))
+
+    def _apply(self, pubsub, action, channel):
+        getattr(pubsub, action)(self.prefix + channel)
+        if action == 'subscribe':
+            with self._lock:
+                ready = self._subscribed.get(channel)
+            if ready is not None:
+                ready.set()
+
+    def _listen(self):
+        pubsub = None
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    with self._lock:
+                        channels = list(self._subscribers)
+                    for channel in channels:
+                        self._apply(pubsub, 'subscribe', channel)
+                while True:
+                    try:
+                        action, channel = self._changes.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._apply(pubsub, action, channel)
+                if not pubsub.subscribed:
+                    # Nothing to listen to: wait for the first subscriber
+                    self._apply(pubsub, *self._changes.get())
+                    continue
+                # Short, so new streams don't wait long for their SUBSCRIBE
+                message = pubsub.get_message(timeout=0.1)
+                if message and message['type'] == 'message':
+                    channel = message['channel'].decode()[len(self.prefix):]
+                    self._deliver(channel, json.loads(message['data']))
+            except Exception as e:
+                # Reconnect and resubscribe; streams stay open meanwhile
+                print(f'Event listener error: {str(e)}')
+                pubsub = None
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    """RedisBroker when REDIS_URL is set, else a MemoryBroker for this process"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            client = get_redis()
+            _broker = RedisBroker(client) if client is not None else MemoryBroker()
+        return _broker
+
+
+def set_broker(broker):
+    """Swap the broker, e.g. for a MemoryBroker in tests"""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def broker_is_shared():
+    """Whether published events reach every worker's streams"""
+    return isinstance(get_broker(), RedisBroker) or WEB_CONCURRENCY <= 1
+
+
+def check_broker():
+    """Warn at startup when events can't cross workers (GET /api/events then answers 503)"""
+    if not broker_is_shared():
+        print(f'Warning: {WEB_CONCURRENCY} workers without REDIS_URL: real-time events are disabled')
+
+
+def publish(user_ids, event_type, data):
+    """
+    Send an event to users' open streams. Called after the write has
+    committed; delivery is best effort, so failures are logged, not raised.
+    """
+    channels = [user_channel(user_id) for user_id in user_ids]
+    if not channels:
+        return
+    try:
+        get_broker().publish(channels, {'type': event_type, 'data': data})
+    except Exception as e:
+        print(f'Event publish error: {str(e)}')
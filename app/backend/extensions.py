@@ -1,5 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
+
+# Read-only views can send their SELECTs to a replica (see db_routing)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
+
+_redis_client = None
+
+def get_redis():
+    """Shared Redis client for REDIS_URL, or None when Redis is not configured"""
+    global _redis_client
+    from config import REDIS_URL
+    if not REDIS_URL:
+        return None
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
@@ -0,0 +1,93 @@
+"""
+Image processing run by background workers (see tasks.py). Functions here
+take and return plain values so they can run in a separate process.
+"""
+import os
+from PIL import Image
+
+AVATAR_MAX_SIZE = (512, 512)
+THUMBNAIL_SIZE = (128, 128)
+PIL_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF'}
+
+
+def process_avatar(source_path, upload_folder, filename, widths=(), formats=()):
+    """
+    Resize an uploaded avatar to at most 512px and write a 128px JPEG
+    thumbnail next to it, plus responsive variants (see generate_variants).
+    Returns (filename, thumbnail_filename, variants).
+    The uploaded original at source_path is left in place.
+    """
+    ext = filename.rsplit('.', 1)[1].lower()
+    save_path = os.path.join(upload_folder, filename)
+    thumb_filename = f'thumb_{filename}'
+    with Image.open(source_path) as img:
+        source_format = img.format or PIL_FORMATS.get(ext, 'JPEG')
+
+        # Convert to RGB if needed
+        if ext in ('jpg', 'jpeg', 'png') and img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+        # Resize if too large (max 512x512)
+        if img.size[0] > AVATAR_MAX_SIZE[0] or img.size[1] > AVATAR_MAX_SIZE[1]:
+            img.thumbnail(AVATAR_MAX_SIZE, Image.Resampling.LANCZOS)
+        img.save(save_path, format=source_format, quality=85)
+
+        thumb = img.copy()
+        thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        if thumb.mode not in ('RGB', 'L'):
+            thumb = thumb.convert('RGB')
+        thumb.save(os.path.join(upload_folder, thumb_filename), format='JPEG', quality=80)
+    variants = generate_variants(source_path, upload_folder, filename, widths, formats) if widths else []
+    return filename, thumb_filename, variants
+
+
+VARIANT_SAVE_OPTIONS = {
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60, 'speed': 8},
+}
+VARIANT_EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'avif': 'avif'}
+
+
+def supported_variant_formats(formats):
+    """Drop formats this Pillow build can't encode (AVIF needs libavif)"""
+    from PIL import features
+    return [fmt for fmt in formats if fmt in VARIANT_SAVE_OPTIONS and (fmt == 'jpeg' or features.check(fmt))]
+
+
+def generate_variants(source_path, output_folder, filename, widths, formats):
+    """
+    Write resized copies of an image for each width and format, named
+    `<stem>_<width>w.<ext>` next to the source. Widths above the source width
+    are replaced by a single variant at the source width (no upscaling).
+    EXIF and other metadata are not carried over; orientation is applied first.
+    Returns a list of dicts describing the written files.
+    """
+    from PIL import ImageOps
+
+    stem = filename.rsplit('.', 1)[0]
+    variants = []
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+        targets = {width for width in widths if width <= img.width}
+        if any(width > img.width for width in widths):
+            targets.add(img.width)
+        targets = sorted(targets)
+        for width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img if width == img.width else img.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in supported_variant_formats(formats):
+                frame = resized.convert('RGB') if fmt == 'jpeg' and resized.mode != 'RGB' else resized
+                variant_filename = f'{stem}_{width}w.{VARIANT_EXTENSIONS[fmt]}'
+                path = os.path.join(output_folder, variant_filename)
+                frame.save(path, **VARIANT_SAVE_OPTIONS[fmt])
+                variants.append({
+                    'width': width,
+                    'height': height,
+                    'format': fmt,
+                    'filename': variant_filename,
+                    'bytes': os.path.getsize(path)
+                })
+    return variants
@@ -0,0 +1,99 @@
+"""
+Post likes.
+
+post_likes holds who liked what, with (post_id, user_id) as the primary key,
+so liking twice or unliking twice changes nothing. Each post's count is kept
+in LIKE_COUNTER_SHARDS rows of post_like_counts, updated in the same
+transaction as the like itself: every like bumps a random shard, so
+concurrent likes on a popular post mostly land on different rows instead of
+waiting on one row lock, and reading a count sums at most a few rows.
+"""
+import random
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from config import LIKE_COUNTER_SHARDS
+from extensions import db
+from models.like import PostLike, PostLikeCount
+
+
+def _bump(post_id, delta):
+    shard = random.randrange(LIKE_COUNTER_SHARDS)
+    where = (PostLikeCount.post_id == post_id, PostLikeCount.shard == shard)
+    updated = db.session.execute(
+        db.update(PostLikeCount).where(*where).values(count=PostLikeCount.count + delta)).rowcount
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(PostLikeCount).values(post_id=post_id, shard=shard, count=delta))
+    except IntegrityError:
+        # Another transaction created the shard first
+        db.session.execute(
+            db.update(PostLikeCount).where(*where).values(count=PostLikeCount.count + delta))
+
+
+def like_post(post_id, user_id):
+    """Like a post; returns False if the user already liked it"""
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(PostLike).values(post_id=post_id, user_id=user_id))
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    _bump(post_id, 1)
+    db.session.commit()
+    return True
+
+
+def unlike_post(post_id, user_id):
+    """Remove a like; returns False if there was none"""
+    deleted = db.session.execute(
+        db.delete(PostLike).where(PostLike.post_id == post_id, PostLike.user_id == user_id)).rowcount
+    if deleted:
+        _bump(post_id, -1)
+    db.session.commit()
+    return bool(deleted)
+
+
+def like_count(post_id):
+    return db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(PostLikeCount.count), 0)).where(PostLikeCount.post_id == post_id)
+    ).scalar()
+
+
+def load_likes(post_ids, user_id=None):
+    """
+    {post_id: (count, liked by user_id)} for a batch of posts in one query.
+    Posts nobody has liked are left out.
+    """
+    if not post_ids:
+        return {}
+    counts = (db.select(PostLikeCount.post_id, db.func.sum(PostLikeCount.count).label('likes'))
+              .where(PostLikeCount.post_id.in_(post_ids))
+              .group_by(PostLikeCount.post_id)
+              .subquery())
+    if user_id is None:
+        liked = db.false()
+    else:
+        liked = db.select(PostLike.post_id).where(
+            PostLike.post_id == counts.c.post_id, PostLike.user_id == user_id).exists()
+    rows = db.session.execute(db.select(counts.c.post_id, counts.c.likes, liked.label('liked'))).all()
+    return {row.post_id: (int(row.likes), bool(row.liked)) for row in rows}
+
+
+likes_cli = AppGroup('likes', help='Like counter commands.')
+
+@likes_cli.command('recount')
+def recount_command():
+    """Rebuild every post's like counter from post_likes, one shard per post."""
+    counts = db.session.execute(
+        db.select(PostLike.post_id, db.func.count()).group_by(PostLike.post_id)).all()
+    db.session.execute(db.delete(PostLikeCount))
+    if counts:
+        db.session.execute(db.insert(PostLikeCount),
+                           [{'post_id': post_id, 'shard': 0, 'count': count} for post_id, count in counts])
+    db.session.commit()
+    click.echo(f'Recounted likes for {len(counts)} posts')
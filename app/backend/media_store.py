@@ -0,0 +1,225 @@
+"""
+Content-addressed media store.
+
+Uploaded files are named by the SHA-256 of their bytes and kept under sharded
+keys, ab/cd/<sha256>.<ext>, in the configured storage backend (storage.py), so
+the same image uploaded a thousand times is stored once: a duplicate costs one
+hash pass and no write.
+Files derived from a blob (resized avatars, thumbnails, responsive variants)
+sit next to it and share its hash as a name prefix.
+
+Public URLs keep their flat form (/uploads/post_media/<sha256>.jpg); blob_key()
+maps such a name to its shard. Files uploaded before the store existed stay in
+the legacy per-type folders.
+
+media_blobs.ref_count counts the posts and profiles using each blob. Blobs
+that drop to zero are removed by `flask media gc` after a grace period.
+"""
+import hashlib
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from config import MEDIA_STORE_PATH, MEDIA_GC_GRACE_HOURS
+from storage import get_storage, guess_content_type
+from models.media_blob import MediaBlob
+from models.media_variant import MediaVariant
+
+HASH_BLOCK_SIZE = 64 * 1024
+GC_BATCH_SIZE = 1000
+# Local staging area; inside the store root so local moves are renames
+TMP_FOLDER = os.path.join(MEDIA_STORE_PATH, 'tmp')
+BLOB_NAME_RE = re.compile(r'^(?:thumb_)?([0-9a-f]{64})(?:[_.]|$)')
+
+
+def sha_from_name(name):
+    """The blob hash a stored or derived filename belongs to, or None for legacy names"""
+    match = BLOB_NAME_RE.match(name or '')
+    return match.group(1) if match else None
+
+
+def blob_key(name):
+    """Storage key of a stored or derived file, or None for legacy names"""
+    sha = sha_from_name(name)
+    if sha is None:
+        return None
+    return f'{sha[:2]}/{sha[2:4]}/{name}'
+
+
+def hash_stream(stream):
+    """(sha256 hex, size) of a seekable stream, which is rewound afterwards"""
+    hasher = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while True:
+        block = stream.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        hasher.update(block)
+        size += len(block)
+    stream.seek(0)
+    return hasher.hexdigest(), size
+
+
+def existing_blob(sha):
+    """The stored blob for a hash, touched so a concurrent gc leaves it alone"""
+    blob = db.session.get(MediaBlob, sha)
+    if blob is None or not get_storage().exists(blob_key(blob.filename)):
+        return None
+    blob.updated_at = datetime.utcnow()
+    return blob
+
+
+def _register(sha, ext, size):
+    blob = db.session.get(MediaBlob, sha)
+    if blob is not None:
+        blob.updated_at = datetime.utcnow()
+        return blob
+    try:
+        with db.session.begin_nested():
+            blob = MediaBlob(sha256=sha, ext=ext, size=size, ref_count=0)
+            db.session.add(blob)
+    except IntegrityError:
+        # Stored concurrently by another request with the same bytes
+        blob = db.session.get(MediaBlob, sha)
+    return blob
+
+
+def store_upload(file, ext):
+    """
+    Store a werkzeug FileStorage. Returns (blob, created); created is False
+    when identical bytes were already stored and nothing was written.
+    """
+    sha, size = hash_stream(file.stream)
+    blob = existing_blob(sha)
+    if blob is not None:
+        return blob, False
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    tmp_path = os.path.join(TMP_FOLDER, secrets.token_hex(16))
+    file.save(tmp_path)
+    return _move_into_store(tmp_path, sha, ext, size), True
+
+
+def store_file(path, sha, ext):
+    """
+    Move an already-hashed local file (e.g. a finished chunked upload) into
+    the store. Returns (blob, created); a duplicate is deleted instead of moved.
+    """
+    blob = existing_blob(sha)
+    if blob is not None:
+        os.remove(path)
+        return blob, False
+    return _move_into_store(path, sha, ext, os.path.getsize(path)), True
+
+
+def _move_into_store(tmp_path, sha, ext, size):
+    blob = _register(sha, ext, size)
+    get_storage().put_file(tmp_path, blob_key(blob.filename), guess_content_type(blob.filename))
+    return blob
+
+
+def register_stored(sha, ext, size):
+    """Record a blob written straight to storage by the client (presigned upload)"""
+    return _register(sha, ext, size)
+
+
+def acquire(sha):
+    """Count a new reference to a blob (no-op for legacy files)"""
+    if sha:
+        db.session.execute(
+            db.update(MediaBlob)
+            .where(MediaBlob.sha256 == sha)
+            .values(ref_count=MediaBlob.ref_count + 1, updated_at=datetime.utcnow()))
+
+
+def release(sha):
+    """Drop a reference to a blob; at zero it becomes collectable"""
+    if sha:
+        db.session.execute(
+            db.update(MediaBlob)
+            .where(MediaBlob.sha256 == sha, MediaBlob.ref_count > 0)
+            .values(ref_count=MediaBlob.ref_count - 1, updated_at=datetime.utcnow()))
+
+
+def _remove_blob_files(sha):
+    storage = get_storage()
+    keys = [key for key, modified in storage.list(f'{sha[:2]}/{sha[2:4]}/')
+            if sha_from_name(key.rsplit('/', 1)[-1]) == sha]
+    for key in keys:
+        storage.delete(key)
+    return len(keys)
+
+
+def collect_garbage(grace_hours=MEDIA_GC_GRACE_HOURS, dry_run=False):
+    """
+    Delete unreferenced blobs, their derived files and variant rows, plus
+    files on disk with no media_blobs row. Only things untouched for
+    `grace_hours` are considered, so uploads still being attached survive.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    counts = {'blobs': 0, 'files': 0, 'orphans': 0}
+    candidates = [row[0] for row in db.session.query(MediaBlob.sha256)
+                  .filter(MediaBlob.ref_count <= 0, MediaBlob.updated_at < cutoff).all()]
+    for sha in candidates:
+        if dry_run:
+            counts['blobs'] += 1
+            continue
+        # Re-checked in the DELETE itself in case the blob was reused meanwhile
+        deleted = db.session.execute(
+            db.delete(MediaBlob)
+            .where(MediaBlob.sha256 == sha, MediaBlob.ref_count <= 0, MediaBlob.updated_at < cutoff)
+        ).rowcount
+        if not deleted:
+            continue
+        MediaVariant.query.filter(MediaVariant.media_key.like(f'%/{sha}%')).delete(synchronize_session=False)
+        db.session.commit()
+        counts['blobs'] += 1
+        counts['files'] += _remove_blob_files(sha)
+
+    # Files left behind by crashed requests or deleted rows
+    cutoff_ts = time.time() - grace_hours * 3600
+    if os.path.isdir(TMP_FOLDER):
+        for name in os.listdir(TMP_FOLDER):
+            path = os.path.join(TMP_FOLDER, name)
+            if os.path.getmtime(path) < cutoff_ts:
+                if not dry_run:
+                    os.remove(path)
+                counts['orphans'] += 1
+    storage = get_storage()
+    stale = {}
+    for key, modified in storage.list():
+        sha = sha_from_name(key.rsplit('/', 1)[-1])
+        if sha and modified < cutoff_ts and not key.startswith('tmp/'):
+            stale.setdefault(sha, []).append(key)
+    shas = list(stale)
+    for start in range(0, len(shas), GC_BATCH_SIZE):
+        batch = shas[start:start + GC_BATCH_SIZE]
+        known = {row[0] for row in db.session.query(MediaBlob.sha256).filter(MediaBlob.sha256.in_(batch)).all()}
+        for sha in batch:
+            if sha in known:
+                continue
+            for key in stale[sha]:
+                if not dry_run:
+                    storage.delete(key)
+                counts['orphans'] += 1
+    return counts
+
+
+media_cli = AppGroup('media', help='Content-addressed media store commands.')
+
+@media_cli.command('gc')
+@click.option('--grace-hours', default=MEDIA_GC_GRACE_HOURS, show_default=True,
+              help='Only collect blobs and files untouched for this long.')
+@click.option('--dry-run', is_flag=True, help='Report what would be removed without deleting anything.')
+def gc_command(grace_hours, dry_run):
+    """Remove unreferenced media blobs and orphaned files."""
+    counts = collect_garbage(grace_hours, dry_run)
+    verb = 'Would remove' if dry_run else 'Removed'
+    click.echo(f"{verb} {counts['blobs']} blobs ({counts['files']} files) and {counts['orphans']} orphaned files")
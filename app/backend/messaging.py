@@ -0,0 +1,229 @@
+"""
+Conversations and messages.
+
+History is read newest first from the (conversation_id, id) index, a page
+at a time below a message id. Instead of a read flag per message, each
+participant keeps a read cursor (the last message id they have read) and an
+unread count; sending a message bumps the other participants' counts and
+their UnreadCounter totals in the same transaction, so the unread badge is
+a primary key read. Participants also carry the conversation's last
+activity time, so the inbox is one range of ix_conversation_participants_inbox.
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.message import Conversation, ConversationParticipant, Message, UnreadCounter
+from models.user import User
+
+MAX_PARTICIPANTS = 50
+
+
+class MessagingError(ValueError):
+    """A conversation that can't be started; the message is safe to show"""
+
+
+def direct_key(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f'{low}:{high}'
+
+
+def _ensure_counters(user_ids):
+    existing = set(db.session.execute(
+        db.select(UnreadCounter.user_id).where(UnreadCounter.user_id.in_(user_ids))).scalars())
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(UnreadCounter), [{'user_id': user_id, 'count': 0} for user_id in missing])
+    except IntegrityError:
+        # Created concurrently; insert the rest one at a time
+        for user_id in missing:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(UnreadCounter).values(user_id=user_id, count=0))
+            except IntegrityError:
+                pass
+
+
+def start_conversation(user_id, other_ids):
+    """
+    (conversation id, created) for a conversation between user_id and
+    other_ids; two people always share the same direct conversation
+    """
+    members = sorted({user_id, *other_ids})
+    if len(members) < 2:
+        raise MessagingError('Add someone to talk to')
+    if len(members) > MAX_PARTICIPANTS:
+        raise MessagingError(f'Conversations are limited to {MAX_PARTICIPANTS} people')
+    found = db.session.execute(db.select(db.func.count()).select_from(User).where(User.id.in_(members))).scalar()
+    if found != len(members):
+        raise MessagingError('User not found')
+
+    key = direct_key(*members) if len(members) == 2 else None
+    if key:
+        existing = db.session.execute(db.select(Conversation.id).where(Conversation.direct_key == key)).scalar()
+        if existing:
+            return existing, False
+
+    now = datetime.utcnow()
+    try:
+        conversation = Conversation(direct_key=key, created_at=now)
+        db.session.add(conversation)
+        db.session.flush()
+        conversation_id = conversation.id
+        db.session.execute(db.insert(ConversationParticipant), [
+            {'conversation_id': conversation_id, 'user_id': member, 'last_read_message_id': 0,
+             'unread_count': 0, 'last_message_at': now, 'joined_at': now}
+            for member in members])
+        _ensure_counters(members)
+        db.session.commit()
+    except IntegrityError:
+        # The other person started the same direct conversation at the same moment
+        db.session.rollback()
+        if not key:
+            raise
+        return db.session.execute(db.select(Conversation.id).where(Conversation.direct_key == key)).scalar_one(), False
+    return conversation_id, True
+
+
+def participant(conversation_id, user_id):
+    return db.session.get(ConversationParticipant, (conversation_id, user_id))
+
+
+def _lock_conversation(conversation_id):
+    """
+    Lock a conversation and then its participants' rows in user_id order,
+    returning them. Sends in a conversation take turns on its row, and every
+    writer locks participant rows before UnreadCounter rows, both in user_id
+    order, so concurrent sends and reads can't deadlock, even across
+    conversations that share people.
+    """
+    conversation = db.session.execute(
+        db.select(Conversation).where(Conversation.id == conversation_id).with_for_update()
+        .execution_options(populate_existing=True)).scalar_one()
+    rows = db.session.execute(
+        db.select(ConversationParticipant).where(ConversationParticipant.conversation_id == conversation_id)
+        .order_by(ConversationParticipant.user_id).with_for_update()
+        .execution_options(populate_existing=True)).scalars().all()
+    return conversation, rows
+
+
+def _lock_unread_counters(user_ids):
+    db.session.execute(db.select(UnreadCounter.user_id).where(UnreadCounter.user_id.in_(user_ids))
+                       .order_by(UnreadCounter.user_id).with_for_update())
+
+
+def send_message(conversation_id, sender_id, content):
+    """Store a message and update counters; returns (message, recipient ids)"""
+    conversation, rows = _lock_conversation(conversation_id)
+    sender = next(row for row in rows if row.user_id == sender_id)
+    recipients = [row.user_id for row in rows if row.user_id != sender_id]
+    _lock_unread_counters([row.user_id for row in rows])
+    message = Message(conversation_id=conversation_id, sender_id=sender_id, content=content,
+                      created_at=datetime.utcnow())
+    db.session.add(message)
+    db.session.flush()
+    members = ConversationParticipant.conversation_id == conversation_id
+    db.session.execute(db.update(ConversationParticipant)
+                       .where(members, ConversationParticipant.user_id != sender_id)
+                       .values(unread_count=ConversationParticipant.unread_count + 1,
+                               last_message_at=message.created_at))
+    if recipients:
+        db.session.execute(db.update(UnreadCounter).where(UnreadCounter.user_id.in_(recipients))
+                           .values(count=UnreadCounter.count + 1))
+    # Replying reads everything before it
+    if sender.unread_count:
+        db.session.execute(db.update(UnreadCounter).where(UnreadCounter.user_id == sender_id)
+                           .values(count=UnreadCounter.count - sender.unread_count))
+    sender.last_read_message_id = message.id
+    sender.unread_count = 0
+    sender.last_message_at = message.created_at
+    conversation.last_message_id = message.id
+    db.session.commit()
+    return message, recipients
+
+
+def mark_read(conversation_id, user_id, message_id=None):
+    """
+    Move the user's read cursor up to message_id (default: the latest
+    message); it never moves back. Returns the conversation's unread count.
+    """
+    # Locked in the same order as send_message, so a message sent meanwhile
+    # can't be counted twice or lost
+    conversation = db.session.execute(
+        db.select(Conversation).where(Conversation.id == conversation_id).with_for_update()
+        .execution_options(populate_existing=True)).scalar_one()
+    reader = db.session.execute(
+        db.select(ConversationParticipant).where(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id == user_id).with_for_update()
+        .execution_options(populate_existing=True)).scalar_one()
+    latest = conversation.last_message_id or 0
+    target = latest if message_id is None else min(message_id, latest)
+    if target <= reader.last_read_message_id:
+        unread = reader.unread_count
+        db.session.rollback()
+        return unread
+    if target == latest:
+        unread = 0
+    else:
+        unread = db.session.execute(
+            db.select(db.func.count()).select_from(Message).where(
+                Message.conversation_id == conversation_id, Message.id > target,
+                Message.sender_id != user_id)).scalar()
+    read = reader.unread_count - unread
+    reader.last_read_message_id = target
+    reader.unread_count = unread
+    if read:
+        db.session.execute(db.update(UnreadCounter).where(UnreadCounter.user_id == user_id)
+                           .values(count=UnreadCounter.count - read))
+    db.session.commit()
+    return unread
+
+
+def unread_total(user_id):
+    counter = db.session.get(UnreadCounter, user_id)
+    return max(counter.count, 0) if counter else 0
+
+
+def history(conversation_id, before=None, limit=20):
+    """Messages newest first, with ids below `before`; limit + 1 rows so callers can tell if there are more"""
+    query = db.select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None:
+        query = query.where(Message.id < before)
+    return db.session.execute(query.order_by(Message.id.desc()).limit(limit + 1)).scalars().all()
+
+
+def inbox(user_id, before=None, limit=20):
+    """
+    [(participant row, last message or None)], most recently active first,
+    after the (last_message_at, conversation_id) position `before`
+    """
+    query = (db.select(ConversationParticipant, Message)
+             .join(Conversation, Conversation.id == ConversationParticipant.conversation_id)
+             .outerjoin(Message, Message.id == Conversation.last_message_id)
+             .where(ConversationParticipant.user_id == user_id))
+    if before:
+        last_message_at, conversation_id = before
+        query = query.where(db.or_(
+            ConversationParticipant.last_message_at < last_message_at,
+            db.and_(ConversationParticipant.last_message_at == last_message_at,
+                    ConversationParticipant.conversation_id < conversation_id)))
+    query = query.order_by(ConversationParticipant.last_message_at.desc(),
+                           ConversationParticipant.conversation_id.desc()).limit(limit + 1)
+    return db.session.execute(query).all()
+
+
+def members(conversation_ids):
+    """{conversation id: [user ids]} in one query"""
+    result = {conversation_id: [] for conversation_id in conversation_ids}
+    if conversation_ids:
+        rows = db.session.execute(
+            db.select(ConversationParticipant.conversation_id, ConversationParticipant.user_id)
+            .where(ConversationParticipant.conversation_id.in_(conversation_ids)))
+        for conversation_id, user_id in rows:
+            result[conversation_id].append(user_id)
+    return result
@@ -0,0 +1,41 @@
+from extensions import db
+from datetime import datetime
+
+# Materialized path segment: a comment id as fixed-width hex, so paths sort like their ids
+PATH_SEGMENT_LENGTH = 8
+
+class Comment(db.Model):
+    """
+    A comment on a post (see comments.py). `path` is the ids of its
+    ancestors, oldest first, one PATH_SEGMENT_LENGTH segment each: '' for a
+    top-level comment. Siblings share a path, so one level of a thread is a
+    range of ix_comments_post_path_id.
+    """
+    __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_post_path_id', 'post_id', 'path', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    path = db.Column(db.String(255), nullable=False, default='')
+    content = db.Column(db.Text, nullable=False)
+    reply_count = db.Column(db.Integer, nullable=False, default=0)  # Direct replies shown: live, or deleted with replies
+    deleted = db.Column(db.Boolean, nullable=False, default=False)  # Kept as a placeholder for its replies
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def depth(self):
+        return len(self.path) // PATH_SEGMENT_LENGTH
+
+    @property
+    def parent_id(self):
+        return int(self.path[-PATH_SEGMENT_LENGTH:], 16) if self.path else None
+
+    @property
+    def child_path(self):
+        """The path of this comment's replies"""
+        return self.path + format(self.id, f'0{PATH_SEGMENT_LENGTH}x')
+
+    def __repr__(self):
+        return f'<Comment {self.id} on Post {self.post_id}>'
@@ -0,0 +1,30 @@
+from extensions import db
+from datetime import datetime
+
+class ConnectionRequest(db.Model):
+    """A pending connection request; removed when accepted or declined"""
+    __tablename__ = 'connection_requests'
+    __table_args__ = (
+        # Incoming requests for a user
+        db.Index('ix_connection_requests_addressee_requester', 'addressee_id', 'requester_id'),
+    )
+    requester_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    addressee_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ConnectionRequest {self.requester_id} -> {self.addressee_id}>'
+
+class Connection(db.Model):
+    """
+    One direction of a connection: each connection is stored as two rows,
+    (a, b) and (b, a), so a user's connections are one primary key range
+    read from the index alone, in id order.
+    """
+    __tablename__ = 'connections'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Connection {self.user_id} <-> {self.other_id}>'
@@ -0,0 +1,15 @@
+from extensions import db
+from datetime import datetime
+
+class Follow(db.Model):
+    __tablename__ = 'follows'
+    __table_args__ = (
+        # Reverse lookup for fan-out: who follows this author?
+        db.Index('ix_follows_followee_follower', 'followee_id', 'follower_id'),
+    )
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    followee_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Follow {self.follower_id} -> {self.followee_id}>'
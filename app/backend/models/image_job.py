@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+class ImageJob(db.Model):
+    __tablename__ = 'image_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed
+    filename = db.Column(db.String(255), nullable=False)
+    thumbnail_filename = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImageJob {self.id} {self.status}>'
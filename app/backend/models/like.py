@@ -0,0 +1,25 @@
+from extensions import db
+from datetime import datetime
+
+class PostLike(db.Model):
+    """A user's like on a post; the primary key makes liking twice a no-op"""
+    __tablename__ = 'post_likes'
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PostLike {self.user_id} -> {self.post_id}>'
+
+class PostLikeCount(db.Model):
+    """
+    One shard of a post's like count; the count is the sum over its shards.
+    Likes update a random shard, so a busy post's likes don't queue on one row lock.
+    """
+    __tablename__ = 'post_like_counts'
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PostLikeCount {self.post_id}/{self.shard}: {self.count}>'
@@ -0,0 +1,20 @@
+from extensions import db
+from datetime import datetime
+
+class MediaBlob(db.Model):
+    """An uploaded file in the content-addressed media store (see media_store.py)"""
+    __tablename__ = 'media_blobs'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Posts and profiles pointing at this blob; 0 means collectable by `flask media gc`
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def filename(self):
+        return f'{self.sha256}.{self.ext}'
+
+    def __repr__(self):
+        return f'<MediaBlob {self.sha256[:12]} refs={self.ref_count}>'
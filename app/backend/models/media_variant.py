@@ -0,0 +1,20 @@
+from extensions import db
+from datetime import datetime
+
+class MediaVariant(db.Model):
+    __tablename__ = 'media_variants'
+    __table_args__ = (
+        db.UniqueConstraint('media_key', 'format', 'width', name='uq_media_variants_key_format_width'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    # Source image as '<folder>/<filename>', e.g. 'post_media/post_1_2025.jpg'
+    media_key = db.Column(db.String(255), nullable=False)
+    format = db.Column(db.String(10), nullable=False)  # jpeg, webp, avif
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    bytes = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MediaVariant {self.media_key} {self.format} {self.width}w>'
@@ -0,0 +1,58 @@
+from extensions import db
+from datetime import datetime
+
+class Conversation(db.Model):
+    """A direct (two-person) or group conversation; see messaging.py"""
+    __tablename__ = 'conversations'
+    id = db.Column(db.Integer, primary_key=True)
+    # '<lower user id>:<higher user id>' for direct conversations, so each pair has one
+    direct_key = db.Column(db.String(32), nullable=True, unique=True)
+    last_message_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Conversation {self.id}>'
+
+class ConversationParticipant(db.Model):
+    """
+    A user's membership of a conversation, with their read cursor (the last
+    message they have read) and how many messages from others came after it
+    """
+    __tablename__ = 'conversation_participants'
+    __table_args__ = (
+        # The inbox: a user's conversations by last activity
+        db.Index('ix_conversation_participants_inbox', 'user_id', 'last_message_at', 'conversation_id'),
+    )
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    last_read_message_id = db.Column(db.Integer, nullable=False, default=0)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    last_message_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Copied from the conversation
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ConversationParticipant {self.user_id} in {self.conversation_id}>'
+
+class Message(db.Model):
+    __tablename__ = 'messages'
+    __table_args__ = (
+        # History pages: one conversation's messages by id
+        db.Index('ix_messages_conversation_id_id', 'conversation_id', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Message {self.id} in {self.conversation_id}>'
+
+class UnreadCounter(db.Model):
+    """A user's unread messages across all conversations, kept with the per-conversation counts"""
+    __tablename__ = 'message_unread_counts'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UnreadCounter {self.user_id}: {self.count}>'
@@ -3,6 +3,12 @@ from datetime import datetime
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Keyset pagination index for the feed: ORDER BY created_at DESC, id DESC
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        # Per-author seeks for timeline rebuilds and fan-out-on-read
+        db.Index('ix_posts_user_id_id', 'user_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -11,6 +17,8 @@ class Post(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_public = db.Column(db.Boolean, default=True)
     allow_comments = db.Column(db.Boolean, default=True)
+    # Comments not deleted, kept in step by comments.py in the same transaction
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f'<Post {self.id} by User {self.user_id}>'
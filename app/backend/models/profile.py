@@ -1,4 +1,8 @@
 from extensions import db
+from sqlalchemy.dialects.postgresql import JSONB
+
+# Native JSON on MySQL/SQLite, JSONB on PostgreSQL so containment queries can use a GIN index
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
 
 class Profile(db.Model):
     __tablename__ = 'profiles'
@@ -8,13 +12,34 @@ class Profile(db.Model):
     avatar = db.Column(db.String(255), default='')  # New: profile image path
     title = db.Column(db.String(120), default='')   # New: professional title
     location = db.Column(db.String(120), default='') # New: location
-    social = db.Column(db.Text, default='')         # New: social links (JSON string)
-    activity = db.Column(db.Text, default='')       # New: activity (JSON string)
+    social = db.Column(JSONType, default=dict)       # Social links
+    activity = db.Column(JSONType, default=list)     # Activity
     bio = db.Column(db.Text, default='')
     skills = db.Column(db.Text, default='')  # Comma-separated
-    education = db.Column(db.Text, default='')  # JSON string
-    experience = db.Column(db.Text, default='')  # JSON string
-    contact = db.Column(db.Text, default='')  # JSON string
+    education = db.Column(JSONType, default=list)
+    experience = db.Column(JSONType, default=list)
+    contact = db.Column(JSONType, default=dict)
+    # Bumped with every change, so per-worker caches of the profile can tell they are stale
+    cache_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     user = db.relationship('User', backref=db.backref('profile', uselist=False))
     def __repr__(self):
         return f'<Profile user_id={self.user_id}>'
+
+def experience_company_filter(company, dialect_name):
+    """
+    WHERE clause matching profiles with an experience entry at `company`.
+
+    Each form is answerable from the index created by the JSON migration:
+    a GIN index on PostgreSQL and a multi-valued index on MySQL 8.
+    """
+    if dialect_name == 'postgresql':
+        return Profile.experience.contains([{'company': company}])
+    if dialect_name == 'mysql':
+        return db.text(
+            ":company MEMBER OF(profiles.experience->'$[*].company')"
+        ).bindparams(company=company)
+    # SQLite and others: no JSON index, but still evaluated in the database
+    return db.text(
+        "EXISTS (SELECT 1 FROM json_each(profiles.experience) "
+        "WHERE json_extract(json_each.value, '$.company') = :company)"
+    ).bindparams(company=company)
@@ -0,0 +1,16 @@
+from extensions import db
+
+class RevokedToken(db.Model):
+    """
+    A revoked JWT (key = its jti), or every token of a user issued up to
+    revoked_at (key = 'user:<id>'). See revocation.py.
+    """
+    __tablename__ = 'revoked_tokens'
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    # Unix timestamps, comparable with a token's iat/exp claims
+    revoked_at = db.Column(db.Double, nullable=False, index=True)
+    expires_at = db.Column(db.Double, nullable=False, index=True)  # The entry is useless after this
+
+    def __repr__(self):
+        return f'<RevokedToken {self.key}>'
@@ -0,0 +1,31 @@
+from extensions import db
+
+# Posting lists: one row per (profile, skill). The (skill_id, profile_id) index
+# returns the profiles with a skill already sorted by profile id.
+profile_skills = db.Table(
+    'profile_skills',
+    db.Column('profile_id', db.Integer, db.ForeignKey('profiles.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('skill_id', db.Integer, db.ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_profile_skills_skill_profile', 'skill_id', 'profile_id'),
+)
+
+class Skill(db.Model):
+    __tablename__ = 'skills'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), unique=True, nullable=False)  # Normalized: trimmed, lower case
+    profile_count = db.Column(db.Integer, default=0, nullable=False)  # Posting list length
+
+    def __repr__(self):
+        return f'<Skill {self.name}>'
+
+def normalize_skill(name):
+    return ' '.join(name.split()).lower()[:80]
+
+def parse_skills(text):
+    """Unique normalized skill names from the comma-separated Profile.skills value"""
+    names = []
+    for part in (text or '').split(','):
+        name = normalize_skill(part)
+        if name and name not in names:
+            names.append(name)
+    return names
@@ -0,0 +1,22 @@
+from extensions import db
+
+class TimelineEntry(db.Model):
+    """
+    One post in a user's home timeline, for deployments without Redis. The
+    primary key (user_id, post_id) is the index a page is read from, newest
+    first, without touching posts.
+    """
+    __tablename__ = 'timeline_entries'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<TimelineEntry {self.user_id}: {self.post_id}>'
+
+class TimelineLargeAuthor(db.Model):
+    """An author with too many followers to fan out to; their posts are merged in at read time"""
+    __tablename__ = 'timeline_large_authors'
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<TimelineLargeAuthor {self.author_id}>'
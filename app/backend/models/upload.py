@@ -0,0 +1,27 @@
+from extensions import db
+from datetime import datetime
+
+class UploadSession(db.Model):
+    """A resumable, chunked media upload (see api/uploads.py)"""
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)  # Random hex, used in URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # Client's name, for the extension
+    size = db.Column(db.BigInteger, nullable=False)  # Declared total length
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes received so far
+    # uploading, verifying (direct multipart), complete, attached, failed
+    status = db.Column(db.String(20), nullable=False, default='uploading')
+    sha256 = db.Column(db.String(64), nullable=True)
+    media_url = db.Column(db.String(255), nullable=True)
+    # Sent by the client straight to object storage via presigned URLs
+    direct = db.Column(db.Boolean, nullable=False, default=False)
+    storage_upload_id = db.Column(db.String(255), nullable=True)  # S3 multipart upload id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def ext(self):
+        return self.filename.rsplit('.', 1)[1].lower()
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.offset}/{self.size}>'
@@ -0,0 +1,162 @@
+"""
+Password hashing.
+
+hash_password() uses PASSWORD_HASH_METHOD at the configured cost; scrypt and
+pbkdf2 hashes are werkzeug's "method$salt$hash" strings, argon2 hashes are
+the standard "$argon2id$..." encoding (argon2-cffi). verify_password() reads
+any of them, so the method or cost can change at any time: needs_rehash()
+tells login to store a fresh hash while it has the plain password.
+
+Hashing is deliberately slow, so it runs on a small pool (PASSWORD_HASH_POOL)
+with a cap on how many hashes may be running or waiting. The request thread
+still blocks until its hash is done; what the pool buys is the cap: a burst
+of logins uses at most a few workers' worth of CPU, and past the cap is
+refused with PasswordHashingBusy, instead of every request thread hashing at
+once and starving the other routes.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import (PASSWORD_HASH_METHOD, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P,
+                    PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_KIB, PASSWORD_ARGON2_PARALLELISM,
+                    PASSWORD_PBKDF2_ITERATIONS, PASSWORD_HASH_POOL, PASSWORD_HASH_WORKERS,
+                    PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT_SECONDS)
+
+
+class PasswordHashingBusy(Exception):
+    """Too many hashes already running or queued in this worker"""
+
+
+def hash_settings(method=PASSWORD_HASH_METHOD, **cost):
+    """
+    Hash parameters for a method: the werkzeug method string for scrypt and
+    pbkdf2, argon2 keyword arguments for argon2. `cost` overrides config
+    (n, r, p / iterations / time_cost, memory_cost, parallelism).
+    """
+    if method == 'scrypt':
+        n = cost.get('n', PASSWORD_SCRYPT_N)
+        r = cost.get('r', PASSWORD_SCRYPT_R)
+        p = cost.get('p', PASSWORD_SCRYPT_P)
+        return f'scrypt:{n}:{r}:{p}'
+    if method == 'pbkdf2':
+        return f"pbkdf2:sha256:{cost.get('iterations', PASSWORD_PBKDF2_ITERATIONS)}"
+    if method == 'argon2':
+        return {'time_cost': cost.get('time_cost', PASSWORD_ARGON2_TIME_COST),
+                'memory_cost': cost.get('memory_cost', PASSWORD_ARGON2_MEMORY_KIB),
+                'parallelism': cost.get('parallelism', PASSWORD_ARGON2_PARALLELISM)}
+    raise ValueError(f'Unknown password hash method: {method}')
+
+
+def _argon2_hasher(settings):
+    from argon2 import PasswordHasher
+    return PasswordHasher(**settings)
+
+
+def _hash(password, settings):
+    if isinstance(settings, dict):
+        return _argon2_hasher(settings).hash(password)
+    return generate_password_hash(password, method=settings)
+
+
+def _verify(stored_hash, password):
+    if stored_hash.startswith('$argon2'):
+        from argon2.exceptions import VerificationError, InvalidHashError
+        try:
+            return _argon2_hasher({}).verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    try:
+        return check_password_hash(stored_hash, password)
+    except ValueError:
+        return False  # Unknown or malformed method
+
+
+def needs_rehash(stored_hash, settings=None):
+    """True when a hash was made with a different method or cost than the current settings"""
+    settings = settings if settings is not None else hash_settings()
+    if isinstance(settings, dict):
+        if not stored_hash.startswith('$argon2'):
+            return True
+        return _argon2_hasher(settings).check_needs_rehash(stored_hash)
+    return stored_hash.split('$', 1)[0] != settings
+
+
+class HashPool:
+    """Runs hash functions on a bounded pool; callers wait for the result"""
+
+    def __init__(self, kind=PASSWORD_HASH_POOL, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, wait_seconds=PASSWORD_HASH_WAIT_SECONDS):
+        self.kind = kind
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise PasswordHashingBusy()
+        try:
+            if self.kind == 'inline':
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def map(self, fn, *iterables):
+        """fn over many inputs, spread across the workers; takes one slot for the whole batch"""
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise PasswordHashingBusy()
+        try:
+            if self.kind == 'inline':
+                return list(map(fn, *iterables))
+            return list(self._get_executor().map(fn, *iterables))
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hash_pool = HashPool()
+
+
+def hash_password(password):
+    return hash_pool.run(_hash, password, hash_settings())
+
+
+def hash_passwords(passwords):
+    """Hashes for many passwords (bulk import), computed in parallel on the pool"""
+    passwords = list(passwords)
+    return hash_pool.map(_hash, passwords, [hash_settings()] * len(passwords))
+
+
+_dummy_hash = None
+
+def verify_password(stored_hash, password):
+    """
+    Check a password against a stored hash. With stored_hash None (unknown
+    user) a dummy hash is checked, so the response takes as long as for a
+    real account and doesn't reveal which usernames exist.
+    """
+    global _dummy_hash
+    if stored_hash is None:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password('not a real password')
+        hash_pool.run(_verify, _dummy_hash, password)
+        return False
+    return hash_pool.run(_verify, stored_hash, password)
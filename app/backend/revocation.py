@@ -0,0 +1,269 @@
+"""
+Revoked JWTs.
+
+Entries are keyed by a token's jti (logout, refresh rotation) or by
+'user:<id>' for "every token this user was issued until now" (log out
+everywhere, bans). Revocation times are whole seconds, like a token's iat:
+a user entry revokes tokens issued in earlier seconds, so a token issued
+right after logging out everywhere, in the same second, still works. The store (database table, Redis, or memory) is the
+source of truth; each worker keeps a Bloom filter of the revoked keys in
+front of it. A token whose keys aren't in the filter, which is nearly
+every token, is known good after a few hash probes and no I/O; only filter
+hits (revoked tokens and ~REVOCATION_BLOOM_ERROR_RATE false positives) are
+confirmed against the store, and confirmations are cached briefly.
+
+The filter picks up revocations made by other workers every
+REVOCATION_SYNC_SECONDS and is rebuilt from the live entries every
+REBUILD_SECONDS, dropping expired ones (a Bloom filter can't delete).
+"""
+import hashlib
+import math
+import threading
+import time
+
+from cache import LRUCache
+from config import (REDIS_URL, REVOCATION_BACKEND, REVOCATION_SYNC_SECONDS,
+                    REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+from extensions import db, get_redis
+from models.revoked_token import RevokedToken
+
+REBUILD_SECONDS = 3600
+# Re-read entries this far behind the last sync: rows committed late are still seen
+SYNC_OVERLAP_SECONDS = 30
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+class BloomFilter:
+    """Set membership with no false negatives, in about 1.8 bytes per entry at a 0.1% error rate"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class MemoryRevocationStore:
+    """In-process entries: for a single process and tests"""
+
+    def __init__(self):
+        self._entries = {}  # key -> (revoked_at, expires_at)
+        self._lock = threading.Lock()
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        with self._lock:
+            self._entries[key] = (revoked_at, expires_at)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def since(self, after):
+        with self._lock:
+            return [key for key, (revoked_at, expires_at) in self._entries.items() if revoked_at >= after]
+
+    def active(self):
+        now = time.time()
+        with self._lock:
+            return [key for key, (revoked_at, expires_at) in self._entries.items() if expires_at >= now]
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (revoked_at, expires_at) in self._entries.items() if expires_at < now]:
+                del self._entries[key]
+
+
+class DatabaseRevocationStore:
+    """The revoked_tokens table, on its own short transactions (not the request's session)"""
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        table = RevokedToken.__table__
+        with db.engine.begin() as conn:
+            # 'user:<id>' entries are moved forward when revoked again
+            updated = conn.execute(table.update().where(table.c.key == key).values(
+                revoked_at=revoked_at, expires_at=expires_at)).rowcount
+            if not updated:
+                conn.execute(table.insert().values(key=key, user_id=user_id,
+                                                   revoked_at=revoked_at, expires_at=expires_at))
+
+    def get(self, key):
+        table = RevokedToken.__table__
+        with db.engine.connect() as conn:
+            return conn.execute(db.select(table.c.revoked_at).where(
+                table.c.key == key, table.c.expires_at >= time.time())).scalar()
+
+    def since(self, after):
+        table = RevokedToken.__table__
+        with db.engine.connect() as conn:
+            return conn.execute(db.select(table.c.key).where(table.c.revoked_at >= after)).scalars().all()
+
+    def active(self):
+        table = RevokedToken.__table__
+        with db.engine.connect() as conn:
+            return conn.execute(db.select(table.c.key).where(table.c.expires_at >= time.time())).scalars().all()
+
+    def prune(self):
+        table = RevokedToken.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.expires_at < time.time()))
+
+
+class RedisRevocationStore:
+    """
+    One expiring string per entry, plus a sorted set of keys by revocation
+    time for syncing. Works against any Redis-compatible server.
+    """
+
+    def __init__(self, client, prefix='revoked:'):
+        self.client = client
+        self.prefix = prefix
+        self.log_key = prefix + 'log'
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        ttl = max(1, int(math.ceil(expires_at - time.time())))
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, repr(revoked_at), ex=ttl)
+        pipe.zadd(self.log_key, {key: revoked_at})
+        pipe.execute()
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    def since(self, after):
+        return [key.decode() for key in self.client.zrangebyscore(self.log_key, after, '+inf')]
+
+    def active(self):
+        keys = [key.decode() for key in self.client.zrange(self.log_key, 0, -1)]
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [key for key, value in zip(keys, values) if value is not None]
+
+    def prune(self):
+        # Log entries whose string has expired
+        keys = [key.decode() for key in self.client.zrange(self.log_key, 0, -1)]
+        if keys:
+            values = self.client.mget([self.prefix + key for key in keys])
+            expired = [key for key, value in zip(keys, values) if value is None]
+            if expired:
+                self.client.zrem(self.log_key, *expired)
+
+
+class RevocationList:
+    """Bloom filter front for a revocation store"""
+
+    def __init__(self, store, capacity=REVOCATION_BLOOM_CAPACITY, error_rate=REVOCATION_BLOOM_ERROR_RATE,
+                 sync_interval=REVOCATION_SYNC_SECONDS):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._synced_at = None  # time.monotonic() of the last sync
+        self._rebuilt_at = None
+        self._cursor = 0.0  # Wall time the last sync started
+        self._lock = threading.Lock()
+        # Store answers for filter hits: (revoked_at or None,)
+        self._confirmed = LRUCache(maxsize=10000, ttl=sync_interval)
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # Another thread is syncing; use the current filter meanwhile
+        try:
+            started = time.time()
+            if (self._rebuilt_at is None or now - self._rebuilt_at >= REBUILD_SECONDS
+                    or self._bloom.count >= self.capacity):
+                self.store.prune()
+                keys = self.store.active()
+                # Grow past the configured capacity rather than let the error rate climb
+                bloom = BloomFilter(max(self.capacity, 2 * len(keys)), self.error_rate)
+                for key in keys:
+                    bloom.add(key)
+                self._bloom = bloom
+                self._rebuilt_at = now
+            else:
+                for key in self.store.since(self._cursor - SYNC_OVERLAP_SECONDS):
+                    if key not in self._bloom:
+                        self._bloom.add(key)
+            self._cursor = started
+        except Exception as e:
+            # Keep serving from the current filter; retried after the next interval
+            print(f'Revocation list sync failed: {str(e)}')
+        finally:
+            self._synced_at = now
+            self._lock.release()
+
+    def _revoked_at(self, key):
+        cached = self._confirmed.get(key)
+        if cached is None:
+            cached = (self.store.get(key),)
+            self._confirmed.set(key, cached)
+        return cached[0]
+
+    def is_revoked(self, jti, user_id, issued_at):
+        self._sync()
+        if jti in self._bloom and self._revoked_at(jti) is not None:
+            return True
+        key = user_key(user_id)
+        if key in self._bloom:
+            cutoff = self._revoked_at(key)
+            if cutoff is not None and issued_at < cutoff:
+                return True
+        return False
+
+    def revoke(self, key, user_id, expires_at):
+        revoked_at = int(time.time())
+        self.store.add(key, user_id, revoked_at, expires_at)
+        self._bloom.add(key)
+        self._confirmed.set(key, (revoked_at,))
+
+
+_revocation_list = None
+_revocation_lock = threading.Lock()
+
+def get_revocation_list():
+    global _revocation_list
+    with _revocation_lock:
+        if _revocation_list is None:
+            if REVOCATION_BACKEND == 'memory':
+                store = MemoryRevocationStore()
+            elif REVOCATION_BACKEND == 'redis' and REDIS_URL:
+                store = RedisRevocationStore(get_redis())
+            else:
+                store = DatabaseRevocationStore()
+            _revocation_list = RevocationList(store)
+        return _revocation_list
+
+
+def set_revocation_list(revocation_list):
+    """Swap the list, e.g. for one on a MemoryRevocationStore in tests"""
+    global _revocation_list
+    with _revocation_lock:
+        _revocation_list = revocation_list
@@ -0,0 +1,165 @@
+"""
+Full-text search over posts and profiles.
+
+The inverted index is an embedded SQLite FTS5 database next to the app (not
+in the main MySQL/PostgreSQL database), so it works the same with any primary
+database. create_post and update_profile keep it current; `flask search
+rebuild` recreates it from the posts and profiles tables.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+from config import SEARCH_INDEX_PATH
+
+REBUILD_BATCH_SIZE = 1000
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+    "content, tokenize='unicode61 remove_diacritics 2')",
+    # rowid is the user id; name and title matches outrank bio and location
+    "CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5("
+    "name, title, bio, location, tokenize='unicode61 remove_diacritics 2')",
+)
+PROFILE_WEIGHTS = 'bm25(profiles_fts, 10.0, 5.0, 1.0, 2.0)'
+
+
+def build_match_query(text):
+    """Turn free text into a safe FTS5 query: every word must match, the last as a prefix"""
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            # WAL lets every worker read while one of them writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Per connection: each ':memory:' connection is a separate database
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def index_post(self, post_id, content):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM posts_fts WHERE rowid = ?', (post_id,))
+            conn.execute('INSERT INTO posts_fts(rowid, content) VALUES (?, ?)', (post_id, content or ''))
+
+    def index_profile(self, user_id, name, title, bio, location):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM profiles_fts WHERE rowid = ?', (user_id,))
+            conn.execute(
+                'INSERT INTO profiles_fts(rowid, name, title, bio, location) VALUES (?, ?, ?, ?, ?)',
+                (user_id, name or '', title or '', bio or '', location or ''))
+
+    def search_posts(self, text, limit=20, offset=0):
+        """Post ids best match first"""
+        match = build_match_query(text)
+        if match is None:
+            return []
+        rows = self._connect().execute(
+            'SELECT rowid FROM posts_fts WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts) LIMIT ? OFFSET ?',
+            (match, limit, offset)).fetchall()
+        return [row[0] for row in rows]
+
+    def search_profiles(self, text, limit=20, offset=0):
+        """User ids best match first"""
+        match = build_match_query(text)
+        if match is None:
+            return []
+        rows = self._connect().execute(
+            f'SELECT rowid FROM profiles_fts WHERE profiles_fts MATCH ? ORDER BY {PROFILE_WEIGHTS} LIMIT ? OFFSET ?',
+            (match, limit, offset)).fetchall()
+        return [row[0] for row in rows]
+
+    def rebuild(self, posts, profiles):
+        """
+        Replace the whole index from (id, content) and (user_id, name, title,
+        bio, location) iterables. Readers keep seeing the old index until the
+        single commit at the end.
+        """
+        conn = self._connect()
+        counts = {'posts': 0, 'profiles': 0}
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM posts_fts')
+            conn.execute('DELETE FROM profiles_fts')
+            for batch in _batches(posts):
+                conn.executemany('INSERT INTO posts_fts(rowid, content) VALUES (?, ?)', batch)
+                counts['posts'] += len(batch)
+            for batch in _batches(profiles):
+                conn.executemany(
+                    'INSERT INTO profiles_fts(rowid, name, title, bio, location) VALUES (?, ?, ?, ?, ?)', batch)
+                counts['profiles'] += len(batch)
+        conn.execute("INSERT INTO posts_fts(posts_fts) VALUES ('optimize')")
+        conn.execute("INSERT INTO profiles_fts(profiles_fts) VALUES ('optimize')")
+        return counts
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(tuple(value if value is not None else '' for value in row))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_index = None
+
+def get_search_index():
+    global _index
+    if _index is None:
+        _index = SearchIndex(SEARCH_INDEX_PATH)
+    return _index
+
+
+def index_post(post):
+    get_search_index().index_post(post.id, post.content)
+
+
+def index_profile(profile):
+    get_search_index().index_profile(profile.user_id, profile.name, profile.title, profile.bio, profile.location)
+
+
+search_cli = AppGroup('search', help='Full-text search index commands.')
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild the search index from the posts and profiles tables."""
+    from models.post import Post
+    from models.profile import Profile
+
+    def stream(statement):
+        # Generators, so each server-side cursor opens only once the previous one is drained
+        yield from db.session.execute(statement.execution_options(yield_per=REBUILD_BATCH_SIZE))
+
+    counts = get_search_index().rebuild(
+        stream(db.select(Post.id, Post.content)),
+        stream(db.select(Profile.user_id, Profile.name, Profile.title, Profile.bio, Profile.location)))
+    click.echo(f"Indexed {counts['posts']} posts and {counts['profiles']} profiles")
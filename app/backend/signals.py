@@ -0,0 +1,6 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# sender: the Flask app; kwargs: user_id, image_url, thumbnail_url
+avatar_ready = _signals.signal('avatar-ready')
@@ -0,0 +1,108 @@
+"""
+Skill index: keeps profile_skills in step with Profile.skills and answers
+"people with skill X (and/or Y)" from the per-skill posting lists.
+"""
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.skill import Skill, profile_skills, normalize_skill, parse_skills
+
+# Profile ids read from a posting list per round trip while intersecting
+POSTING_CHUNK_SIZE = 500
+
+
+def get_or_create_skills(names):
+    """Skill rows for the given normalized names, creating missing ones"""
+    if not names:
+        return []
+    skills = {skill.name: skill for skill in Skill.query.filter(Skill.name.in_(names)).all()}
+    for name in names:
+        if name in skills:
+            continue
+        try:
+            with db.session.begin_nested():
+                skill = Skill(name=name, profile_count=0)
+                db.session.add(skill)
+        except IntegrityError:
+            # Created concurrently by another request
+            skill = Skill.query.filter_by(name=name).one()
+        skills[name] = skill
+    return [skills[name] for name in names]
+
+
+def sync_profile_skills(profile):
+    """Rewrite a profile's posting list entries from its comma-separated skills"""
+    db.session.flush()
+    wanted = {skill.id for skill in get_or_create_skills(parse_skills(profile.skills))}
+    rows = db.session.execute(
+        db.select(profile_skills.c.skill_id).where(profile_skills.c.profile_id == profile.id)
+    ).all()
+    current = {row[0] for row in rows}
+    removed = current - wanted
+    added = wanted - current
+    if removed:
+        db.session.execute(profile_skills.delete().where(
+            profile_skills.c.profile_id == profile.id, profile_skills.c.skill_id.in_(removed)))
+        db.session.execute(db.update(Skill).where(Skill.id.in_(removed))
+                           .values(profile_count=Skill.profile_count - 1))
+    if added:
+        db.session.execute(profile_skills.insert(),
+                           [{'profile_id': profile.id, 'skill_id': skill_id} for skill_id in added])
+        db.session.execute(db.update(Skill).where(Skill.id.in_(added))
+                           .values(profile_count=Skill.profile_count + 1))
+
+
+def _posting_chunk(skill_id, after, limit):
+    rows = db.session.execute(
+        db.select(profile_skills.c.profile_id)
+        .where(profile_skills.c.skill_id == skill_id, profile_skills.c.profile_id > after)
+        .order_by(profile_skills.c.profile_id)
+        .limit(limit)
+    ).all()
+    return [row[0] for row in rows]
+
+
+def _members(skill_id, profile_ids):
+    rows = db.session.execute(
+        db.select(profile_skills.c.profile_id)
+        .where(profile_skills.c.skill_id == skill_id, profile_skills.c.profile_id.in_(profile_ids))
+    ).all()
+    return {row[0] for row in rows}
+
+
+def search_profile_ids(names, match_all=True, after=0, limit=20):
+    """
+    Profile ids having all (or any) of the skills, ascending, starting after `after`.
+
+    AND walks the shortest posting list in chunks and probes the others with
+    indexed IN lookups, so the work is bounded by the rarest skill rather than
+    the most common one. OR merges the heads of each list.
+    """
+    names = [normalize_skill(name) for name in names if normalize_skill(name)]
+    skills = Skill.query.filter(Skill.name.in_(names)).all() if names else []
+    if match_all and len(skills) < len(set(names)):
+        return []  # A skill nobody has
+    if not skills:
+        return []
+
+    if not match_all:
+        merged = set()
+        for skill in skills:
+            merged.update(_posting_chunk(skill.id, after, limit))
+        return sorted(merged)[:limit]
+
+    skills.sort(key=lambda skill: skill.profile_count)
+    rarest, others = skills[0], skills[1:]
+    results = []
+    while len(results) < limit:
+        chunk = _posting_chunk(rarest.id, after, POSTING_CHUNK_SIZE)
+        if not chunk:
+            break
+        candidates = set(chunk)
+        for skill in others:
+            candidates &= _members(skill.id, candidates)
+            if not candidates:
+                break
+        results.extend(sorted(candidates))
+        after = chunk[-1]
+    return results[:limit]
@@ -0,0 +1,239 @@
+"""
+Where media bytes live.
+
+LocalStorage keeps objects on this node's disk (MEDIA_STORE_PATH), which is
+fine for a single web node. S3Storage puts them in an S3-compatible bucket
+(AWS, MinIO, R2...) so every node behind a load balancer sees the same files;
+large files go up as parallel multipart uploads, and clients can be handed
+presigned URLs to PUT and GET objects without the bytes touching Flask.
+
+Keys are paths relative to the store root, e.g. 'ab/cd/<sha256>.jpg'.
+Nothing here touches the database, so background workers can use it too.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from config import (MEDIA_STORAGE, MEDIA_STORE_PATH, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION,
+                    S3_PUBLIC_URL, S3_PRESIGN_EXPIRES, S3_MULTIPART_CHUNK_SIZE, S3_MULTIPART_CONCURRENCY)
+
+
+class LocalStorage:
+    is_local = True
+    supports_presigned_urls = False
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def size(self, key):
+        return os.path.getsize(self.path(key))
+
+    def put_file(self, source_path, key, content_type=None):
+        """Move a local file into the store (atomic rename, so readers never see half a file)"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix=''):
+        """(key, modified unix time) for every object under a key prefix"""
+        top = self.path(prefix.rstrip('/')) if prefix else self.root
+        for folder, dirs, names in os.walk(top):
+            for name in names:
+                path = os.path.join(folder, name)
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), os.path.getmtime(path)
+
+    @contextmanager
+    def workspace(self, source_key):
+        """(source path, output folder) for a worker; outputs land next to the source directly"""
+        path = self.path(source_key)
+        yield path, os.path.dirname(path)
+
+
+class S3Storage:
+    is_local = False
+    supports_presigned_urls = True
+
+    def __init__(self, bucket, prefix='', client=None, public_url=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=S3_ENDPOINT_URL or None, region_name=S3_REGION or None)
+        from boto3.s3.transfer import TransferConfig
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.public_url = public_url.rstrip('/') if public_url else None
+        # Files over one chunk are sent as a multipart upload with parallel part PUTs
+        self.transfer_config = TransferConfig(multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+                                              multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+                                              max_concurrency=S3_MULTIPART_CONCURRENCY)
+
+    def object_key(self, key):
+        return self.prefix + key
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))['ContentLength']
+
+    def put_file(self, source_path, key, content_type=None):
+        """Upload a local file (multipart above S3_MULTIPART_CHUNK_SIZE) and remove it"""
+        extra = {'ContentType': content_type} if content_type else None
+        self.client.upload_file(source_path, self.bucket, self.object_key(key),
+                                ExtraArgs=extra, Config=self.transfer_config)
+        os.remove(source_path)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def list(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.object_key(prefix)):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['LastModified'].timestamp()
+
+    @contextmanager
+    def workspace(self, source_key):
+        """Download the source to a temp folder; files written to the output folder are uploaded on exit"""
+        folder = tempfile.mkdtemp(prefix='media-')
+        try:
+            source_dir = os.path.join(folder, 'source')
+            output_dir = os.path.join(folder, 'output')
+            os.makedirs(source_dir)
+            os.makedirs(output_dir)
+            source_path = os.path.join(source_dir, source_key.rsplit('/', 1)[-1])
+            self.client.download_file(self.bucket, self.object_key(source_key), source_path,
+                                      Config=self.transfer_config)
+            yield source_path, output_dir
+            key_folder = source_key.rsplit('/', 1)[0]
+            for name in os.listdir(output_dir):
+                self.put_file(os.path.join(output_dir, name), f'{key_folder}/{name}', guess_content_type(name))
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def url(self, key, expires=S3_PRESIGN_EXPIRES):
+        """Where a browser can GET the object: the public/CDN URL if configured, else a presigned one"""
+        if self.public_url:
+            return f'{self.public_url}/{self.object_key(key)}'
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.object_key(key)}, ExpiresIn=expires)
+
+    def presigned_put(self, key, content_type, checksum_sha256=None, expires=S3_PRESIGN_EXPIRES):
+        """
+        (url, headers) for a single direct PUT. With checksum_sha256 (base64)
+        the storage rejects a body whose hash doesn't match.
+        """
+        params = {'Bucket': self.bucket, 'Key': self.object_key(key), 'ContentType': content_type}
+        headers = {'Content-Type': content_type}
+        if checksum_sha256:
+            params['ChecksumSHA256'] = checksum_sha256
+            headers['x-amz-checksum-sha256'] = checksum_sha256
+        url = self.client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires)
+        return url, headers
+
+    def start_multipart(self, key, content_type):
+        response = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.object_key(key), ContentType=content_type)
+        return response['UploadId']
+
+    def presigned_part_urls(self, key, multipart_id, part_count, expires=S3_PRESIGN_EXPIRES):
+        return [
+            {'part_number': number,
+             'url': self.client.generate_presigned_url(
+                 'upload_part',
+                 Params={'Bucket': self.bucket, 'Key': self.object_key(key),
+                         'UploadId': multipart_id, 'PartNumber': number},
+                 ExpiresIn=expires)}
+            for number in range(1, part_count + 1)
+        ]
+
+    def upload_part(self, key, multipart_id, part_number, source):
+        """Send one part of a multipart upload from a file object; returns its ETag"""
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.object_key(key), UploadId=multipart_id,
+                                           PartNumber=part_number, Body=source)
+        return response['ETag']
+
+    def list_parts(self, key, multipart_id):
+        """[{'part_number', 'etag'}] for the parts the storage has received so far"""
+        paginator = self.client.get_paginator('list_parts')
+        return [{'part_number': part['PartNumber'], 'etag': part['ETag']}
+                for page in paginator.paginate(Bucket=self.bucket, Key=self.object_key(key), UploadId=multipart_id)
+                for part in page.get('Parts', [])]
+
+    def copy(self, source_key, key):
+        """Server-side copy within the bucket (multipart for large objects)"""
+        self.client.copy({'Bucket': self.bucket, 'Key': self.object_key(source_key)}, self.bucket,
+                         self.object_key(key), Config=self.transfer_config)
+
+    def complete_multipart(self, key, multipart_id, parts):
+        """parts: [{'part_number': n, 'etag': '...'}] as reported by the client"""
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.object_key(key), UploadId=multipart_id,
+            MultipartUpload={'Parts': [{'PartNumber': int(part['part_number']), 'ETag': part['etag']}
+                                       for part in sorted(parts, key=lambda part: int(part['part_number']))]})
+
+    def abort_multipart(self, key, multipart_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.object_key(key), UploadId=multipart_id)
+
+
+def guess_content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        if MEDIA_STORAGE == 's3':
+            _storage = S3Storage(S3_BUCKET, S3_PREFIX, public_url=S3_PUBLIC_URL)
+        else:
+            _storage = LocalStorage(MEDIA_STORE_PATH)
+    return _storage
+
+
+def set_storage(storage):
+    """Swap the backend, e.g. for an S3Storage on a moto or MinIO client in tests"""
+    global _storage
+    _storage = storage
+
+
+def run_in_storage(fn, source_key, filename, *args):
+    """
+    Task wrapper: run fn(source_path, output_folder, filename, *args), an
+    images.py function, against a stored object and store what it writes.
+    """
+    with get_storage().workspace(source_key) as (source_path, output_folder):
+        return fn(source_path, output_folder, filename, *args)
+
+
+def hash_object(key):
+    """SHA-256 hex of a stored object (task function, e.g. to check a client's claimed hash)"""
+    hasher = hashlib.sha256()
+    with get_storage().workspace(key) as (source_path, output_folder):
+        with open(source_path, 'rb') as source:
+            for block in iter(lambda: source.read(1024 * 1024), b''):
+                hasher.update(block)
+    return hasher.hexdigest()
@@ -0,0 +1,58 @@
+from flask import current_app, jsonify, stream_with_context
+
+# Rows fetched per round trip from a server-side cursor
+STREAM_CHUNK_SIZE = 100
+# Encoded bytes buffered before a chunk is handed to the WSGI server
+STREAM_BUFFER_SIZE = 16 * 1024
+
+
+def stream_json(body, list_key):
+    """
+    Stream a JSON object whose `list_key` value is an iterable of rows.
+
+    The rows are encoded one at a time as they are produced, so the full list
+    never exists in memory and the first bytes go out before the last row is
+    read. Other values in `body` may be zero-argument callables; they are
+    called when their key is reached, which for keys sorting after `list_key`
+    is once the rows have been consumed (e.g. a next-page cursor).
+
+    The output is byte-for-byte what jsonify(body) would produce.
+    """
+    provider = current_app.json
+    if provider.compact is False or (provider.compact is None and current_app.debug):
+        # Pretty-printed output can't be assembled piecewise; encode it in one go
+        rows = list(body[list_key])
+        return jsonify({key: rows if key == list_key else _resolve(value) for key, value in body.items()})
+
+    def dumps(value):
+        return provider.dumps(value, separators=(',', ':'))
+
+    keys = sorted(body) if provider.sort_keys else list(body)
+
+    def generate():
+        buffer = ['{']
+        size = 1
+        for position, key in enumerate(keys):
+            if position:
+                buffer.append(',')
+            buffer.append(dumps(key) + ':')
+            if key != list_key:
+                buffer.append(dumps(_resolve(body[key])))
+                continue
+            buffer.append('[')
+            for index, row in enumerate(body[key]):
+                encoded = dumps(row)
+                buffer.append(',' + encoded if index else encoded)
+                size += len(encoded) + 1
+                if size >= STREAM_BUFFER_SIZE:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+            buffer.append(']')
+        buffer.append('}\n')
+        yield ''.join(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=provider.mimetype)
+
+
+def _resolve(value):
+    return value() if callable(value) else value
@@ -0,0 +1,70 @@
+"""
+Background work queue.
+
+CPU-heavy work (image resizing) runs on a process pool so it neither blocks a
+request thread nor holds the GIL. The task function runs without Flask or a
+database session; the on_done callback runs back in this process inside an
+app context to record the result.
+
+TASK_BACKEND: 'process' (default), 'thread', or 'inline' (runs synchronously,
+for tests and debugging).
+"""
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app
+
+from config import TASK_BACKEND, TASK_WORKERS
+
+
+class InlineExecutor:
+    """Runs each task immediately in the caller's thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if TASK_BACKEND == 'inline':
+                _executor = InlineExecutor()
+            elif TASK_BACKEND == 'thread':
+                _executor = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix='task')
+            else:
+                _executor = ProcessPoolExecutor(max_workers=TASK_WORKERS)
+        return _executor
+
+
+def set_executor(executor):
+    """Swap the executor, e.g. for an InlineExecutor in tests"""
+    global _executor
+    with _executor_lock:
+        _executor = executor
+
+
+def submit_task(fn, *args, on_done=None):
+    """Run fn(*args) in the background; on_done(future) is called in an app context"""
+    app = current_app._get_current_object()
+    future = get_executor().submit(fn, *args)
+    if on_done is not None:
+        def callback(done):
+            with app.app_context():
+                try:
+                    on_done(done)
+                except Exception as e:
+                    print(f'Task callback error: {str(e)}')
+        future.add_done_callback(callback)
+    return future
@@ -0,0 +1,32 @@
+"""
+Check that a bulk import hit by a concurrent signup falls back to row-by-row inserts
+"""
+import accounts
+from accounts import create_user, import_users
+from extensions import db
+from models.profile import Profile
+from models.user import User
+
+
+def signup_while_hashing(passwords):
+    """Stands in for hash_passwords: someone takes racer's email after the batch's taken-check"""
+    hashes = [f'hash-{password}' for password in passwords]
+    create_user('other', 'racer@example.com', 'x')
+    return hashes
+
+
+def test_conflicting_batch_is_retried_row_by_row(app, monkeypatch):
+    rows = [{'username': name, 'email': f'{name}@example.com', 'password': 'pw'}
+            for name in ('ann', 'racer', 'bob')]
+    rows.append({'username': 'old', 'email': 'new@example.com', 'password': 'pw'})
+    monkeypatch.setattr(accounts, 'hash_passwords', signup_while_hashing)
+    with app.app_context():
+        create_user('old', 'old@example.com', 'x')
+        result = import_users(rows)
+        names = db.session.execute(db.select(User.username).order_by(User.id)).scalars().all()
+        profiles = db.session.execute(db.select(db.func.count()).select_from(Profile)).scalar()
+    assert result == {'created': 2, 'invalid': [],
+                      'conflicts': [{'row': 3, 'field': 'username', 'value': 'old'},
+                                    {'row': 1, 'field': 'email', 'value': 'racer@example.com'}]}, result
+    assert names == ['old', 'other', 'ann', 'bob']
+    assert profiles == 4
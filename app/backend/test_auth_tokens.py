@@ -0,0 +1,46 @@
+"""
+Check token revocation cutoffs and the claims cache in front of JWT decoding
+"""
+import time
+
+import pytest
+from flask_jwt_extended import JWTManager
+
+from auth_tokens import CachingJWTManager, issue_tokens, revoke_user_tokens
+
+
+@pytest.fixture
+def holder(add_users):
+    user_id, = add_users('holder')
+    return user_id
+
+
+def get_unread(client, token):
+    return client.get('/api/messages/unread', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_claims_cache_sits_on_the_decode_path(app, client, holder):
+    # CachingJWTManager overrides this private method; fail loudly if an upgrade drops it
+    assert callable(getattr(JWTManager, '_decode_jwt_from_config', None))
+    with app.app_context():
+        token, _ = issue_tokens(holder)
+    manager = app.extensions['flask-jwt-extended']
+    assert isinstance(manager, CachingJWTManager)
+    hits = manager.claims_cache.hits
+    assert get_unread(client, token).status_code == 200
+    assert get_unread(client, token).status_code == 200
+    assert manager.claims_cache.hits == hits + 1
+    assert get_unread(client, token + 'x').status_code == 422
+
+
+def test_log_out_everywhere_spares_tokens_issued_after_it(app, client, holder):
+    with app.app_context():
+        old_token, _ = issue_tokens(holder)
+        assert get_unread(client, old_token).status_code == 200
+        # Issued in an earlier second than the cutoff
+        time.sleep(1.1 - time.time() % 1)
+        revoke_user_tokens(holder)
+        new_token, _ = issue_tokens(holder)
+    # Cached claims are still checked against the revocation list
+    assert get_unread(client, old_token).status_code == 401
+    assert get_unread(client, new_token).status_code == 200
@@ -0,0 +1,87 @@
+"""
+Check that deleted comments stay in a thread exactly while they have replies to show
+"""
+import pytest
+
+from comments import CommentError, add_comment, comment_page, delete_comment
+from extensions import db
+from models.comment import Comment
+from models.post import Post
+
+
+@pytest.fixture
+def chain(app, add_users):
+    """A post with the comment chain A -> B -> C; returns (post id, [A, B, C] ids)"""
+    user_id, = add_users('writer')
+    with app.app_context():
+        post = Post(user_id=user_id, content='post')
+        db.session.add(post)
+        db.session.commit()
+        ids = []
+        for name in 'ABC':
+            ids.append(add_comment(post, user_id, name, ids[-1] if ids else None).id)
+        return post.id, ids
+
+
+def visible_chain(post_id):
+    """Ids reachable by opening each level from the top: [A, B, C] while all are shown"""
+    reached = []
+    parent = None
+    while True:
+        level = comment_page(post_id, parent)
+        if not level:
+            return reached
+        parent = level[0]
+        reached.append(parent.id)
+
+
+def delete(comment_id):
+    delete_comment(db.session.get(Comment, comment_id))
+
+
+def reply_counts(comment_ids):
+    return [db.session.get(Comment, comment_id).reply_count for comment_id in comment_ids]
+
+
+def test_live_reply_under_deleted_ancestors_stays_reachable(app, chain):
+    post_id, (a, b, c) = chain
+    with app.app_context():
+        delete(a)
+        delete(b)
+        assert visible_chain(post_id) == [a, b, c]
+        assert reply_counts((a, b, c)) == [1, 1, 0]
+        assert db.session.get(Post, post_id).comment_count == 1
+
+
+def test_deleting_the_last_live_reply_hides_the_chain(app, chain):
+    post_id, (a, b, c) = chain
+    with app.app_context():
+        delete(b)
+        delete(a)
+        delete(c)
+        assert visible_chain(post_id) == []
+        assert reply_counts((a, b, c)) == [0, 0, 0]
+        assert db.session.get(Post, post_id).comment_count == 0
+
+
+def test_live_parent_keeps_its_place(app, chain):
+    post_id, (a, b, c) = chain
+    with app.app_context():
+        delete(c)
+        delete(c)  # Deleting twice changes nothing
+        assert visible_chain(post_id) == [a, b]
+        assert reply_counts((a, b)) == [1, 0]
+        assert db.session.get(Post, post_id).comment_count == 2
+
+
+def test_replies_to_a_deleted_comment_are_refused(app, chain):
+    post_id, (a, b, c) = chain
+    with app.app_context():
+        delete(c)
+        post = db.session.get(Post, post_id)
+        with pytest.raises(CommentError):
+            add_comment(post, post.user_id, 'too late', c)
+        # The refused reply left nothing behind, and the next one lands under a live parent
+        assert add_comment(post, post.user_id, 'D', b).parent_id == b
+        assert reply_counts((a, b, c)) == [1, 1, 0]
+        assert db.session.get(Post, post_id).comment_count == 3
@@ -0,0 +1,56 @@
+"""
+Check read-replica routing: @read_replica views read from the replica, except
+for a user who just wrote, who reads from the primary for
+READ_YOUR_WRITES_SECONDS
+"""
+import pytest
+
+import db_routing
+from app import create_app
+from auth_tokens import issue_tokens
+from cache import LRUCache
+from extensions import db
+from models.user import User
+
+
+@pytest.fixture
+def replicated(app, tmp_path, monkeypatch):
+    """An app whose replica is a separate, empty database that never catches up"""
+    replicated = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+                             'DATABASE_REPLICA_URLS': [f'sqlite:///{tmp_path / "replica.db"}']})
+    monkeypatch.setattr(db_routing, '_recent_writes', LRUCache(maxsize=100, ttl=60))
+    # Skip the background lag checks: the replica counts as healthy from the start
+    monkeypatch.setattr(db_routing.replica_monitor, '_ensure_checking', lambda engines: None)
+    monkeypatch.setattr(db_routing.replica_monitor, 'is_healthy', lambda key: True)
+    with replicated.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica_0'])
+        users = [User(username=name, email=f'{name}@example.com', password_hash='x') for name in ('writer', 'reader')]
+        db.session.add_all(users)
+        db.session.commit()
+        headers = [{'Authorization': f'Bearer {issue_tokens(user.id)[0]}'} for user in users]
+    yield replicated.test_client(), headers
+    with replicated.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered the bind's (empty) metadata on the shared db, which the other apps don't have
+    db.metadatas.pop('replica_0', None)
+
+
+def feed_contents(client, headers):
+    response = client.get('/api/feed', headers=headers)
+    assert response.status_code == 200
+    return [post['content'] for post in response.get_json()['feed']]
+
+
+def test_writer_reads_own_post_from_the_primary(replicated):
+    client, (writer, reader) = replicated
+    response = client.post('/api/posts', data={'content': 'fresh'}, headers=writer)
+    assert response.status_code == 201
+    # The replica hasn't seen the post; only the writer is sent to the primary
+    assert feed_contents(client, writer) == ['fresh']
+    assert feed_contents(client, reader) == []
+
+    # Once the window is over the writer is back on the replica
+    db_routing.get_recent_writes().clear()
+    assert feed_contents(client, writer) == []
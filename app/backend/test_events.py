@@ -0,0 +1,74 @@
+"""
+Check the in-process event broker and the GET /api/events stream
+"""
+import pytest
+
+import events
+from api import events as events_api
+from events import MemoryBroker, publish, set_broker, user_channel
+
+
+@pytest.fixture
+def listener(app, add_users):
+    """One user and a fresh broker; returns the user id"""
+    set_broker(MemoryBroker(queue_size=2))
+    user_id, = add_users('listener')
+    return user_id
+
+
+def stream_token(client, headers):
+    return client.post('/api/events/token', headers=headers).get_json()['token']
+
+
+def test_broker_delivers_to_channel_subscribers_until_they_fall_behind():
+    broker = MemoryBroker(queue_size=2)
+    mine = broker.subscribe([user_channel(1)])
+    other = broker.subscribe([user_channel(2)])
+    assert broker.connection_count() == 2
+    broker.publish([user_channel(1)], {'type': 'ping', 'data': 1})
+    assert mine.get(timeout=0) == {'type': 'ping', 'data': 1}
+    assert other.get(timeout=0) is None
+    for n in range(3):
+        broker.publish([user_channel(1)], {'type': 'ping', 'data': n})
+    assert mine.overflowed
+    mine.close()
+    other.close()
+    assert broker.connection_count() == 0
+
+
+def test_stream_sends_published_events(app, client, listener, auth_headers):
+    token = stream_token(client, auth_headers(listener))
+    response = client.get('/api/events', query_string={'jwt': token}, buffered=False)
+    assert response.status_code == 200
+    chunks = (chunk.decode() for chunk in response.response)
+    try:
+        assert 'event: ready' in next(chunks)
+        with app.app_context():
+            publish([listener], 'post.created', {'post_id': 7})
+        assert next(chunks) == 'event: post.created\ndata: {"post_id": 7}\n\n'
+    finally:
+        response.close()
+    assert events.get_broker().connection_count() == 0
+
+
+def test_stream_tokens_are_only_accepted_by_the_stream(client, listener, auth_headers):
+    headers = auth_headers(listener)
+    # Access tokens don't belong in URLs
+    access_token = headers['Authorization'].split()[1]
+    assert client.get('/api/events', query_string={'jwt': access_token}).status_code == 401
+    token = stream_token(client, headers)
+    scoped = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/messages/unread', headers=scoped).status_code == 401
+    assert client.post('/api/events/token', headers=scoped).status_code == 401
+
+
+def test_stream_is_refused_when_events_cannot_cross_workers(client, listener, auth_headers, monkeypatch):
+    monkeypatch.setattr(events, 'WEB_CONCURRENCY', 4)
+    assert client.get('/api/events', headers=auth_headers(listener)).status_code == 503
+
+
+def test_streams_leave_threads_for_other_requests(client, listener, auth_headers, monkeypatch):
+    assert events_api.stream_capacity() == 2
+    # A sync worker's only thread would be held for the life of the stream
+    monkeypatch.setattr(events_api, 'WEB_THREADS', 1)
+    assert client.get('/api/events', headers=auth_headers(listener)).status_code == 503
@@ -0,0 +1,55 @@
+"""
+Check that the feed embeds author profiles without N+1 queries
+"""
+from sqlalchemy import event
+
+from extensions import db
+from models.post import Post
+from models.profile import Profile
+from models.user import User
+
+
+def seed(app, author_count=30, posts_per_author=3):
+    with app.app_context():
+        users = [User(username=f'author{i}', email=f'author{i}@example.com', password_hash='x')
+                 for i in range(author_count)]
+        db.session.add_all(users)
+        db.session.flush()
+        for user in users:
+            db.session.add(Profile(user_id=user.id, name=user.username, title='Engineer', avatar=f'{user.id}.jpg'))
+            for n in range(posts_per_author):
+                db.session.add(Post(user_id=user.id, content=f'post {n} by {user.username}'))
+        db.session.commit()
+
+
+def count_feed_queries(app, limit):
+    """Number of SQL statements issued by one anonymous GET /api/feed"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/api/feed', query_string={'limit': limit})
+        body = response.get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    assert len(body['feed']) == limit
+    for item in body['feed']:
+        assert item['author']['name'] == f"author{item['author']['user_id'] - 1}"
+        assert item['author']['avatar_thumbnail'].startswith('/uploads/profile_images/thumb_')
+    return len(statements)
+
+
+def test_feed_query_count_is_constant(app):
+    seed(app)
+    counts = {limit: count_feed_queries(app, limit) for limit in (1, 5, 20, 60)}
+    print(f'Queries per page size: {counts}')
+    # The posts page, one IN query for its authors, one for their image variants and one for like counts
+    assert set(counts.values()) == {4}, counts
+
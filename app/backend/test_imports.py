@@ -46,6 +46,14 @@ def test_imports():
         traceback.print_exc()
         return False
 
+def test_api_exports_every_blueprint():
+    """`from api import <name>_bp` works for each blueprint create_app registers"""
+    import api
+    from app import BLUEPRINTS
+    assert sorted(api.__all__) == sorted(name for _, name, _ in BLUEPRINTS)
+    for module, name, _ in BLUEPRINTS:
+        assert getattr(api, name) is getattr(__import__(module, fromlist=[name]), name)
+
 if __name__ == '__main__':
     # Set environment variables
     os.environ.setdefault('FLASK_APP', 'app.py')
@@ -0,0 +1,67 @@
+"""
+Check sharded like counters: totals across shards and idempotent like/unlike
+"""
+import random
+
+import pytest
+
+from extensions import db
+from likes import like_count, like_post, likes_cli, load_likes, unlike_post
+from models.like import PostLikeCount
+from models.post import Post
+
+
+@pytest.fixture
+def post(app, add_users):
+    """A post by the first of 20 users; returns (post id, [user ids])"""
+    users = add_users(*(f'fan{i}' for i in range(20)))
+    with app.app_context():
+        post = Post(user_id=users[0], content='popular')
+        db.session.add(post)
+        db.session.commit()
+        return post.id, users
+
+
+def shard_rows(post_id):
+    return db.session.execute(
+        db.select(PostLikeCount.shard, PostLikeCount.count).where(PostLikeCount.post_id == post_id)).all()
+
+
+def test_shards_add_up_to_the_likes(app, post):
+    post_id, users = post
+    random.seed(7)
+    with app.app_context():
+        for user_id in users:
+            assert like_post(post_id, user_id)
+        for user_id in users[:5]:
+            assert unlike_post(post_id, user_id)
+        # Likes were spread over several shard rows, unlikes may leave some negative
+        assert len(shard_rows(post_id)) > 1
+        assert like_count(post_id) == sum(count for _, count in shard_rows(post_id)) == 15
+        assert load_likes([post_id], users[-1]) == {post_id: (15, True)}
+        assert load_likes([post_id], users[0]) == {post_id: (15, False)}
+        assert load_likes([post_id + 1]) == {}
+
+        # recount folds the shards back into one row with the same total
+        result = app.test_cli_runner().invoke(likes_cli, ['recount'])
+        assert 'Recounted likes for 1 posts' in result.output
+        assert shard_rows(post_id) == [(0, 15)]
+
+
+def test_like_and_unlike_are_idempotent(app, client, post, auth_headers):
+    post_id, users = post
+    author, fan = users[:2]
+    headers = auth_headers(fan)
+    url = f'/api/posts/{post_id}/like'
+    for _ in range(2):
+        response = client.post(url, headers=headers)
+        assert response.status_code == 200
+        assert response.get_json() == {'post_id': post_id, 'likes': 1, 'liked': True}
+    for _ in range(2):
+        response = client.delete(url, headers=headers)
+        assert response.status_code == 200
+        assert response.get_json() == {'post_id': post_id, 'likes': 0, 'liked': False}
+    with app.app_context():
+        assert not unlike_post(post_id, fan)
+        assert like_post(post_id, author) and not like_post(post_id, author)
+        assert like_count(post_id) == 1
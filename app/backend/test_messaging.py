@@ -0,0 +1,42 @@
+"""
+Check unread counters and read cursors as messages are sent and read
+"""
+from messaging import mark_read, participant, send_message, start_conversation, unread_total
+
+
+def state(conversation_id, user_id):
+    """(unread in the conversation, read cursor, unread everywhere)"""
+    entry = participant(conversation_id, user_id)
+    return entry.unread_count, entry.last_read_message_id, unread_total(user_id)
+
+
+def test_counters_follow_sends_reads_and_replies(app, add_users):
+    ann, bob, cat = add_users('ann', 'bob', 'cat')
+    with app.app_context():
+        direct, created = start_conversation(ann, [bob])
+        assert created and start_conversation(bob, [ann]) == (direct, False)
+        group, _ = start_conversation(ann, [bob, cat])
+
+        sent = [send_message(direct, ann, f'hi {n}')[0].id for n in range(3)]
+        message, recipients = send_message(group, cat, 'hello all')
+        assert sorted(recipients) == [ann, bob]
+        assert state(direct, bob) == (3, 0, 4)
+        assert state(direct, ann) == (0, sent[-1], 1)
+
+        # Reading part of a conversation moves the cursor and the totals
+        assert mark_read(direct, bob, sent[0]) == 2
+        assert state(direct, bob) == (2, sent[0], 3)
+        # The cursor never moves back
+        assert mark_read(direct, bob, sent[0] - 1) == 2
+        assert state(direct, bob) == (2, sent[0], 3)
+
+        # Replying reads everything before it
+        reply = send_message(direct, bob, 'hey')[0].id
+        assert state(direct, bob) == (0, reply, 1)
+        assert state(direct, ann) == (1, sent[-1], 2)
+
+        assert mark_read(group, ann) == 0
+        assert mark_read(direct, ann) == 0
+        assert state(group, ann) == (0, message.id, 0)
+        assert state(direct, ann) == (0, reply, 0)
+        assert unread_total(cat) == 0
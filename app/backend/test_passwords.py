@@ -0,0 +1,35 @@
+"""
+Check that sign-ins are refused with 503 once the password hash pool is full
+"""
+import pytest
+
+import passwords
+from extensions import db
+from models.user import User
+from passwords import HashPool, PasswordHashingBusy, hash_settings
+
+
+def login(client, password='secret'):
+    return client.post('/api/auth/login', json={'usernameOrEmail': 'busy', 'password': password})
+
+
+def test_full_pool_refuses_with_retry_after(app, client, monkeypatch):
+    pool = HashPool(kind='inline', max_pending=1, wait_seconds=0)
+    monkeypatch.setattr(passwords, 'hash_pool', pool)
+    with app.app_context():
+        password_hash = pool.run(passwords._hash, 'secret', hash_settings('pbkdf2', iterations=1000))
+        db.session.add(User(username='busy', email='busy@example.com', password_hash=password_hash))
+        db.session.commit()
+    assert login(client).status_code == 200
+
+    # Another request holds the only slot
+    assert pool._slots.acquire(timeout=0)
+    try:
+        with pytest.raises(PasswordHashingBusy):
+            passwords.verify_password(None, 'secret')
+        response = login(client)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        pool._slots.release()
+    assert login(client).status_code == 200
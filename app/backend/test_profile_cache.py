@@ -0,0 +1,35 @@
+"""
+Check the GET /api/profile cache: hits, misses, invalidation and the reported counters
+"""
+import pytest
+
+import api.health
+import cache
+from cache import LRUCache
+
+
+@pytest.fixture
+def profile_cache(monkeypatch):
+    """A fresh per-worker cache in place of the shared one"""
+    fresh = LRUCache(maxsize=100, ttl=60)
+    monkeypatch.setattr(cache, '_profile_cache', fresh)
+    return fresh
+
+
+def test_hits_until_the_profile_changes(client, add_users, auth_headers, profile_cache, monkeypatch):
+    headers = auth_headers(add_users('ann')[0])
+    assert client.put('/api/profile', json={'name': 'Ann'}, headers=headers).status_code == 200
+
+    assert client.get('/api/profile', headers=headers).get_json()['name'] == 'Ann'
+    assert client.get('/api/profile', headers=headers).get_json()['name'] == 'Ann'
+    assert (profile_cache.hits, profile_cache.misses) == (1, 1)
+
+    # The edit bumps cache_version, so the next read misses and sees it
+    assert client.put('/api/profile', json={'name': 'Ann B'}, headers=headers).status_code == 200
+    assert client.get('/api/profile', headers=headers).get_json()['name'] == 'Ann B'
+    assert (profile_cache.hits, profile_cache.misses) == (1, 2)
+
+    monkeypatch.setattr(api.health, 'HEALTH_TOKEN', 'secret')
+    assert 'caches' not in client.get('/api/health/db').get_json()
+    stats = client.get('/api/health/db', headers={'X-Health-Token': 'secret'}).get_json()['caches']['profile']
+    assert (stats['backend'], stats['hits'], stats['misses']) == ('memory', 1, 2)
@@ -0,0 +1,51 @@
+"""
+Check full-text search: ranked matches, prefix matching of the last word, and
+GET /api/search returning posts in rank order
+"""
+import pytest
+
+import search_index
+from search_index import SearchIndex, build_match_query
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """A fresh in-memory index in place of the shared one"""
+    index = SearchIndex(':memory:')
+    monkeypatch.setattr(search_index, '_index', index)
+    return index
+
+
+def test_match_query_quotes_every_word():
+    assert build_match_query('rust "OR" async-io') == '"rust" "OR" "async" "io"*'
+    assert build_match_query(' ?! ') is None
+
+
+def test_profiles_rank_name_and_title_above_bio(index):
+    index.index_profile(1, 'Ann', 'Baker', 'I like python on weekends', 'Oslo')
+    index.index_profile(2, 'Bob', 'Python developer', 'Backend work', 'Lisbon')
+    index.index_profile(3, 'Cy', 'Designer', 'Typography', 'Paris')
+    assert index.search_profiles('python') == [2, 1]
+    assert index.search_profiles('Lisb') == [2]  # The last word matches as a prefix
+    # Re-indexing replaces the old text
+    index.index_profile(2, 'Bob', 'Gardener', '', '')
+    assert index.search_profiles('python') == [1]
+
+
+def test_search_returns_ranked_posts(client, index, add_users, auth_headers):
+    headers = auth_headers(add_users('poster')[0])
+    contents = ['weekly notes', 'sqlite tips: sqlite fts5 and sqlite wal', 'a note about sqlite', 'café opening']
+    for content in contents:
+        assert client.post('/api/posts', data={'content': content}, headers=headers).status_code == 201
+
+    def found(query, **params):
+        response = client.get('/api/search', query_string={'q': query, **params}, headers=headers)
+        assert response.status_code == 200
+        return response.get_json()
+
+    body = found('sqlite')
+    assert [post['content'] for post in body['results']] == [contents[1], contents[2]]
+    assert body['next_page'] is None
+    assert [post['content'] for post in found('cafe')['results']] == [contents[3]]
+    assert found('sqlite', limit=1)['next_page'] == 2
+    assert client.get('/api/search', headers=headers).status_code == 400
@@ -0,0 +1,144 @@
+"""
+Check the media storage backends: local disk, and S3 against moto's
+in-process fake (skipped when moto isn't installed)
+"""
+import hashlib
+import os
+import tempfile
+
+import pytest
+
+import media_store
+from api.uploads import part_path
+from config import UPLOAD_CHUNK_SIZE
+from storage import LocalStorage, S3Storage, get_storage, set_storage
+from tasks import InlineExecutor, set_executor
+
+
+def write_temp(data):
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def check_roundtrip(storage):
+    data = os.urandom(20 * 1024 * 1024 + 123)  # Over the multipart chunk size
+    key = 'ab/cd/' + hashlib.sha256(data).hexdigest() + '.mp4'
+    assert not storage.exists(key)
+    storage.put_file(write_temp(data), key, 'video/mp4')
+    assert storage.exists(key)
+    assert storage.size(key) == len(data)
+    assert [listed for listed, modified in storage.list('ab/')] == [key]
+    with storage.workspace(key) as (source_path, output_folder):
+        with open(source_path, 'rb') as f:
+            assert f.read() == data
+        with open(os.path.join(output_folder, 'derived.txt'), 'w') as f:
+            f.write('x')
+    assert storage.exists('ab/cd/derived.txt')
+    storage.delete(key)
+    storage.delete('ab/cd/derived.txt')
+    assert not storage.exists(key)
+
+
+def test_local_storage():
+    check_roundtrip(LocalStorage(tempfile.mkdtemp()))
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    import boto3
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='media-test')
+        yield S3Storage('media-test', 'media', client=client)
+
+
+def test_s3_storage(s3_storage):
+    check_roundtrip(s3_storage)
+
+
+def test_chunks_are_assembled_in_the_bucket(client, s3_storage, add_users, auth_headers):
+    previous = get_storage()
+    set_storage(s3_storage)
+    set_executor(InlineExecutor())
+    try:
+        headers = auth_headers(add_users('uploader')[0])
+        data = b'\x00\x00\x00\x18ftypmp42' + os.urandom(UPLOAD_CHUNK_SIZE + 1000)
+        response = client.post('/api/uploads', json={'filename': 'clip.mp4', 'size': len(data)}, headers=headers)
+        upload = response.get_json()
+        url = f"/api/uploads/{upload['upload_id']}"
+        chunk_size = upload['chunk_size']
+        # Nothing is written to this node's disk, so the next chunk may go to any node
+        assert not os.path.exists(part_path(upload['upload_id']))
+
+        def patch(offset, body):
+            return client.patch(url, data=body, headers={**headers, 'Upload-Offset': str(offset)})
+
+        assert patch(0, data[:chunk_size - 1]).status_code == 400  # Parts are whole chunks
+        assert patch(0, data[:chunk_size]).status_code == 204
+        assert patch(0, data[:chunk_size]).status_code == 409  # Already received
+        assert client.head(url, headers=headers).headers['Upload-Offset'] == str(chunk_size)
+        assert patch(chunk_size, data[chunk_size:]).status_code == 204
+
+        response = client.post(f'{url}/finalize', headers=headers)
+        assert response.status_code == 202
+        upload = client.get(url, headers=headers).get_json()
+        assert upload['status'] == 'complete'
+        assert upload['sha256'] == hashlib.sha256(data).hexdigest()
+        key = media_store.blob_key(upload['media_url'].rsplit('/', 1)[1])
+        assert s3_storage.size(key) == len(data)
+        assert [key for key, modified in s3_storage.list('tmp/')] == []
+    finally:
+        set_storage(previous)
+        set_executor(None)
+
+
+def test_direct_upload_through_presigned_urls(client, s3_storage, add_users, auth_headers):
+    import requests
+
+    previous = get_storage()
+    set_storage(s3_storage)
+    # Workers must share the mocked bucket, so run tasks in this process
+    set_executor(InlineExecutor())
+    try:
+        headers = auth_headers(add_users('uploader')[0])
+
+        # Small file: one presigned PUT
+        data = b'\x00\x00\x00\x18ftypmp42' + os.urandom(4096)
+        sha256 = hashlib.sha256(data).hexdigest()
+        body = {'filename': 'clip.mp4', 'size': len(data), 'sha256': sha256, 'direct': True}
+        response = client.post('/api/uploads', json=body, headers=headers)
+        assert response.status_code == 201, response.get_json()
+        target = response.get_json()['upload']
+        assert requests.put(target['url'], data=data, headers=target['headers']).ok
+        response = client.post(f"/api/uploads/{response.get_json()['upload_id']}/finalize", headers=headers)
+        assert response.get_json()['status'] == 'complete'
+        media_url = response.get_json()['media_url']
+        assert media_url.endswith(f'{sha256}.mp4')
+        assert client.get(media_url).status_code == 302
+
+        # Same bytes again: already stored, nothing to send
+        response = client.post('/api/uploads', json=body, headers=headers)
+        assert response.get_json()['status'] == 'complete'
+        assert 'upload' not in response.get_json()
+
+        # Large file: presigned multipart parts, verified by a worker before use
+        data = b'\x00\x00\x00\x18ftypmp42' + os.urandom(12 * 1024 * 1024)
+        body = {'filename': 'long.mp4', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(), 'direct': True}
+        response = client.post('/api/uploads', json=body, headers=headers)
+        upload_id = response.get_json()['upload_id']
+        target = response.get_json()['upload']
+        parts = []
+        for part in target['parts']:
+            start = (part['part_number'] - 1) * target['part_size']
+            result = requests.put(part['url'], data=data[start:start + target['part_size']])
+            parts.append({'part_number': part['part_number'], 'etag': result.headers['ETag']})
+        response = client.post(f'/api/uploads/{upload_id}/finalize', json={'parts': parts}, headers=headers)
+        assert response.status_code == 202
+        assert client.get(f'/api/uploads/{upload_id}', headers=headers).get_json()['status'] == 'complete'
+    finally:
+        set_storage(previous)
+        set_executor(None)
+
@@ -0,0 +1,38 @@
+"""
+Check that streamed list responses match jsonify and are sent in pieces
+"""
+import json
+
+import streaming
+from streaming import stream_json
+
+
+def test_streamed_body_matches_jsonify(app, monkeypatch):
+    monkeypatch.setattr(streaming, 'STREAM_BUFFER_SIZE', 64)
+    rows = [{'id': n, 'content': f'post {n}', 'tags': ['a', 'é']} for n in range(20)]
+    consumed = []
+
+    def produce():
+        for row in rows:
+            consumed.append(row['id'])
+            yield row
+
+    with app.test_request_context():
+        # next_cursor sorts after feed, so it is read once every row was encoded
+        response = stream_json({'next_cursor': lambda: consumed[-1], 'feed': produce()}, 'feed')
+        assert response.is_streamed
+        chunks = list(response.response)
+        expected = app.json.response({'feed': rows, 'next_cursor': 19}).get_data(as_text=True)
+    assert len(chunks) > 1
+    assert ''.join(chunks) == expected
+    assert json.loads(expected)['next_cursor'] == 19
+
+
+def test_feed_streams_its_rows(client, add_users, auth_headers):
+    headers = auth_headers(add_users('poster')[0])
+    for n in range(3):
+        assert client.post('/api/posts', data={'content': f'post {n}'}, headers=headers).status_code == 201
+    response = client.get('/api/feed', headers=headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [post['content'] for post in response.get_json()['feed']] == ['post 2', 'post 1', 'post 0']
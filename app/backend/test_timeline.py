@@ -0,0 +1,90 @@
+"""
+Check home timelines: full pages after an unfollow, the database store, and the feed scopes
+"""
+import pytest
+
+from extensions import db
+from models.follow import Follow
+from models.post import Post
+from models.timeline import TimelineEntry
+from timeline import DatabaseTimelineStore, InMemoryTimelineStore, fan_out_post, home_timeline, set_timeline_store
+
+
+@pytest.fixture
+def follows(app, add_users):
+    """A reader following two authors; returns (reader, kept, unfollowed) ids"""
+    reader, kept, unfollowed = add_users('reader', 'kept', 'unfollowed')
+    with app.app_context():
+        db.session.add_all([Follow(follower_id=reader, followee_id=kept),
+                            Follow(follower_id=reader, followee_id=unfollowed)])
+        db.session.commit()
+    return reader, kept, unfollowed
+
+
+def publish_posts(author_id, count):
+    ids = []
+    for n in range(count):
+        post = Post(user_id=author_id, content=f'post {n}')
+        db.session.add(post)
+        db.session.commit()
+        fan_out_post(post)
+        ids.append(post.id)
+    return ids
+
+
+def read_all(user_id, limit):
+    """Every page of the home feed: [[post ids]]"""
+    pages = []
+    before = None
+    while True:
+        posts, next_key = home_timeline(user_id, before, limit)
+        pages.append([post.id for post in posts])
+        if next_key is None:
+            return pages
+        before = next_key[1]
+
+
+def test_unfollowed_authors_do_not_shorten_pages(app, follows):
+    reader, kept, unfollowed = follows
+    set_timeline_store(InMemoryTimelineStore())
+    with app.app_context():
+        kept_ids = publish_posts(kept, 6)
+        # Newer than everything kept, so they fill the first stored pages
+        publish_posts(unfollowed, 8)
+        Follow.query.filter_by(follower_id=reader, followee_id=unfollowed).delete()
+        db.session.commit()
+        pages = read_all(reader, 4)
+    assert pages == [kept_ids[:1:-1], kept_ids[1::-1]], pages
+
+
+def test_database_timelines_are_shared_and_read_by_key(app, follows):
+    reader, kept, unfollowed = follows
+    set_timeline_store(DatabaseTimelineStore())
+    with app.app_context():
+        first = publish_posts(kept, 3)
+        # Another worker (its own store object) fans out to the same table
+        set_timeline_store(DatabaseTimelineStore())
+        other = publish_posts(unfollowed, 1)
+        # A post that was never fanned out is not merged in at read time
+        db.session.add(Post(user_id=kept, content='not delivered'))
+        db.session.commit()
+        pages = read_all(reader, 2)
+        entries = TimelineEntry.query.filter_by(user_id=reader).count()
+    assert pages == [[other[0], first[2]], [first[1], first[0]]], pages
+    assert entries == 4
+
+
+def test_feed_is_global_unless_home_is_asked_for(app, client, follows, auth_headers):
+    reader, kept, unfollowed = follows
+    with app.app_context():
+        Follow.query.filter_by(follower_id=reader, followee_id=unfollowed).delete()
+        db.session.commit()
+        kept_id = publish_posts(kept, 1)[0]
+        unfollowed_id = publish_posts(unfollowed, 1)[0]
+    headers = auth_headers(reader)
+
+    def feed_ids(**query):
+        return [item['id'] for item in client.get('/api/feed', headers=headers, query_string=query).get_json()['feed']]
+
+    assert feed_ids() == [unfollowed_id, kept_id]
+    assert feed_ids(scope='home') == [kept_id]
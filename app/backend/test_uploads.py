@@ -0,0 +1,65 @@
+"""
+Check chunked uploads on local storage: a file sent in pieces, interrupted and
+resumed from the offset the server reports, ends up whole and attachable
+"""
+import hashlib
+import os
+
+import pytest
+
+from api import uploads
+from api.uploads import part_path
+
+MP4_HEADER = b'\x00\x00\x00\x18ftypmp42'
+
+
+@pytest.fixture
+def upload(client, add_users, auth_headers):
+    """A started upload of 3000 bytes of mp4; returns (headers, url, data)"""
+    headers = auth_headers(add_users('uploader')[0])
+    data = MP4_HEADER + os.urandom(3000 - len(MP4_HEADER))
+    response = client.post('/api/uploads', json={'filename': 'clip.mp4', 'size': len(data)}, headers=headers)
+    assert response.status_code == 201
+    return headers, f"/api/uploads/{response.get_json()['upload_id']}", data
+
+
+def test_interrupted_upload_resumes_from_the_server_offset(client, upload):
+    headers, url, data = upload
+
+    def patch(offset, body):
+        return client.patch(url, data=body, headers={**headers, 'Upload-Offset': str(offset)})
+
+    assert patch(0, data[:1000]).status_code == 204
+    # The response to the second chunk was lost: the client retries from where it thinks it is
+    assert patch(1000, data[1000:1800]).status_code == 204
+    response = patch(1000, data[1000:1800])
+    assert response.status_code == 409
+    assert response.headers['Upload-Offset'] == '1800'
+    assert client.head(url, headers=headers).headers['Upload-Offset'] == '1800'
+    assert client.post(f'{url}/finalize', headers=headers).status_code == 409  # Not all there yet
+
+    # The rest arrives on another worker, which has no running hash for this upload
+    uploads._hashers.clear()
+    assert patch(1800, data[1800:]).status_code == 204
+    response = client.post(f'{url}/finalize', headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'complete'
+    assert body['sha256'] == hashlib.sha256(data).hexdigest()
+    assert not os.path.exists(part_path(url.rsplit('/', 1)[1]))
+
+    response = client.post('/api/posts', data={'content': 'clip', 'upload_id': url.rsplit('/', 1)[1]},
+                           headers=headers)
+    assert response.status_code == 201
+
+
+def test_chunks_are_checked_before_they_are_kept(client, upload):
+    headers, url, data = upload
+
+    def patch(offset, body):
+        return client.patch(url, data=body, headers={**headers, 'Upload-Offset': str(offset)})
+
+    assert patch(0, b'GIF89a' + data[6:100]).status_code == 415
+    assert patch(0, data + b'extra').status_code == 413
+    # Neither refused chunk moved the offset
+    assert client.head(url, headers=headers).headers['Upload-Offset'] == '0'
@@ -0,0 +1,331 @@
+"""
+Precomputed home timelines.
+
+Each user has a bounded list of post ids, newest first. create_post pushes
+new ids into the timelines of the author's followers (fan-out-on-write), so
+reading a home feed is one range read instead of a scan over posts. Authors
+with more than FANOUT_MAX_FOLLOWERS followers are not fanned out; their posts
+are merged in when a follower reads (fan-out-on-read).
+
+Timelines must be visible to every worker: they live in Redis sorted sets
+when REDIS_URL is set, otherwise in the timeline_entries table, read by its
+(user_id, post_id) primary key. Either way a page never sorts the followed
+authors' posts. `flask timelines trim` keeps the table at
+TIMELINE_MAX_LENGTH entries per user.
+"""
+import bisect
+import threading
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db, get_redis
+from config import TIMELINE_MAX_LENGTH, FANOUT_MAX_FOLLOWERS
+from models.follow import Follow
+from models.post import Post
+from models.timeline import TimelineEntry, TimelineLargeAuthor
+
+
+class InMemoryTimelineStore:
+    """Per-process timeline store for a single worker; also the local fake used in tests"""
+
+    def __init__(self, max_length=TIMELINE_MAX_LENGTH):
+        self.max_length = max_length
+        self._timelines = {}  # user_id -> ascending list of post ids
+        self._large_authors = set()
+        self._lock = threading.Lock()
+
+    def push(self, user_ids, post_id):
+        with self._lock:
+            for user_id in user_ids:
+                ids = self._timelines.setdefault(user_id, [])
+                index = bisect.bisect_left(ids, post_id)
+                if index < len(ids) and ids[index] == post_id:
+                    continue
+                ids.insert(index, post_id)
+                if len(ids) > self.max_length:
+                    del ids[:len(ids) - self.max_length]
+
+    def extend(self, user_id, post_ids):
+        with self._lock:
+            ids = sorted(set(self._timelines.get(user_id, [])) | set(post_ids))
+            self._timelines[user_id] = ids[-self.max_length:]
+
+    def page(self, user_id, before=None, limit=20):
+        """Post ids newest first, strictly older than `before` when given"""
+        with self._lock:
+            ids = self._timelines.get(user_id, [])
+            end = bisect.bisect_left(ids, before) if before is not None else len(ids)
+            return ids[max(0, end - limit):end][::-1]
+
+    def exists(self, user_id):
+        with self._lock:
+            return user_id in self._timelines
+
+    def set_large_author(self, author_id, is_large):
+        with self._lock:
+            if is_large:
+                self._large_authors.add(author_id)
+            else:
+                self._large_authors.discard(author_id)
+
+    def large_authors(self, candidates):
+        with self._lock:
+            return self._large_authors.intersection(candidates)
+
+
+class RedisTimelineStore:
+    """Timelines kept in Redis sorted sets scored by post id, shared by all workers"""
+
+    LARGE_AUTHORS_KEY = 'timeline:large_authors'
+
+    def __init__(self, client, max_length=TIMELINE_MAX_LENGTH):
+        self.client = client
+        self.max_length = max_length
+
+    @staticmethod
+    def _key(user_id):
+        return f'timeline:{user_id}'
+
+    def push(self, user_ids, post_id):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zadd(self._key(user_id), {post_id: post_id})
+            pipe.zremrangebyrank(self._key(user_id), 0, -(self.max_length + 1))
+        pipe.execute()
+
+    def extend(self, user_id, post_ids):
+        if not post_ids:
+            return
+        pipe = self.client.pipeline()
+        pipe.zadd(self._key(user_id), {post_id: post_id for post_id in post_ids})
+        pipe.zremrangebyrank(self._key(user_id), 0, -(self.max_length + 1))
+        pipe.execute()
+
+    def page(self, user_id, before=None, limit=20):
+        upper = f'({before}' if before is not None else '+inf'
+        ids = self.client.zrevrangebyscore(self._key(user_id), upper, '-inf', start=0, num=limit)
+        return [int(post_id) for post_id in ids]
+
+    def exists(self, user_id):
+        return bool(self.client.exists(self._key(user_id)))
+
+    def set_large_author(self, author_id, is_large):
+        if is_large:
+            self.client.sadd(self.LARGE_AUTHORS_KEY, author_id)
+        else:
+            self.client.srem(self.LARGE_AUTHORS_KEY, author_id)
+
+    def large_authors(self, candidates):
+        members = {int(author_id) for author_id in self.client.smembers(self.LARGE_AUTHORS_KEY)}
+        return members.intersection(candidates)
+
+
+class DatabaseTimelineStore:
+    """
+    Timelines kept in the timeline_entries table, shared by all workers without
+    Redis. Writes join the caller's transaction and are committed here.
+    """
+
+    def __init__(self, max_length=TIMELINE_MAX_LENGTH):
+        self.max_length = max_length
+
+    def _insert_missing(self, user_ids, post_ids, existing):
+        rows = [{'user_id': user_id, 'post_id': post_id}
+                for user_id in user_ids for post_id in post_ids if (user_id, post_id) not in existing]
+        if rows:
+            db.session.execute(db.insert(TimelineEntry), rows)
+        db.session.commit()
+
+    def push(self, user_ids, post_id):
+        user_ids = list(user_ids)
+        # Checked on the primary, which the inserts go to
+        existing = db.session.execute(
+            db.select(TimelineEntry.user_id, TimelineEntry.post_id).where(
+                TimelineEntry.post_id == post_id, TimelineEntry.user_id.in_(user_ids)),
+            bind_arguments={'bind': db.engine}).all()
+        self._insert_missing(user_ids, [post_id], set(map(tuple, existing)))
+
+    def extend(self, user_id, post_ids):
+        if not post_ids:
+            return
+        existing = db.session.execute(
+            db.select(TimelineEntry.user_id, TimelineEntry.post_id).where(
+                TimelineEntry.user_id == user_id, TimelineEntry.post_id.in_(post_ids)),
+            bind_arguments={'bind': db.engine}).all()
+        self._insert_missing([user_id], post_ids, set(map(tuple, existing)))
+
+    def page(self, user_id, before=None, limit=20):
+        query = db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id)
+        if before is not None:
+            query = query.where(TimelineEntry.post_id < before)
+        return list(db.session.execute(query.order_by(TimelineEntry.post_id.desc()).limit(limit)).scalars())
+
+    def exists(self, user_id):
+        return db.session.execute(
+            db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id).limit(1)).first() is not None
+
+    def set_large_author(self, author_id, is_large):
+        row = db.session.get(TimelineLargeAuthor, author_id)
+        if is_large and row is None:
+            db.session.add(TimelineLargeAuthor(author_id=author_id))
+        elif not is_large and row is not None:
+            db.session.delete(row)
+        else:
+            return
+        db.session.commit()
+
+    def large_authors(self, candidates):
+        if not candidates:
+            return set()
+        return set(db.session.execute(
+            db.select(TimelineLargeAuthor.author_id).where(TimelineLargeAuthor.author_id.in_(candidates))).scalars())
+
+    def trim(self):
+        """Drop entries past max_length in every timeline; returns how many users were trimmed"""
+        users = db.session.execute(
+            db.select(TimelineEntry.user_id).group_by(TimelineEntry.user_id)
+            .having(db.func.count() > self.max_length)).scalars().all()
+        for user_id in users:
+            oldest_kept = db.session.execute(
+                db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id)
+                .order_by(TimelineEntry.post_id.desc()).offset(self.max_length - 1).limit(1)).scalar()
+            db.session.execute(db.delete(TimelineEntry).where(
+                TimelineEntry.user_id == user_id, TimelineEntry.post_id < oldest_kept))
+            db.session.commit()
+        return len(users)
+
+
+_store = None
+
+def get_timeline_store():
+    """RedisTimelineStore when REDIS_URL is set, else DatabaseTimelineStore"""
+    global _store
+    if _store is None:
+        client = get_redis()
+        _store = RedisTimelineStore(client) if client is not None else DatabaseTimelineStore()
+    return _store
+
+
+def set_timeline_store(store):
+    """Swap the backing store, e.g. for a fresh InMemoryTimelineStore in tests; None restores the default"""
+    global _store
+    _store = store
+
+
+def followee_ids(user_id):
+    rows = db.session.query(Follow.followee_id).filter(Follow.follower_id == user_id).all()
+    return {row[0] for row in rows}
+
+
+def fan_out_post(post):
+    """Push a freshly committed post into its author's and followers' timelines; returns their ids"""
+    store = get_timeline_store()
+    author_id = int(post.user_id)
+    follower_count = Follow.query.filter_by(followee_id=author_id).count()
+    is_large = follower_count > FANOUT_MAX_FOLLOWERS
+    recipients = [author_id]
+    if not is_large:
+        rows = db.session.query(Follow.follower_id).filter(Follow.followee_id == author_id).all()
+        recipients.extend(row[0] for row in rows)
+    store.set_large_author(author_id, is_large)
+    store.push(recipients, post.id)
+    return recipients
+
+
+def backfill_followee(follower_id, followee_id):
+    """Merge a newly followed author's recent posts into the follower's timeline"""
+    store = get_timeline_store()
+    if not store.exists(follower_id) or store.large_authors({followee_id}):
+        return
+    rows = (db.session.query(Post.id)
+            .filter(Post.user_id == followee_id)
+            .order_by(Post.id.desc())
+            .limit(store.max_length)
+            .all())
+    store.extend(follower_id, [row[0] for row in rows])
+
+
+def rebuild_timeline(user_id, authors=None):
+    """Recompute a timeline from posts, used when the store is cold (restart, eviction)"""
+    store = get_timeline_store()
+    if authors is None:
+        authors = followee_ids(user_id) | {user_id}
+    pushed = authors - store.large_authors(authors)
+    rows = (db.session.query(Post.id)
+            .filter(Post.user_id.in_(pushed))
+            .order_by(Post.id.desc())
+            .limit(store.max_length)
+            .all())
+    store.extend(user_id, [row[0] for row in rows])
+
+
+def _recent_posts(authors, before, limit):
+    """The newest `limit` posts by `authors`, with ids below `before`"""
+    if not authors:
+        return []
+    query = Post.query.filter(Post.user_id.in_(authors))
+    if before is not None:
+        query = query.filter(Post.id < before)
+    return query.order_by(Post.id.desc()).limit(limit).all()
+
+
+def _stored_posts(store, user_id, authors, before, limit):
+    """
+    The newest `limit` posts in a stored timeline that are still by `authors`.
+    Entries from unfollowed authors or deleted posts are skipped before the
+    limit is applied, reading further into the timeline when needed.
+    """
+    posts = []
+    while len(posts) < limit:
+        ids = store.page(user_id, before, limit)
+        if not ids:
+            break
+        posts.extend(Post.query.filter(Post.id.in_(ids), Post.user_id.in_(authors))
+                     .order_by(Post.id.desc()).all())
+        if len(ids) < limit:
+            break
+        before = ids[-1]
+    return posts[:limit]
+
+
+def home_timeline(user_id, before=None, limit=20):
+    """
+    One page of a user's home feed, newest first.
+
+    Returns (posts, next_key) where next_key is the (created_at, id) keyset
+    position of the last post returned, or None on the last page. `before` is
+    the id of the last post already seen.
+    """
+    store = get_timeline_store()
+    authors = followee_ids(user_id) | {user_id}
+    if not store.exists(user_id):
+        rebuild_timeline(user_id, authors)
+        # Read the rebuilt timeline back from the primary, not a replica that may lag it
+        db.session.info['wrote'] = True
+    # One extra post tells whether there is another page
+    posts = _stored_posts(store, user_id, authors, before, limit + 1)
+    # Fan-out-on-read for large authors that were skipped at write time
+    large = store.large_authors(authors)
+    if large:
+        merged = {post.id: post for post in posts}
+        merged.update((post.id, post) for post in _recent_posts(large, before, limit + 1))
+        posts = sorted(merged.values(), key=lambda post: post.id, reverse=True)[:limit + 1]
+
+    next_key = None
+    if len(posts) > limit:
+        boundary = posts[limit - 1]
+        next_key = (boundary.created_at or datetime.min, boundary.id)
+    return posts[:limit], next_key
+
+
+timelines_cli = AppGroup('timelines', help='Home timeline commands.')
+
+@timelines_cli.command('trim')
+def trim_command():
+    """Cut database timelines back to TIMELINE_MAX_LENGTH posts (run periodically without Redis)."""
+    store = get_timeline_store()
+    if not isinstance(store, DatabaseTimelineStore):
+        raise click.ClickException('Timelines are in Redis, which trims them as posts are pushed')
+    click.echo(f'Trimmed {store.trim()} timelines')
@@ -0,0 +1,53 @@
+"""
+Responsive image variants: recording what the workers produced and turning
+it into srcset data for API responses.
+"""
+from extensions import db
+from config import IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS
+from images import supported_variant_formats
+from models.media_variant import MediaVariant
+
+# Most to least efficient; clients pick the first type they support
+SRCSET_FORMATS = ('avif', 'webp', 'jpeg')
+VARIANT_SOURCE_EXTENSIONS = {'png', 'jpg', 'jpeg'}  # GIFs keep their animation, so no variants
+
+
+def variant_settings():
+    """(widths, formats) to pass to the image workers"""
+    return list(IMAGE_VARIANT_WIDTHS), supported_variant_formats(IMAGE_VARIANT_FORMATS)
+
+
+def media_key_for_url(url):
+    """'/uploads/post_media/x.jpg' -> 'post_media/x.jpg'; None for anything else"""
+    prefix = '/uploads/'
+    if not url or not url.startswith(prefix):
+        return None
+    return url[len(prefix):]
+
+
+def record_variants(media_key, variants):
+    """Replace the stored variants of one source image"""
+    MediaVariant.query.filter_by(media_key=media_key).delete()
+    db.session.add_all(MediaVariant(media_key=media_key, **variant) for variant in variants)
+
+
+def load_srcsets(media_keys):
+    """
+    srcset data for many images in one query:
+    {media_key: {'avif': 'url 64w, url 128w', 'webp': ..., 'jpeg': ...}}
+    """
+    media_keys = {key for key in media_keys if key}
+    if not media_keys:
+        return {}
+    rows = (db.session.query(MediaVariant.media_key, MediaVariant.format, MediaVariant.width, MediaVariant.filename)
+            .filter(MediaVariant.media_key.in_(media_keys))
+            .order_by(MediaVariant.media_key, MediaVariant.width)
+            .all())
+    grouped = {}
+    for media_key, fmt, width, filename in rows:
+        folder = media_key.rsplit('/', 1)[0]
+        grouped.setdefault(media_key, {}).setdefault(fmt, []).append(f'/uploads/{folder}/{filename} {width}w')
+    return {
+        media_key: {fmt: ', '.join(formats[fmt]) for fmt in SRCSET_FORMATS if fmt in formats}
+        for media_key, formats in grouped.items()
+    }
@@ -4,7 +4,7 @@ export const feedApi = {
   getFeed: async () => {
     const response = await fetch(`${API_URL}/api/feed`, {
       headers: {
-        'Authorization': `Bearer ${localStorage.getItem('token')}`,
+        'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
       },
     });
     return response.json();
@@ -13,7 +13,7 @@ export const feedApi = {
   getFeedByUser: async (userId: number) => {
     const response = await fetch(`${API_URL}/api/feed/user/${userId}`, {
       headers: {
-        'Authorization': `Bearer ${localStorage.getItem('token')}`,
+        'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
       },
     });
     return response.json();
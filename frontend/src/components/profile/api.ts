@@ -1,5 +1,27 @@
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5001';
 
+// Poll GET /api/profile/image/jobs/<id> until the job is ready (with filename and image_url) or failed
+const waitForImageJob = async (statusUrl: string, intervalMs = 1000, attempts = 60) => {
+  const token = localStorage.getItem('access_token');
+  for (let attempt = 0; attempt < attempts; attempt++) {
+    const response = await fetch(`${API_URL}${statusUrl}`, {
+      headers: token ? { 'Authorization': `Bearer ${token}` } : {},
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const job = await response.json();
+    if (job.status === 'ready') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      return { error: job.error || 'Failed to process image' };
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+  return { error: 'Your photo is still processing, please check back in a moment' };
+};
+
 export const profileApi = {
   getProfile: async () => {
     try {
@@ -78,7 +100,12 @@ export const profileApi = {
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
-      return await response.json();
+      const result = await response.json();
+      // The avatar is resized in the background (202): wait for the job to finish
+      if (result.status_url && result.status !== 'ready') {
+        return await waitForImageJob(result.status_url);
+      }
+      return result;
     } catch (error) {
       console.error('Error uploading image:', error);
       throw error;
@@ -0,0 +1,28 @@
+"""Add profiles.cache_version for per-worker profile caches
+
+Revision ID: 0e4b7a2c5f93
+Revises: 6f1a3c9e2d48
+Create Date: 2026-10-18 23:20:47.815204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0e4b7a2c5f93'
+down_revision = '6f1a3c9e2d48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'cache_version' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('profiles')}:
+        return
+    with op.batch_alter_table('profiles') as batch_op:
+        batch_op.add_column(sa.Column('cache_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('profiles') as batch_op:
+        batch_op.drop_column('cache_version')
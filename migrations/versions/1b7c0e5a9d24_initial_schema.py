@@ -0,0 +1,74 @@
+"""Create the original users, profiles and posts tables
+
+Revision ID: 1b7c0e5a9d24
+Revises:
+Create Date: 2026-10-18 10:05:12.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7c0e5a9d24'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases set up with `flask init-db` (db.create_all) already have these
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'users' not in tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+            sa.UniqueConstraint('email')
+        )
+    if 'profiles' not in tables:
+        op.create_table(
+            'profiles',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=120), nullable=True),
+            sa.Column('avatar', sa.String(length=255), nullable=True),
+            sa.Column('title', sa.String(length=120), nullable=True),
+            sa.Column('location', sa.String(length=120), nullable=True),
+            sa.Column('social', sa.Text(), nullable=True),
+            sa.Column('activity', sa.Text(), nullable=True),
+            sa.Column('bio', sa.Text(), nullable=True),
+            sa.Column('skills', sa.Text(), nullable=True),
+            sa.Column('education', sa.Text(), nullable=True),
+            sa.Column('experience', sa.Text(), nullable=True),
+            sa.Column('contact', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+    if 'posts' not in tables:
+        op.create_table(
+            'posts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('media_url', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('is_public', sa.Boolean(), nullable=True),
+            sa.Column('allow_comments', sa.Boolean(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('posts')
+    op.drop_table('profiles')
+    op.drop_table('users')
@@ -0,0 +1,26 @@
+"""Add ix_posts_created_at_id for keyset feed pagination
+
+Revision ID: 2c6d8f1e4b70
+Revises: 7e2b9d4c6a15
+Create Date: 2026-10-18 22:41:09.117305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6d8f1e4b70'
+down_revision = '7e2b9d4c6a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('posts')}
+    if 'ix_posts_created_at_id' not in indexes:
+        op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
@@ -0,0 +1,110 @@
+"""Store profile structured fields as native JSON
+
+Revision ID: 3f9a2c1d7e84
+Revises: 1b7c0e5a9d24
+Create Date: 2026-10-18 10:12:41.318540
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a2c1d7e84'
+down_revision = '1b7c0e5a9d24'
+branch_labels = None
+depends_on = None
+
+JSON_FIELDS = ('social', 'activity', 'education', 'experience', 'contact')
+BATCH_SIZE = 1000
+JSONType = sa.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+
+def _text_columns(bind):
+    """Fields still stored as Text (tables made by create_all may already be JSON)"""
+    columns = {column['name']: column['type'] for column in sa.inspect(bind).get_columns('profiles')}
+    return [field for field in JSON_FIELDS if not isinstance(columns.get(field), sa.JSON)]
+
+
+def _backfill(bind, source_fields, source_type, target_suffix, target_type, convert):
+    """Copy each field into its `<field><suffix>` column, BATCH_SIZE rows at a time by id"""
+    profiles = sa.table('profiles', sa.column('id'),
+                        *[sa.column(field, source_type) for field in source_fields])
+    targets = sa.table('profiles', sa.column('id'),
+                       *[sa.column(field + target_suffix, target_type) for field in source_fields])
+    update = (targets.update()
+              .where(targets.c.id == sa.bindparam('_id'))
+              .values({field + target_suffix: sa.bindparam('_' + field) for field in source_fields}))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(profiles).where(profiles.c.id > last_id).order_by(profiles.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            values = {'_id': row.id}
+            for field in source_fields:
+                values['_' + field] = convert(getattr(row, field))
+            params.append(values)
+        bind.execute(update, params)
+        last_id = rows[-1].id
+
+
+def _decode(value):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _encode(value):
+    return json.dumps(value) if value is not None else ''
+
+
+def _swap_columns(fields, suffix, new_type):
+    with op.batch_alter_table('profiles') as batch_op:
+        for field in fields:
+            batch_op.drop_column(field)
+    with op.batch_alter_table('profiles') as batch_op:
+        for field in fields:
+            batch_op.alter_column(field + suffix, new_column_name=field,
+                                  existing_type=new_type, existing_nullable=True)
+
+
+def upgrade():
+    bind = op.get_bind()
+    fields = _text_columns(bind)
+    if fields:
+        with op.batch_alter_table('profiles') as batch_op:
+            for field in fields:
+                batch_op.add_column(sa.Column(field + '_json', JSONType, nullable=True))
+        _backfill(bind, fields, sa.Text, '_json', JSONType, _decode)
+        _swap_columns(fields, '_json', JSONType)
+
+    # Let experience be searched by company without a table scan
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE INDEX ix_profiles_experience ON profiles USING GIN (experience jsonb_path_ops)')
+    elif bind.dialect.name == 'mysql' and not getattr(bind.dialect, 'is_mariadb', False):
+        op.execute("CREATE INDEX ix_profiles_experience_company ON profiles "
+                   "((CAST(experience->'$[*].company' AS CHAR(120) ARRAY)))")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_profiles_experience')
+    elif bind.dialect.name == 'mysql' and not getattr(bind.dialect, 'is_mariadb', False):
+        op.execute('DROP INDEX ix_profiles_experience_company ON profiles')
+
+    with op.batch_alter_table('profiles') as batch_op:
+        for field in JSON_FIELDS:
+            batch_op.add_column(sa.Column(field + '_text', sa.Text, nullable=True))
+    _backfill(bind, JSON_FIELDS, JSONType, '_text', sa.Text, _encode)
+    _swap_columns(JSON_FIELDS, '_text', sa.Text)
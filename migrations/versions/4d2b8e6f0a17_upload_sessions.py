@@ -0,0 +1,42 @@
+"""Add upload_sessions for chunked, resumable uploads
+
+Revision ID: 4d2b8e6f0a17
+Revises: e71b09d4a6c8
+Create Date: 2026-10-18 14:22:05.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d2b8e6f0a17'
+down_revision = 'e71b09d4a6c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'upload_sessions' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('offset', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('media_url', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_user_id', 'upload_sessions', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_upload_sessions_user_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,49 @@
+"""Add comments and posts.comment_count
+
+Revision ID: 5a7d3f8c0e92
+Revises: 9c4e6b2a1d53
+Create Date: 2026-10-18 19:41:13.672094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7d3f8c0e92'
+down_revision = '9c4e6b2a1d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'comment_count' not in {column['name'] for column in inspector.get_columns('posts')}:
+        with op.batch_alter_table('posts') as batch_op:
+            batch_op.add_column(sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    if 'comments' in inspector.get_table_names():
+        return
+    op.create_table(
+        'comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('reply_count', sa.Integer(), nullable=False),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comments_post_path_id', 'comments', ['post_id', 'path', 'id'])
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_post_path_id', table_name='comments')
+    op.drop_table('comments')
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('comment_count')
@@ -0,0 +1,39 @@
+"""Add follows and ix_posts_user_id_id for home timelines
+
+Revision ID: 6f1a3c9e2d48
+Revises: 2c6d8f1e4b70
+Create Date: 2026-10-18 22:58:36.402981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1a3c9e2d48'
+down_revision = '2c6d8f1e4b70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'follows' not in inspector.get_table_names():
+        op.create_table(
+            'follows',
+            sa.Column('follower_id', sa.Integer(), nullable=False),
+            sa.Column('followee_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['followee_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['follower_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+        )
+        op.create_index('ix_follows_followee_follower', 'follows', ['followee_id', 'follower_id'])
+    if 'ix_posts_user_id_id' not in {index['name'] for index in inspector.get_indexes('posts')}:
+        op.create_index('ix_posts_user_id_id', 'posts', ['user_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_posts_user_id_id', table_name='posts')
+    op.drop_index('ix_follows_followee_follower', table_name='follows')
+    op.drop_table('follows')
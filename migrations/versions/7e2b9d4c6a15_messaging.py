@@ -0,0 +1,75 @@
+"""Add conversations, participants, messages and unread counters
+
+Revision ID: 7e2b9d4c6a15
+Revises: d18f5a3b7c26
+Create Date: 2026-10-18 20:58:02.115873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b9d4c6a15'
+down_revision = 'd18f5a3b7c26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'conversations' not in tables:
+        op.create_table(
+            'conversations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('direct_key', sa.String(length=32), nullable=True),
+            sa.Column('last_message_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('direct_key')
+        )
+    if 'conversation_participants' not in tables:
+        op.create_table(
+            'conversation_participants',
+            sa.Column('conversation_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+            sa.Column('unread_count', sa.Integer(), nullable=False),
+            sa.Column('last_message_at', sa.DateTime(), nullable=False),
+            sa.Column('joined_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('conversation_id', 'user_id')
+        )
+        op.create_index('ix_conversation_participants_inbox', 'conversation_participants',
+                        ['user_id', 'last_message_at', 'conversation_id'])
+    if 'messages' not in tables:
+        op.create_table(
+            'messages',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('conversation_id', sa.Integer(), nullable=False),
+            sa.Column('sender_id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id']),
+            sa.ForeignKeyConstraint(['sender_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_messages_conversation_id_id', 'messages', ['conversation_id', 'id'])
+    if 'message_unread_counts' not in tables:
+        op.create_table(
+            'message_unread_counts',
+            sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id')
+        )
+
+
+def downgrade():
+    op.drop_table('message_unread_counts')
+    op.drop_index('ix_messages_conversation_id_id', table_name='messages')
+    op.drop_table('messages')
+    op.drop_index('ix_conversation_participants_inbox', table_name='conversation_participants')
+    op.drop_table('conversation_participants')
+    op.drop_table('conversations')
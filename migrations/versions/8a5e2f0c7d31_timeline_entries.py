@@ -0,0 +1,41 @@
+"""Add timeline_entries and timeline_large_authors for home timelines without Redis
+
+Revision ID: 8a5e2f0c7d31
+Revises: 0e4b7a2c5f93
+Create Date: 2026-10-19 09:12:44.208731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a5e2f0c7d31'
+down_revision = '0e4b7a2c5f93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'timeline_entries' not in tables:
+        op.create_table(
+            'timeline_entries',
+            sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('post_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.ForeignKeyConstraint(['post_id'], ['posts.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id', 'post_id')
+        )
+    if 'timeline_large_authors' not in tables:
+        op.create_table(
+            'timeline_large_authors',
+            sa.Column('author_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.ForeignKeyConstraint(['author_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('author_id')
+        )
+
+
+def downgrade():
+    op.drop_table('timeline_large_authors')
+    op.drop_table('timeline_entries')
@@ -0,0 +1,92 @@
+"""Normalize profile skills into skills and profile_skills
+
+Revision ID: 8b41d6e0c2a5
+Revises: 3f9a2c1d7e84
+Create Date: 2026-10-18 11:02:07.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41d6e0c2a5'
+down_revision = '3f9a2c1d7e84'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _normalize(name):
+    return ' '.join(name.split()).lower()[:80]
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if 'skills' not in tables:
+        op.create_table(
+            'skills',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=80), nullable=False),
+            sa.Column('profile_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+    if 'profile_skills' not in tables:
+        op.create_table(
+            'profile_skills',
+            sa.Column('profile_id', sa.Integer(), nullable=False),
+            sa.Column('skill_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['profile_id'], ['profiles.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('profile_id', 'skill_id')
+        )
+        op.create_index('ix_profile_skills_skill_profile', 'profile_skills', ['skill_id', 'profile_id'])
+
+    # Split the comma-separated strings, BATCH_SIZE profiles at a time
+    profiles = sa.table('profiles', sa.column('id', sa.Integer), sa.column('skills', sa.Text))
+    skills = sa.table('skills', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                      sa.column('profile_count', sa.Integer))
+    profile_skills = sa.table('profile_skills', sa.column('profile_id', sa.Integer),
+                              sa.column('skill_id', sa.Integer))
+    skill_ids = {row.name: row.id for row in bind.execute(sa.select(skills.c.id, skills.c.name))}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(profiles.c.id, profiles.c.skills)
+            .where(profiles.c.id > last_id)
+            .order_by(profiles.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        pairs = set()
+        for row in rows:
+            for part in (row.skills or '').split(','):
+                name = _normalize(part)
+                if name:
+                    pairs.add((row.id, name))
+        new_names = sorted({name for _, name in pairs} - skill_ids.keys())
+        if new_names:
+            bind.execute(skills.insert(), [{'name': name, 'profile_count': 0} for name in new_names])
+            for row in bind.execute(sa.select(skills.c.id, skills.c.name).where(skills.c.name.in_(new_names))):
+                skill_ids[row.name] = row.id
+        profile_ids = [row.id for row in rows]
+        bind.execute(profile_skills.delete().where(profile_skills.c.profile_id.in_(profile_ids)))
+        if pairs:
+            bind.execute(profile_skills.insert(),
+                         [{'profile_id': profile_id, 'skill_id': skill_ids[name]} for profile_id, name in pairs])
+        last_id = rows[-1].id
+
+    counts = (sa.select(sa.func.count())
+              .where(profile_skills.c.skill_id == skills.c.id)
+              .scalar_subquery())
+    bind.execute(skills.update().values(profile_count=counts))
+
+
+def downgrade():
+    op.drop_index('ix_profile_skills_skill_profile', table_name='profile_skills')
+    op.drop_table('profile_skills')
+    op.drop_table('skills')
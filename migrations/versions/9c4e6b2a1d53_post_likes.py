@@ -0,0 +1,44 @@
+"""Add post_likes and sharded post_like_counts
+
+Revision ID: 9c4e6b2a1d53
+Revises: f3c8a1d27b64
+Create Date: 2026-10-18 19:04:47.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e6b2a1d53'
+down_revision = 'f3c8a1d27b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'post_likes' not in tables:
+        op.create_table(
+            'post_likes',
+            sa.Column('post_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['post_id'], ['posts.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('post_id', 'user_id')
+        )
+    if 'post_like_counts' not in tables:
+        op.create_table(
+            'post_like_counts',
+            sa.Column('post_id', sa.Integer(), nullable=False),
+            sa.Column('shard', sa.SmallInteger(), autoincrement=False, nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['post_id'], ['posts.id']),
+            sa.PrimaryKeyConstraint('post_id', 'shard')
+        )
+
+
+def downgrade():
+    op.drop_table('post_like_counts')
+    op.drop_table('post_likes')
@@ -0,0 +1,35 @@
+"""Add media_blobs for the content-addressed media store
+
+Revision ID: a93c5f27d8e1
+Revises: 4d2b8e6f0a17
+Create Date: 2026-10-18 15:07:44.902187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93c5f27d8e1'
+down_revision = '4d2b8e6f0a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'media_blobs' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'media_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('ext', sa.String(length=10), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+
+
+def downgrade():
+    op.drop_table('media_blobs')
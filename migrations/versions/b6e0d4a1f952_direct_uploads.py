@@ -0,0 +1,31 @@
+"""Add direct-to-storage upload columns to upload_sessions
+
+Revision ID: b6e0d4a1f952
+Revises: a93c5f27d8e1
+Create Date: 2026-10-18 16:02:31.554019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e0d4a1f952'
+down_revision = 'a93c5f27d8e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('upload_sessions')}
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        if 'direct' not in columns:
+            batch_op.add_column(sa.Column('direct', sa.Boolean(), nullable=False, server_default=sa.false()))
+        if 'storage_upload_id' not in columns:
+            batch_op.add_column(sa.Column('storage_upload_id', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('storage_upload_id')
+        batch_op.drop_column('direct')
@@ -0,0 +1,40 @@
+"""Add image_jobs for background avatar processing
+
+Revision ID: c52e7a9f1b30
+Revises: 8b41d6e0c2a5
+Create Date: 2026-10-18 12:20:55.117402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e7a9f1b30'
+down_revision = '8b41d6e0c2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'image_jobs' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'image_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('thumbnail_filename', sa.String(length=255), nullable=True),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_image_jobs_user_id', 'image_jobs', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_image_jobs_user_id', table_name='image_jobs')
+    op.drop_table('image_jobs')
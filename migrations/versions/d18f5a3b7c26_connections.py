@@ -0,0 +1,48 @@
+"""Add connection_requests and connections
+
+Revision ID: d18f5a3b7c26
+Revises: 5a7d3f8c0e92
+Create Date: 2026-10-18 20:17:38.940512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd18f5a3b7c26'
+down_revision = '5a7d3f8c0e92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'connection_requests' not in tables:
+        op.create_table(
+            'connection_requests',
+            sa.Column('requester_id', sa.Integer(), nullable=False),
+            sa.Column('addressee_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['requester_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['addressee_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('requester_id', 'addressee_id')
+        )
+        op.create_index('ix_connection_requests_addressee_requester', 'connection_requests',
+                        ['addressee_id', 'requester_id'])
+    if 'connections' not in tables:
+        op.create_table(
+            'connections',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('other_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['other_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id', 'other_id')
+        )
+
+
+def downgrade():
+    op.drop_table('connections')
+    op.drop_index('ix_connection_requests_addressee_requester', table_name='connection_requests')
+    op.drop_table('connection_requests')
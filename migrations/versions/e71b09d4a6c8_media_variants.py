@@ -0,0 +1,38 @@
+"""Add media_variants for responsive image variants
+
+Revision ID: e71b09d4a6c8
+Revises: c52e7a9f1b30
+Create Date: 2026-10-18 13:41:12.660913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e71b09d4a6c8'
+down_revision = 'c52e7a9f1b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'media_variants' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'media_variants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('media_key', sa.String(length=255), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('bytes', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('media_key', 'format', 'width', name='uq_media_variants_key_format_width')
+    )
+
+
+def downgrade():
+    op.drop_table('media_variants')
@@ -0,0 +1,39 @@
+"""Add revoked_tokens for JWT revocation
+
+Revision ID: f3c8a1d27b64
+Revises: b6e0d4a1f952
+Create Date: 2026-10-18 18:12:05.317842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d27b64'
+down_revision = 'b6e0d4a1f952'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'revoked_tokens' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('revoked_at', sa.Double(), nullable=False),
+        sa.Column('expires_at', sa.Double(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_revoked_tokens_user_id', 'revoked_tokens', ['user_id'])
+    op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_revoked_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_user_id', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')